@@ -4,8 +4,11 @@
 # Sie definiert unter anderem Datenbank-Verbindungen, installierte Apps, Middleware, Sicherheitseinstellungen,
 # REST-Framework-Konfiguration und E-Mail-Versand-Einstellungen.
 
+import hashlib
 import os
 from pathlib import Path
+
+import django
 from decouple import config
 
 # ------------------------------------------------
@@ -64,6 +67,8 @@ INSTALLED_APPS = [
 # Liste der Middleware-Klassen, die Anfragen vor/nach der View-Verarbeitung bearbeiten
 # Die Reihenfolge ist wichtig, besonders für die CORS-Middleware!
 MIDDLEWARE = [
+    'DUEBapp.middleware.MetricsMiddleware',                # Latenz-Histogramm für /metrics
+    'DUEBapp.middleware.RequestProfilingMiddleware',       # SQL-/Laufzeitmessung (zuerst, misst alles)
     'django.middleware.security.SecurityMiddleware',       # Sicherheitsverbesserungen
     'django.contrib.sessions.middleware.SessionMiddleware', # Sitzungsverwaltung
     'corsheaders.middleware.CorsMiddleware',               # CORS-Handling vor CommonMiddleware
@@ -104,12 +109,42 @@ WSGI_APPLICATION = 'DUEB_backend_Projekt.wsgi.application'
 # 6) DATENBANK-KONFIGURATION
 # ------------------------------------------------
 # SQLite-Datenbank für Entwicklung. Für Produktion könnte hier z.B. PostgreSQL stehen
+#
+# Verbindungsprofil für den SQLite-Betrieb bei vielen gleichzeitigen Einsendungen:
+# - Verbindungen bleiben DB_CONN_MAX_AGE Sekunden offen (statt einer neuen pro Request)
+# - Schreibtransaktionen starten (ab Django 5.1) mit BEGIN IMMEDIATE, sodass wartende Schreiber den
+#   busy_timeout nutzen, statt beim Sperren-Upgrade sofort "database is locked" zu melden
+# - Die PRAGMAs aus SQLITE_PRAGMAS werden bei jeder neuen Verbindung gesetzt
+#   (siehe DUEBapp/sqlite_profile.py)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
+# transaction_mode gibt es erst ab Django 5.1; ältere Versionen reichen unbekannte OPTIONS an
+# sqlite3.connect() weiter und scheitern dann bei jeder Verbindung. Dort beginnen
+# Transaktionen wie bisher mit BEGIN (DEFERRED).
+if django.VERSION >= (5, 1):
+    DATABASES['default']['OPTIONS']['transaction_mode'] = config('SQLITE_TRANSACTION_MODE', default='IMMEDIATE')
+
+# PRAGMAs für jede neue SQLite-Verbindung (leerer Wert = PRAGMA nicht setzen)
+SQLITE_PRAGMAS = {
+    # Write-Ahead-Log: Lesende blockieren Schreibende nicht mehr
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    # Im WAL-Modus sicher; fsync nur noch beim Checkpoint
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    # Wartezeit in Millisekunden, bevor "database is locked" gemeldet wird
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+    # Speicherabbildung der Datenbankdatei in Bytes (Standard: 128 MiB)
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int),
+    # Seiten-Cache je Verbindung; negative Werte in KiB (Standard: 20 MiB)
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-20000, cast=int),
+    'temp_store': config('SQLITE_TEMP_STORE', default='MEMORY'),
+}
 
 # ------------------------------------------------
 # 7) AUTHENTIFIZIERUNG UND VALIDIERUNG
@@ -173,4 +208,133 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
-EMAIL_SUBJECT_PREFIX = '[DÜB Projekt] '
\ No newline at end of file
+EMAIL_SUBJECT_PREFIX = '[DÜB Projekt] '
+
+# ------------------------------------------------
+# 12) CACHE-KONFIGURATION
+# ------------------------------------------------
+# Gemeinsamer Cache für abgeleitete Daten (z.B. Formular-Layouts der Excel-Auswertung).
+# Der dateibasierte Cache wird von allen Worker-Prozessen geteilt, sodass eine
+# Invalidierung nach Änderungen überall wirksam wird. Backend und Ablageort lassen
+# sich über die .env-Datei anpassen (z.B. auf Redis oder Memcached).
+# Die Einträge verweisen auf IDs der Datenbank (z.B. dueb:form_layout:<Formular-ID>); der
+# Schlüsselpräfix wird daher aus dem Datenbanknamen abgeleitet, damit eine zweite Datenbank
+# (Kopie, Lasttest) mit demselben Cache-Ordner keine fremden Einträge liest oder verwirft.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=os.path.join(BASE_DIR, 'cache')),
+        'KEY_PREFIX': config(
+            'CACHE_KEY_PREFIX',
+            default=hashlib.sha1(str(DATABASES['default']['NAME']).encode()).hexdigest()[:12],
+        ),
+    }
+}
+
+# ------------------------------------------------
+# 13) BERICHTSSPEICHER
+# ------------------------------------------------
+# Ablageort der erzeugten Berichtsdateien (Excel-Auswertungen). Die Dateien werden unter
+# einem aus den Eingangsdaten berechneten Schlüssel gespeichert und über /api/reports/<key>/
+# ausgeliefert. Der Ordner liegt bewusst außerhalb von MEDIA_ROOT (kein öffentlicher Zugriff).
+REPORT_STORE_ROOT = config('REPORT_STORE_ROOT', default=os.path.join(BASE_DIR, 'reports'))
+# Basis-URL des Servers für Download-Links in E-Mails (leer = keine Links)
+REPORT_DOWNLOAD_BASE_URL = config('REPORT_DOWNLOAD_BASE_URL', default='')
+# Gültigkeitsdauer der signierten Download-Links in Sekunden (Standard: 7 Tage)
+REPORT_LINK_MAX_AGE = config('REPORT_LINK_MAX_AGE', default=7 * 24 * 3600, cast=int)
+# Dateien oberhalb dieser Größe werden nur verlinkt statt angehängt (sofern ein Link möglich ist)
+REPORT_ATTACHMENT_MAX_BYTES = config('REPORT_ATTACHMENT_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+
+# ------------------------------------------------
+# 14) ZEITSTRAHL
+# ------------------------------------------------
+# Zeitzone, in der die Geräte ihre Zeitstempel ("19.10.2026, 14:05") erfassen. Wird für
+# die Umrechnung in die Ereignistabelle (TimelineEvent) verwendet.
+TIMELINE_TIME_ZONE = config('TIMELINE_TIME_ZONE', default='Europe/Berlin')
+
+# ------------------------------------------------
+# 15) SZENARIO-ÜBERSICHT
+# ------------------------------------------------
+# Die Übersichtsbilder eines Szenarios werden nach Änderungen an den Zuweisungen automatisch
+# im Hintergrund neu erzeugt. Mehrere Änderungen innerhalb der Verzögerung (Sekunden) werden
+# zu einer Neuerzeugung zusammengefasst.
+OVERVIEW_AUTO_REFRESH = config('OVERVIEW_AUTO_REFRESH', default=True, cast=bool)
+OVERVIEW_REFRESH_DELAY = config('OVERVIEW_REFRESH_DELAY', default=5.0, cast=float)
+# Anzahl paralleler Prozesse beim Zeichnen der Übersichten je Organisation (0 = Anzahl CPU-Kerne)
+OVERVIEW_WORKERS = config('OVERVIEW_WORKERS', default=0, cast=int)
+# Dateiformat der Übersichten: "png" (Rastergrafik) oder "svg" (Vektorgrafik, scharf bei jedem Zoom)
+OVERVIEW_FORMAT = config('OVERVIEW_FORMAT', default='png')
+
+# ------------------------------------------------
+# 16) SCHREIBWARTESCHLANGE FÜR EINSENDUNGEN
+# ------------------------------------------------
+# Optional: Einsendungen (Formularantworten, Patientenbegleitbögen) werden von einem
+# einzelnen Schreib-Thread pro Prozess in Gruppen-Commits gespeichert (siehe
+# DUEBapp/write_queue.py). Die Anfrage wird erst nach dem Commit beantwortet.
+SUBMISSION_WRITE_QUEUE = config('SUBMISSION_WRITE_QUEUE', default=False, cast=bool)
+# Höchstzahl an Einsendungen pro Commit
+SUBMISSION_BATCH_MAX = config('SUBMISSION_BATCH_MAX', default=50, cast=int)
+# Wartezeit in Millisekunden, um weitere Einsendungen für denselben Commit zu sammeln
+SUBMISSION_BATCH_WAIT_MS = config('SUBMISSION_BATCH_WAIT_MS', default=5, cast=int)
+# Maximale Wartezeit einer Anfrage auf ihren Commit in Sekunden (danach HTTP 503)
+SUBMISSION_WRITE_TIMEOUT = config('SUBMISSION_WRITE_TIMEOUT', default=30, cast=int)
+
+# ------------------------------------------------
+# 17) MESSUNG PRO REQUEST
+# ------------------------------------------------
+# Zählt SQL-Abfragen, SQL-Dauer und Laufzeit pro Request (siehe DUEBapp/middleware.py).
+# Standardmäßig nur in der Entwicklung (DEBUG) aktiv; im Produktivbetrieb bei Bedarf
+# einschalten. Der Header gibt Abfragezahlen und SQL-Dauern an jeden Client weiter.
+REQUEST_PROFILING = config('REQUEST_PROFILING', default=DEBUG, cast=bool)
+# Werte zusätzlich als Server-Timing-Header ausliefern
+REQUEST_PROFILING_HEADER = config('REQUEST_PROFILING_HEADER', default=DEBUG, cast=bool)
+# Ab dieser Laufzeit (ms) oder Abfragezahl wird der Request mit seinen Abfragen als Warnung geloggt
+REQUEST_PROFILING_SLOW_MS = config('REQUEST_PROFILING_SLOW_MS', default=500, cast=int)
+REQUEST_PROFILING_MAX_QUERIES = config('REQUEST_PROFILING_MAX_QUERIES', default=50, cast=int)
+
+# ------------------------------------------------
+# 18) LOGGING
+# ------------------------------------------------
+# Die Logger der Anwendung ("DUEBapp.*") geben über einen Hintergrund-Thread auf stderr aus
+# (siehe DUEBapp/log_queue.py), damit Requests nicht auf die Ausgabe warten.
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+# Ausgabe über Warteschlange und Hintergrund-Thread (False = direkt im Request-Thread)
+LOG_QUEUE = config('LOG_QUEUE', default=True, cast=bool)
+# Von häufigen DEBUG-Einträgen derselben Stelle wird nur jeder n-te ausgegeben (1 = alle)
+LOG_DEBUG_SAMPLE_RATE = config('LOG_DEBUG_SAMPLE_RATE', default=10, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'standard': {
+            'format': '%(asctime)s %(levelname)s %(name)s [%(threadName)s] %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'standard',
+        },
+    },
+    'loggers': {
+        'DUEBapp': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
+# ------------------------------------------------
+# 19) BETRIEBSKENNZAHLEN (/metrics)
+# ------------------------------------------------
+# Kennzahlen im Prometheus-Textformat unter /metrics (siehe DUEBapp/metrics.py)
+# Standardmäßig aus: die Kennzahlen verraten Endpunkte, Latenzen und Importfortschritt
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+# Token für den Abruf ("Authorization: Bearer <Token>"); gesetzt ersetzt es die Adressprüfung
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Ohne Token: Adressen, von denen /metrics direkt abgerufen werden darf (kommagetrennt).
+# Hinter einem Reverse-Proxy (nginx) kommen alle Anfragen von 127.0.0.1; weitergeleitete
+# Anfragen werden daher abgewiesen, für den Abruf über den Proxy METRICS_TOKEN setzen.
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1').split(',')
@@ -20,11 +20,14 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
+from DUEBapp.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     # Alles andere geht über /api/
     path('api/', include('DUEBapp.urls')),
+    # Betriebskennzahlen im Prometheus-Format (nur lokal erreichbar)
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -7,7 +7,9 @@
 
 import openpyxl
 from django.contrib import admin, messages
+from django.core.paginator import Paginator
 from django.db.models import Count, Max
+from django.forms.models import BaseInlineFormSet
 from django.http import HttpResponseRedirect
 from django.urls import path
 from . import admin_excelupload
@@ -19,7 +21,10 @@ from .models import (
     ObserverAccount,  # Neu: Beobachterkonto
     VictimProfileResponse  # Neu: Neues Modell für Antwortdaten
 )
-from .pillow_utils import generate_overview_image
+from .overview import schedule_overview_refresh
+from .analytics import get_scenario_category_stats
+from .export_formresponses import stream_csv_response, xlsx_file_response
+from .export_victimprofiles import exercise_report_response
 
 # ------------------------------------------------
 # 1) ADMIN-KLASSEN FÜR FORMULAR-MODELLE
@@ -44,6 +49,7 @@ class FormAdmin(admin.ModelAdmin):
     inlines = [QuestionInline]
     list_display = ['_name', '_note']
     search_fields = ['name']
+    actions = ['export_responses_csv', 'export_responses_xlsx']
 
     def _name(self, obj):
         return obj.name
@@ -51,15 +57,38 @@ class FormAdmin(admin.ModelAdmin):
     def _note(self, obj):
         return obj.note
 
+    def _single_form(self, request, queryset):
+        """Gibt das ausgewählte Formular zurück, wenn genau eines markiert ist"""
+        if queryset.count() != 1:
+            messages.error(request, "Bitte genau ein Formular für den Export auswählen.")
+            return None
+        return queryset.first()
+
+    @admin.action(description="Alle Antworten exportieren (CSV)")
+    def export_responses_csv(self, request, queryset):
+        """Exportiert alle Antworten des ausgewählten Formulars als eine CSV-Tabelle"""
+        form = self._single_form(request, queryset)
+        if form:
+            return stream_csv_response(form)
+
+    @admin.action(description="Alle Antworten exportieren (Excel)")
+    def export_responses_xlsx(self, request, queryset):
+        """Exportiert alle Antworten des ausgewählten Formulars als eine Excel-Tabelle"""
+        form = self._single_form(request, queryset)
+        if form:
+            return xlsx_file_response(form)
+
 
 @admin.register(FormResponse)
 class FormResponseAdmin(admin.ModelAdmin):
     """Admin-Konfiguration für Formularantworten"""
     list_display = ['_form', '_observer_name', '_observer_email', '_submitted_at']
+    list_select_related = ['form']
     readonly_fields = ['submitted_at']
 
     def _form(self, obj):
         return obj.form.name if obj.form else "-"
+    _form.admin_order_field = 'form__name'
 
     def _observer_name(self, obj):
         return obj.observer_name
@@ -126,6 +155,12 @@ class VictimProfileAdmin(admin.ModelAdmin):
     ]
     list_filter = ['category']
 
+    def get_ordering(self, request):
+        """Sortiert die Autocomplete-Vorschläge (Zuweisung im Testszenario) nach Kategorie und Profilnummer"""
+        if request.resolver_match and request.resolver_match.url_name == 'autocomplete':
+            return ('category', 'profile_number')
+        return super().get_ordering(request)
+
     def _profile_number(self, obj):
         return obj.profile_number
 
@@ -159,9 +194,38 @@ class OrganizationAdmin(admin.ModelAdmin):
         return obj.short_code
 
 
+class PaginatedAssignmentFormSet(BaseInlineFormSet):
+    """
+    Inline-Formset, das nur eine Seite der Zuweisungen enthält. Die Seite wird über den
+    GET-Parameter page_param gewählt; das Speichern erfolgt an dieselbe URL, sodass
+    dieselbe Seite verarbeitet wird.
+    """
+    per_page = 50
+    page_param = 'zuweisungen_seite'
+    page_number = 1
+    page = None
+    # Eindeutige Reihenfolge für die Seitenaufteilung: sequential_number ist nur je
+    # Organisation eindeutig, ohne Ordnung über die ganze Liste können Zuweisungen auf
+    # mehreren Seiten oder auf keiner erscheinen (und beim Speichern die falschen Zeilen treffen)
+    ordering = ('organization', 'sequential_number', 'pk')
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super().get_queryset().order_by(*self.ordering)
+            self.page = Paginator(queryset, self.per_page).get_page(self.page_number)
+            self._queryset = self.page.object_list
+        return self._queryset
+
+
 class TestScenarioVictimInline(admin.TabularInline):
-    """Inline-Verwaltung für Opfer innerhalb eines Testszenarios"""
+    """
+    Inline-Verwaltung für Opfer innerhalb eines Testszenarios. Profile und Organisationen
+    werden per Autocomplete ausgewählt (statt aller Profile als <option> in jeder Zeile),
+    die Zuweisungen werden seitenweise angezeigt.
+    """
     model = TestScenarioVictim
+    formset = PaginatedAssignmentFormSet
+    template = 'admin/edit_inline/tabular_paginated.html'
     extra = 1
     fields = (
         'sequential_number',
@@ -170,11 +234,17 @@ class TestScenarioVictimInline(admin.TabularInline):
         'button_number'
     )
     readonly_fields = ('sequential_number', 'button_number')
-    ordering = ('sequential_number',)
+    autocomplete_fields = ('victim_profile', 'organization')
+    ordering = PaginatedAssignmentFormSet.ordering
+
+    def get_queryset(self, request):
+        """Lädt Szenario, Profil und Organisation der angezeigten Zuweisungen mit derselben Abfrage"""
+        return super().get_queryset(request).select_related('scenario', 'victim_profile', 'organization')
 
     def get_formset(self, request, obj=None, **kwargs):
-        """Überschreibt Formset mit Validierung für Organizations"""
+        """Überschreibt Formset mit Validierung für Organizations und setzt die angezeigte Seite"""
         formset = super().get_formset(request, obj, **kwargs)
+        formset.page_number = request.GET.get(formset.page_param) or 1
 
         class ValidatedForm(formset.form):
             def clean(self):
@@ -189,12 +259,6 @@ class TestScenarioVictimInline(admin.TabularInline):
         widget.can_delete_related = False
         return formset
 
-    def formfield_for_foreignkey(self, db_field, request, **kwargs):
-        """Sortiert Opferprofile nach Kategorie und Profilnummer für die Auswahlbox"""
-        if db_field.name == "victim_profile":
-            kwargs["queryset"] = VictimProfile.objects.all().order_by('category', 'profile_number')
-        return super().formfield_for_foreignkey(db_field, request, **kwargs)
-
 
 @admin.register(TestScenario)
 class TestScenarioAdmin(admin.ModelAdmin):
@@ -213,10 +277,15 @@ class TestScenarioAdmin(admin.ModelAdmin):
         return obj.date.strftime('%d.%m.%Y') if obj.date else "-"
     _date.short_description = "Datum der Krankenhausübung"
 
+    def get_queryset(self, request):
+        """Zählt die Zuweisungen per SQL, statt pro Zeile eine eigene Abfrage zu stellen"""
+        return super().get_queryset(request).annotate(profile_count=Count('assignments'))
+
     def get_total_profiles(self, obj):
         """Gibt die Gesamtzahl der zugewiesenen Profile zurück"""
-        return obj.assignments.count()
+        return obj.profile_count
     get_total_profiles.short_description = "Anzahl Profile"
+    get_total_profiles.admin_order_field = 'profile_count'
 
     def get_category_summary(self, obj):
         """Erzeugt eine Zusammenfassung der Profilkategorien"""
@@ -225,13 +294,11 @@ class TestScenarioAdmin(admin.ModelAdmin):
     get_category_summary.short_description = "Kategorien"
 
     def get_profile_stats(self, obj):
-        """Berechnet Statistiken über die Verteilung der Profile nach Kategorien"""
-        from collections import defaultdict
-        stats = defaultdict(int)
-        for assignment in obj.assignments.all():
-            category = assignment.victim_profile.category or 'Ohne Kategorie'
-            stats[category] += 1
-        return dict(stats)
+        """
+        Statistik über die Verteilung der Profile nach Kategorien. Wird per SQL gruppiert
+        und je Szenario gecacht (Invalidierung in signals.py).
+        """
+        return get_scenario_category_stats(obj.pk)
 
     def get_urls(self):
         """Fügt benutzerdefinierte URLs für die Übersichtserzeugung hinzu"""
@@ -246,38 +313,17 @@ class TestScenarioAdmin(admin.ModelAdmin):
         return custom_urls + urls
 
     def generate_overview_view(self, request, scenario_id):
-        """Erzeugt eine Bildübersicht für das Szenario als PNG-Datei"""
+        """
+        Stößt die Erzeugung der Bildübersicht für das Szenario an. Gezeichnet wird im
+        Hintergrund (siehe overview.py); die bisherigen Übersichtsbilder werden ersetzt.
+        """
         scenario = self.get_object(request, scenario_id)
         if scenario:
-            try:
-                all_assignments = scenario.assignments.select_related("victim_profile").all()
-                entries_for_image = []
-                for asn in all_assignments:
-                    vp = asn.victim_profile
-                    cat = vp.category.strip() if vp.category else ""
-                    entries_for_image.append({
-                        "button_number": asn.button_number,
-                        "profile_number": vp.profile_number or "",
-                        "category": cat,
-                        "diagnosis": vp.diagnosis or "",
-                        "visual": vp.visual_diagnosis or "",
-                        "pcz": vp.pcz_ivena or "",
-                    })
-
-                rel_path = generate_overview_image(
-                    entries_for_image,
-                    scenario_name=scenario.name,
-                    date_str=scenario.date
-                )
-
-                new_image = HomeScreenImage(
-                    image=rel_path,
-                    description=f"Übersicht für Szenario {scenario.name} vom {scenario.date.strftime('%d.%m.%Y')}"
-                )
-                new_image.save()
-                messages.success(request, "Verletztenübersicht wurde erfolgreich erstellt!")
-            except Exception as e:
-                messages.error(request, f"Fehler beim Erstellen der Übersicht: {str(e)}")
+            schedule_overview_refresh(scenario.pk, delay=0)
+            messages.success(
+                request,
+                "Die Verletztenübersicht wird im Hintergrund erstellt und erscheint in Kürze unter den Startbildern."
+            )
         return HttpResponseRedirect("../")
 
     def has_add_permission(self, request):
@@ -302,8 +348,8 @@ class TestScenarioAdmin(admin.ModelAdmin):
         extra_context = extra_context or {}
         scenario = self.get_object(request, object_id)
         if scenario:
-            total_count = scenario.assignments.count()
             category_stats = self.get_profile_stats(scenario)
+            total_count = sum(category_stats.values())
             extra_context.update({
                 'show_statistics': True,
                 'total_profiles': total_count,
@@ -413,3 +459,20 @@ class VictimProfileResponseAdmin(admin.ModelAdmin):
         }),
     )
     readonly_fields = ('erstellt_am', 'aktualisiert_am')
+    change_list_template = 'admin/victimprofileresponse_change_list.html'
+
+    def get_urls(self):
+        """Fügt die URL für den übungsweiten Gesamtbericht hinzu"""
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'exercise-report/',
+                self.admin_site.admin_view(self.exercise_report_view),
+                name='victimprofileresponse-exercise-report',
+            ),
+        ]
+        return custom_urls + urls
+
+    def exercise_report_view(self, request):
+        """Liefert den Gesamtbericht aller Patientenbegleitbögen (SOLL/IST-Übersicht) als Excel-Datei"""
+        return exercise_report_response()
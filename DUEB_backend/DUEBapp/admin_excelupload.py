@@ -4,14 +4,323 @@
 # Sie ermöglicht das Hochladen von Excel-Dateien und deren automatische Verarbeitung,
 # um Opferprofile (VictimProfile) aus den Tabellendaten zu erstellen oder zu aktualisieren.
 # Der Excel-Import dient als effiziente Methode zum Massenimport von Patientendaten.
+#
+# Die Spalten werden nicht mehr über ihre Position, sondern über die Überschriften
+# der ersten Zeile zugeordnet. Neben .xlsx werden auch .csv und .tsv als schnellere
+# Eingabeformate unterstützt.
+
+import codecs
+import csv
+import os
+import re
+import zipfile
+from operator import itemgetter
 
 import openpyxl
+from openpyxl.utils.exceptions import InvalidFileException
 from django.contrib import admin
+from django.conf import settings
 from django.contrib import messages
-from .models import ExcelUpload, VictimProfile
+from django.db import transaction
+from .analytics import invalidate_scenario_category_stats, invalidate_triage_analytics
+from .models import ExcelUpload, TestScenarioVictim, VictimProfile
+from .overview import schedule_overview_refresh
+from .metrics import IMPORT_PROFILES, IMPORT_ROWS, IMPORT_RUNNING
+
+# Fortschritt des Imports (dueb_import_rows_processed) wird alle n Zeilen aktualisiert
+IMPORT_PROGRESS_EVERY = 100
+
+# ------------------------------------------------
+# 1) SPALTEN-ZUORDNUNG (ÜBERSCHRIFT → MODELLFELD)
+# ------------------------------------------------
+# Deklarative Zuordnung der Tabellenüberschriften zu den Feldern von VictimProfile.
+# Die Reihenfolge entspricht dem bisherigen Tabellenlayout (Spalte A bis AQ) und wird
+# als Fallback verwendet, wenn die Datei keine erkennbare Überschriftenzeile enthält.
+# Neben den hier aufgeführten Aliassen wird immer auch der verbose_name und der
+# Feldname des Modells als Überschrift erkannt.
+COLUMN_MAPPING = [
+    ('profile_number', ['Profil-Nr', 'Profil Nr', 'Profilnummer', 'Patientenprofil']),
+    ('pcz_ivena', ['PCZ', 'PZC IVENA', 'IVENA']),
+    ('category', ['Sichtungskategorie', 'SK']),
+    ('expected_med_action', ['Erwartete medizinische Handlung']),
+    ('diagnosis', []),
+    ('visual_diagnosis', []),
+    ('findings', []),
+    ('symptoms', []),
+    ('actor_hints', ['Hinweise Darsteller']),
+    ('required_specialty', ['Fachrichtung']),
+    ('gcs', ['GCS']),
+    ('spo2', ['SpO2']),
+    ('rekap', ['Rekap']),
+    ('resp_rate', ['AF', 'Atemfrequenz']),
+    ('sys_rr', ['sys. RR', 'RR sys']),
+    ('ekg_monitor', ['EKG', 'EKG-Monitoring']),
+    ('ro_thorax', ['Röntgen Thorax', 'Ro-Thorax']),
+    ('fast_sono', ['FAST Sono', 'FAST']),
+    ('e_fast', ['E-FAST']),
+    ('radiology_finds', ['Radiologie', 'CT']),
+    ('hb_value', ['Hb', 'Hb Wert']),
+    ('blood_units', ['Blutkonserven', 'EKs']),
+    ('red_treatment_area', ['Roter Behandlungsbereich']),
+    ('ventilation_place', ['Beatmungsplatz']),
+    ('icu_place', ['ITS-Platz', 'ITS Platz']),
+    ('emergency_op', ['Not-OP', 'Not OP']),
+    ('op_sieve_special', ['OP-Siebe Spezial']),
+    ('op_sieve_basic', ['OP-Siebe Grundsiebe', 'Grundsiebe']),
+    ('personal_resources', ['Personalressource Schockraum']),
+    ('anesthesia_team', ['Anästhesie-Team', 'Anästhesie Team']),
+    ('radiology_resources', []),
+    ('op_achi_res', ['OP-Achi']),
+    ('op_uchi_res', ['OP-Uchi']),
+    ('op_nchi_res', ['OP-Nchi']),
+    ('medications', ['Medikation']),
+    ('pre_treatment_rd', ['Vorversorgung']),
+    ('spare_col1', ['AK']),
+    ('spare_col2', ['AL']),
+    ('scenario_field', []),
+    ('comment', ['Bemerkungen', 'Kommentar']),
+    ('lastname', ['Nachname']),
+    ('firstname', []),
+    ('birthdate', ['Geb.-Datum', 'Geburtstag']),
+]
+
+# Dateiendungen der Textformate mit dem jeweiligen Trennzeichen (None = automatisch erkennen)
+TEXT_FORMATS = {
+    '.csv': None,
+    '.tsv': '\t',
+    '.tab': '\t',
+}
+
+# Textdateien werden als UTF-8 gelesen; aus Excel unter Windows exportierte CSV-Dateien
+# sind dagegen meist Windows-1252-kodiert (Umlaute) und werden damit eingelesen
+TEXT_ENCODINGS = ('utf-8-sig', 'cp1252')
+
+# Fehler beim Einlesen einer beschädigten oder falsch kodierten Datei (UnicodeDecodeError
+# ist ein ValueError); sie werden im Admin als Meldung statt als Serverfehler angezeigt
+UNREADABLE_FILE_ERRORS = (ValueError, csv.Error, zipfile.BadZipFile, InvalidFileException)
+
+
+def normalize_header(value):
+    """
+    Vereinheitlicht eine Überschrift für den Vergleich: Kleinschreibung,
+    zusammengefasste Leerzeichen, ohne abschließenden Doppelpunkt.
+    """
+    if value is None:
+        return ""
+    text = re.sub(r"\s+", " ", str(value)).strip().lower()
+    return text.rstrip(':').strip()
+
+
+def _build_alias_index():
+    """Erzeugt das Nachschlageverzeichnis normalisierte Überschrift → Feldname"""
+    index = {}
+    for field_name, aliases in COLUMN_MAPPING:
+        verbose_name = VictimProfile._meta.get_field(field_name).verbose_name
+        for alias in [field_name, verbose_name, *aliases]:
+            index.setdefault(normalize_header(alias), field_name)
+    return index
+
+
+ALIAS_INDEX = _build_alias_index()
+
+
+def _clean(value):
+    """Wandelt einen Zellwert in einen bereinigten String um ("" für leere Zellen)"""
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+def compile_row_extractor(header_row):
+    """
+    Löst die Überschriftenzeile einmalig in einen Zeilen-Extraktor auf.
+
+    Gibt ein Tupel (extractor, field_names) zurück. Der Extraktor nimmt eine Zeile
+    (Sequenz von Zellwerten) entgegen und liefert ein Tupel der bereinigten Werte in
+    der Reihenfolge von field_names. Die Spaltenindizes werden dabei in einem einzigen
+    itemgetter-Aufruf gelesen.
+
+    Enthält die Überschriftenzeile keine erkennbare Spalte für die Profilnummer,
+    wird das bisherige Positionslayout (Reihenfolge von COLUMN_MAPPING) verwendet.
+    """
+    positions = {}
+    for idx, header in enumerate(header_row):
+        field_name = ALIAS_INDEX.get(normalize_header(header))
+        if field_name and field_name not in positions:
+            positions[field_name] = idx
+
+    if 'profile_number' not in positions:
+        positions = {field_name: idx for idx, (field_name, _aliases) in enumerate(COLUMN_MAPPING)}
+
+    # Profilnummer immer an erster Stelle, damit der Aufrufer sie direkt entnehmen kann
+    field_names = ['profile_number'] + [f for f in positions if f != 'profile_number']
+    indices = [positions[f] for f in field_names]
+    width = max(indices) + 1
+    getter = itemgetter(*indices)
+    padding = (None,) * width
+
+    def extractor(row):
+        if len(row) < width:
+            row = tuple(row) + padding[len(row):]
+        return tuple(map(_clean, getter(row)))
+
+    return extractor, field_names
+
 
 # ------------------------------------------------
-# 1) ADMIN-KONFIGURATION FÜR EXCEL-UPLOADS
+# 2) EINLESEN DER DATEIEN
+# ------------------------------------------------
+
+def iter_sheet_rows(file_path):
+    """
+    Liefert die Zeilen der hochgeladenen Datei als Tupel von Zellwerten.
+    Unterstützt .xlsx (openpyxl im read-only-Modus) sowie .csv/.tsv (UTF-8 oder Windows-1252).
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext in TEXT_FORMATS:
+        with open(file_path, newline='', encoding=detect_text_encoding(file_path)) as fh:
+            delimiter = TEXT_FORMATS[ext]
+            if delimiter is None:
+                sample = fh.read(4096)
+                fh.seek(0)
+                try:
+                    delimiter = csv.Sniffer().sniff(sample, delimiters=';,\t').delimiter
+                except csv.Error:
+                    delimiter = ';'
+            for row in csv.reader(fh, delimiter=delimiter):
+                yield tuple(row)
+        return
+
+    wb = openpyxl.load_workbook(file_path, data_only=True, read_only=True)
+    try:
+        sheet = wb.active
+        for row in sheet.iter_rows(values_only=True):
+            yield row
+    finally:
+        wb.close()
+
+
+def detect_text_encoding(file_path):
+    """
+    Liefert die erste Kodierung aus TEXT_ENCODINGS, mit der sich die ganze Datei dekodieren
+    lässt. Die Datei wird blockweise geprüft, damit ein Dekodierfehler nicht erst mitten im
+    Import auftritt. Passt keine Kodierung, wird die letzte geliefert; der Fehler tritt dann
+    beim Einlesen auf.
+    """
+    for encoding in TEXT_ENCODINGS[:-1]:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(file_path, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(64 * 1024), b''):
+                    decoder.decode(chunk)
+                decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    return TEXT_ENCODINGS[-1]
+
+
+def import_victim_profiles(file_path):
+    """
+    Importiert alle Patientenprofile aus der angegebenen Datei.
+
+    Vorhandene Profile (gleiche Profilnummer) werden aktualisiert, neue angelegt.
+    Leere Zellen überschreiben bestehende Werte nicht. Die Verarbeitung endet an der
+    ersten Zeile ohne Profilnummer.
+
+    Returns:
+        tuple: (Anzahl neu angelegter Profile, Anzahl aktualisierter Profile)
+    """
+    IMPORT_RUNNING.inc()
+    IMPORT_ROWS.set(value=0)
+    try:
+        created, updated = _import_victim_profiles(file_path)
+    finally:
+        IMPORT_RUNNING.dec()
+    IMPORT_PROFILES.inc('created', amount=created)
+    IMPORT_PROFILES.inc('updated', amount=updated)
+    return created, updated
+
+
+def _import_victim_profiles(file_path):
+    """Eigentlicher Import (siehe import_victim_profiles)"""
+    rows = iter_sheet_rows(file_path)
+    header_row = next(rows, None)
+    if header_row is None:
+        return 0, 0
+
+    extractor, field_names = compile_row_extractor(header_row)
+    value_fields = field_names[1:]
+
+    # Alle Zeilen einlesen; doppelte Profilnummern werden in Dateireihenfolge zusammengeführt
+    parsed = {}
+    processed = 0
+    for row in rows:
+        values = extractor(row)
+        profile_number = values[0]
+        if not profile_number:
+            break
+        processed += 1
+        if processed % IMPORT_PROGRESS_EVERY == 0:
+            IMPORT_ROWS.set(value=processed)
+        merged = parsed.setdefault(profile_number, {})
+        for field_name, value in zip(value_fields, values[1:]):
+            if value:
+                merged[field_name] = value
+    rows.close()
+    IMPORT_ROWS.set(value=processed)
+
+    if not parsed:
+        return 0, 0
+
+    existing = VictimProfile.objects.in_bulk(list(parsed), field_name='profile_number')
+    to_create = []
+    to_update = []
+    for profile_number, values in parsed.items():
+        profile = existing.get(profile_number)
+        if profile is None:
+            to_create.append(VictimProfile(profile_number=profile_number, **values))
+            continue
+        for field_name, value in values.items():
+            setattr(profile, field_name, value)
+        to_update.append(profile)
+
+    with transaction.atomic():
+        VictimProfile.objects.bulk_create(to_create, batch_size=500)
+        if to_update and value_fields:
+            VictimProfile.objects.bulk_update(to_update, value_fields, batch_size=500)
+
+    refresh_derived_data([profile.pk for profile in to_update])
+    return len(to_create), len(to_update)
+
+
+def refresh_derived_data(profile_ids):
+    """
+    bulk_create/bulk_update lösen die post_save-Signale von VictimProfile nicht aus. Daher
+    werden hier die Sichtungsauswertung verworfen sowie für alle Szenarien, denen eines der
+    geänderten Profile zugewiesen ist, die Kategorienstatistik verworfen und die Übersicht
+    neu geplant (neu angelegte Profile sind noch keinem Szenario zugewiesen).
+    """
+    invalidate_triage_analytics()
+    scenario_ids = set()
+    for start in range(0, len(profile_ids), 500):
+        scenario_ids.update(
+            TestScenarioVictim.objects
+            .filter(victim_profile_id__in=profile_ids[start:start + 500])
+            .values_list('scenario_id', flat=True)
+            .distinct()
+        )
+    if not scenario_ids:
+        return
+    invalidate_scenario_category_stats(*scenario_ids)
+    if settings.OVERVIEW_AUTO_REFRESH:
+        for scenario_id in sorted(scenario_ids):
+            schedule_overview_refresh(scenario_id)
+
+
+# ------------------------------------------------
+# 3) ADMIN-KONFIGURATION FÜR EXCEL-UPLOADS
 # ------------------------------------------------
 
 @admin.register(ExcelUpload)
@@ -40,125 +349,24 @@ class ExcelUploadAdmin(admin.ModelAdmin):
 
     def save_model(self, request, obj, form, change):
         """
-        Überschreibt die Standard-save_model-Methode, um die hochgeladene Excel-Datei
+        Überschreibt die Standard-save_model-Methode, um die hochgeladene Datei
         nach dem Speichern automatisch zu verarbeiten und die Daten zu importieren.
-        
+
         Diese Methode wird aufgerufen, wenn ein ExcelUpload-Objekt im Admin-Panel
-        gespeichert wird. Sie liest die Daten aus der Excel-Datei und erstellt oder
-        aktualisiert VictimProfile-Objekte basierend auf den Tabellendaten.
+        gespeichert wird. Sie liest die Daten aus der Excel-, CSV- oder TSV-Datei und
+        erstellt oder aktualisiert VictimProfile-Objekte basierend auf den Tabellendaten.
         """
         # Speichert zunächst das Modell mit der hochgeladenen Datei
         super().save_model(request, obj, form, change)
 
-        # Öffnet die Excel-Datei mit openpyxl
-        excel_file = obj.file.path
-        wb = openpyxl.load_workbook(excel_file, data_only=True)
-        sheet = wb.active
-
-        # Verarbeitet alle Zeilen ab Zeile 2 (nach der Überschriftenzeile)
-        for row in sheet.iter_rows(min_row=2):
-            # Bricht die Schleife ab, wenn die erste Zelle leer ist
-            if not row[0].value:
-                break
-
-            # Liest die Profilnummer aus der ersten Spalte (A)
-            profile_number = str(row[0].value).strip()
-            
-            # Sucht nach einem existierenden Profil oder erstellt ein neues
-            profile, _created = VictimProfile.objects.get_or_create(profile_number=profile_number)
-
-            # Ordnet die Werte aus den Excel-Spalten den Profil-Feldern zu
-            # Spalte B => row[1]
-            if row[1].value:
-                profile.pcz_ivena = str(row[1].value).strip()
-            if row[2].value:
-                profile.category = str(row[2].value).strip()
-            if row[3].value:
-                profile.expected_med_action = str(row[3].value).strip()
-            if row[4].value:
-                profile.diagnosis = str(row[4].value).strip()
-            if row[5].value:
-                profile.visual_diagnosis = str(row[5].value).strip()
-            if row[6].value:
-                profile.findings = str(row[6].value).strip()
-            if row[7].value:
-                profile.symptoms = str(row[7].value).strip()
-            if row[8].value:
-                profile.actor_hints = str(row[8].value).strip()
-            if row[9].value:
-                profile.required_specialty = str(row[9].value).strip()
-            if row[10].value:
-                profile.gcs = str(row[10].value).strip()
-            if row[11].value:
-                profile.spo2 = str(row[11].value).strip()
-            if row[12].value:
-                profile.rekap = str(row[12].value).strip()
-            if row[13].value:
-                profile.resp_rate = str(row[13].value).strip()
-            if row[14].value:
-                profile.sys_rr = str(row[14].value).strip()
-            if row[15].value:
-                profile.ekg_monitor = str(row[15].value).strip()
-            if row[16].value:
-                profile.ro_thorax = str(row[16].value).strip()
-            if row[17].value:
-                profile.fast_sono = str(row[17].value).strip()
-            if row[18].value:
-                profile.e_fast = str(row[18].value).strip()
-            if row[19].value:
-                profile.radiology_finds = str(row[19].value).strip()
-            if row[20].value:
-                profile.hb_value = str(row[20].value).strip()
-            if row[21].value:
-                profile.blood_units = str(row[21].value).strip()
-            if row[22].value:
-                profile.red_treatment_area = str(row[22].value).strip()
-            if row[23].value:
-                profile.ventilation_place = str(row[23].value).strip()
-            if row[24].value:
-                profile.icu_place = str(row[24].value).strip()
-            if row[25].value:
-                profile.emergency_op = str(row[25].value).strip()
-            if row[26].value:
-                profile.op_sieve_special = str(row[26].value).strip()
-            if row[27].value:
-                profile.op_sieve_basic = str(row[27].value).strip()
-            if row[28].value:
-                profile.personal_resources = str(row[28].value).strip()
-            if row[29].value:
-                profile.anesthesia_team = str(row[29].value).strip()
-            if row[30].value:
-                profile.radiology_resources = str(row[30].value).strip()
-            if row[31].value:
-                profile.op_achi_res = str(row[31].value).strip()
-            if row[32].value:
-                profile.op_uchi_res = str(row[32].value).strip()
-            if row[33].value:
-                profile.op_nchi_res = str(row[33].value).strip()
-            if row[34].value:
-                profile.medications = str(row[34].value).strip()
-            if row[35].value:
-                profile.pre_treatment_rd = str(row[35].value).strip()
-
-            # Verarbeitung zusätzlicher Spalten, falls vorhanden
-            if len(row) > 36 and row[36].value:
-                profile.spare_col1 = str(row[36].value).strip()
-            if len(row) > 37 and row[37].value:
-                profile.spare_col2 = str(row[37].value).strip()
-            if len(row) > 38 and row[38].value:
-                profile.scenario_field = str(row[38].value).strip()
-            if len(row) > 39 and row[39].value:
-                profile.comment = str(row[39].value).strip()
-            if len(row) > 40 and row[40].value:
-                profile.lastname = str(row[40].value).strip()
-            if len(row) > 41 and row[41].value:
-                profile.firstname = str(row[41].value).strip()
-            if len(row) > 42 and row[42].value:
-                profile.birthdate = str(row[42].value).strip()
-
-            # Speichert das aktualisierte oder neu erstellte Profil
-            profile.save()
-
-        # Schließt die Excel-Datei und zeigt eine Erfolgsmeldung
-        wb.close()
-        messages.success(request, "Excel-Datei erfolgreich eingelesen!")
+        try:
+            created, updated = import_victim_profiles(obj.file.path)
+        except UNREADABLE_FILE_ERRORS as exc:
+            # Die Datei wird vollständig gelesen, bevor Profile geschrieben werden; bei einem
+            # Lesefehler bleibt der Datenbestand daher unverändert
+            messages.error(request, f"Datei konnte nicht eingelesen werden: {exc}")
+            return
+        messages.success(
+            request,
+            f"Datei erfolgreich eingelesen! {created} Profile angelegt, {updated} aktualisiert."
+        )
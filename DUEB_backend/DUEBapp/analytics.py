@@ -0,0 +1,181 @@
+# analytics.py - Auswertungen über die Patientenbegleitbögen der Übung
+#
+# Diese Datei berechnet die Sichtungsgenauigkeit (SOLL- gegenüber IST-Sichtung) über alle
+# VictimProfileResponse-Objekte. Die Zählung erfolgt per SQL-Aggregation: Die Datenbank
+# gruppiert nach SOLL-, IST-Angabe und Organisation, sodass in Python nur noch die wenigen
+# verschiedenen Kombinationen vereinheitlicht werden – unabhängig von der Anzahl der Antworten.
+# Das Ergebnis wird gecacht, bis eine neue Antwort eingeht (siehe signals.py).
+#
+# Außerdem: Verteilung der zugewiesenen Profile eines Szenarios nach Kategorie (Admin),
+# ebenfalls per SQL gruppiert und je Szenario gecacht.
+
+from collections import Counter
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf
+from .models import Organization, TestScenarioVictim, VictimProfileResponse
+from .export_victimprofiles import TRIAGE_CATEGORIES, TRIAGE_NONE, normalize_triage, rate_triage
+
+# Cache-Schlüssel der Sichtungsauswertung
+TRIAGE_ANALYTICS_CACHE_KEY = "dueb:analytics:triage"
+
+# Cache-Schlüssel der Kategorienstatistik eines Szenarios
+SCENARIO_STATS_CACHE_KEY = "dueb:analytics:scenario:{}"
+
+# Bezeichnung für Profile ohne Kategorie
+NO_CATEGORY_LABEL = "Ohne Kategorie"
+
+# Bewertungen in der Reihenfolge der Ausgabe (siehe rate_triage)
+TRIAGE_RATINGS = ["korrekt", "Übertriage", "Untertriage", "abweichend", "nicht bewertbar"]
+
+
+# --------------------------------------------------
+# 1) SQL-AGGREGATION
+# --------------------------------------------------
+def triage_counts():
+    """
+    Zählt die Antworten je (SOLL-Angabe, IST-Angabe, Organisation) mit einer Abfrage.
+
+    Die Zuweisung (TestScenarioVictim) wird über die Button-Nummer als Unterabfrage
+    verknüpft: Sie liefert die Organisation und als SOLL-Angabe die Kategorie des
+    Patientenprofils (ersatzweise die in der Antwort gespeicherte SOLL-Sichtung).
+    Ist die Button-Nummer in mehreren Szenarien vergeben, gilt die Zuweisung des neuesten
+    Szenarios (höchste ID, siehe export_victimprofiles.load_assignments_by_button).
+    """
+    assignment = TestScenarioVictim.objects.filter(button_number=OuterRef('button_number')).order_by('-scenario_id')
+    return (
+        VictimProfileResponse.objects
+        .order_by()
+        .annotate(
+            soll_raw=Coalesce(
+                NullIf(Subquery(assignment.values('victim_profile__category')[:1]), Value('')),
+                'soll_sichtung',
+            ),
+            organization_id=Subquery(assignment.values('organization_id')[:1]),
+        )
+        .values('soll_raw', 'ist_sichtung', 'organization_id')
+        .annotate(count=Count('id'))
+    )
+
+
+# --------------------------------------------------
+# 2) AUSWERTUNG
+# --------------------------------------------------
+def _summary(matrix):
+    """
+    Erzeugt aus einem Counter {(SOLL, IST): Anzahl} die Ausgabe mit Matrix, Bewertungen
+    und Quoten. Die Quoten beziehen sich auf alle bewertbaren Antworten.
+    """
+    categories = TRIAGE_CATEGORIES + [TRIAGE_NONE]
+    ratings = Counter()
+    for (soll, ist), count in matrix.items():
+        ratings[rate_triage(soll, ist)] += count
+
+    total = sum(matrix.values())
+    rated = total - ratings["nicht bewertbar"]
+
+    def rate(label):
+        return round(ratings[label] / rated, 4) if rated else None
+
+    return {
+        'total': total,
+        'rated': rated,
+        'matrix': {soll: {ist: matrix[(soll, ist)] for ist in categories} for soll in categories},
+        'ratings': {label: ratings[label] for label in TRIAGE_RATINGS},
+        'accuracy_rate': rate("korrekt"),
+        'over_triage_rate': rate("Übertriage"),
+        'under_triage_rate': rate("Untertriage"),
+    }
+
+
+def compute_triage_analytics():
+    """
+    Berechnet die SOLL×IST-Matrix, Über-/Untertriagequoten sowie die Aufschlüsselung
+    nach Organisation. Antworten ohne zugeordnete Organisation erscheinen mit
+    organization = None.
+    """
+    normalized = {}
+
+    def normalize(value):
+        if value not in normalized:
+            normalized[value] = normalize_triage(value)
+        return normalized[value]
+
+    overall = Counter()
+    by_organization = {}
+    for row in triage_counts():
+        cell = (normalize(row['soll_raw']), normalize(row['ist_sichtung']))
+        overall[cell] += row['count']
+        by_organization.setdefault(row['organization_id'], Counter())[cell] += row['count']
+
+    organizations = Organization.objects.in_bulk([org_id for org_id in by_organization if org_id])
+    breakdown = []
+    for org_id, matrix in by_organization.items():
+        org = organizations.get(org_id)
+        breakdown.append({
+            'organization': org.name if org else None,
+            'short_code': org.short_code if org else None,
+            **_summary(matrix),
+        })
+    breakdown.sort(key=lambda item: (item['organization'] is None, item['organization'] or ""))
+
+    return {
+        'categories': TRIAGE_CATEGORIES + [TRIAGE_NONE],
+        **_summary(overall),
+        'organizations': breakdown,
+    }
+
+
+# --------------------------------------------------
+# 3) CACHE
+# --------------------------------------------------
+def get_triage_analytics():
+    """Liefert die Sichtungsauswertung aus dem Cache oder berechnet sie neu"""
+    data = cache.get(TRIAGE_ANALYTICS_CACHE_KEY)
+    if data is None:
+        data = compute_triage_analytics()
+        cache.set(TRIAGE_ANALYTICS_CACHE_KEY, data, timeout=None)
+    return data
+
+
+def invalidate_triage_analytics():
+    """Verwirft die gecachte Sichtungsauswertung (z.B. nach einer neuen Antwort)"""
+    cache.delete(TRIAGE_ANALYTICS_CACHE_KEY)
+
+
+# --------------------------------------------------
+# 4) KATEGORIENSTATISTIK JE SZENARIO
+# --------------------------------------------------
+def compute_scenario_category_stats(scenario_id):
+    """
+    Zählt die Zuweisungen eines Szenarios je Profilkategorie mit einer Abfrage.
+
+    Returns:
+        dict: {Kategorie: Anzahl}, alphabetisch sortiert, "Ohne Kategorie" am Ende
+    """
+    stats = Counter()
+    rows = (
+        TestScenarioVictim.objects
+        .filter(scenario_id=scenario_id)
+        .order_by()
+        .values('victim_profile__category')
+        .annotate(count=Count('id'))
+    )
+    for row in rows:
+        stats[row['victim_profile__category'] or NO_CATEGORY_LABEL] += row['count']
+    return dict(sorted(stats.items(), key=lambda item: (item[0] == NO_CATEGORY_LABEL, item[0])))
+
+
+def get_scenario_category_stats(scenario_id):
+    """Liefert die Kategorienstatistik eines Szenarios aus dem Cache oder berechnet sie neu"""
+    key = SCENARIO_STATS_CACHE_KEY.format(scenario_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_scenario_category_stats(scenario_id)
+        cache.set(key, stats, timeout=None)
+    return stats
+
+
+def invalidate_scenario_category_stats(*scenario_ids):
+    """Verwirft die gecachte Kategorienstatistik der angegebenen Szenarien"""
+    cache.delete_many([SCENARIO_STATS_CACHE_KEY.format(scenario_id) for scenario_id in scenario_ids])
@@ -4,3 +4,22 @@ from django.apps import AppConfig
 class KhuappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'DUEBapp'
+
+    def ready(self):
+        # Log-Ausgabe der Anwendung über einen Hintergrund-Thread
+        from django.conf import settings
+        if settings.LOG_QUEUE:
+            from .log_queue import install_queue_logging
+            install_queue_logging()
+
+        # Registriert die Signal-Handler (Cache-Invalidierung etc.)
+        from . import signals  # noqa: F401
+
+        # PRAGMAs für neue SQLite-Verbindungen (WAL, busy_timeout, ...)
+        from django.db.backends.signals import connection_created
+        from .sqlite_profile import configure_sqlite_connection
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='dueb_sqlite_profile')
+
+        # Wartezeit auf die Schreibsperre für /metrics
+        from .metrics import install_db_metrics
+        connection_created.connect(install_db_metrics, dispatch_uid='dueb_db_metrics')
@@ -5,138 +5,255 @@
 # strukturiert aufbereitet und ermöglichen die Nachbearbeitung der während der
 # Digitale Übungsbeobachtung erfassten Daten auch außerhalb der Anwendung.
 
-import os
-import tempfile
+import io
+import logging
 import xlsxwriter
 from datetime import datetime
+from django.core.cache import cache
 from django.core.mail import EmailMessage
 from django.conf import settings
-
-# --------------------------------------------------
-# 1) EXCEL-DATEI GENERIERUNG
-# --------------------------------------------------
-def generate_excel_file(form_response):
-    """
-    Generiert eine temporäre Excel-Datei mit den Daten aus dem FormResponse.
-    Gibt den Pfad zur erstellten Datei zurück.
-
-    Bei Checkbox-Fragen erlaubt wir Mehrfachauswahl:
-    - Validation: "any" (Erlaubt alle Werte)
-    - input_message: beschreibt, wie der Nutzer Zeilenumbrüche (ALT+ENTER) und
-      Semikolons verwenden soll.
-    """
-
-    # --------------------------------------------------
-    # 1) Dateiname
-    # --------------------------------------------------
-    observer_name_sanitized = form_response.observer_name.replace(' ', '_') or "Unbekannt"
-    date_str = datetime.now().strftime("%d%m%Y")  # z.B. "20012025"
-    file_name = f"Formular_{observer_name_sanitized}_{date_str}.xlsx"
-
-    temp_dir = tempfile.gettempdir()
-    file_path = os.path.join(temp_dir, file_name)
-
-    # --------------------------------------------------
-    # 2) Workbook & Worksheets
-    # --------------------------------------------------
-    workbook = xlsxwriter.Workbook(file_path)
-
-    # Hauptsheet (wird später geschützt)
-    worksheet = workbook.add_worksheet("Formular-Auswertung")
-    # Leeres Anleitungs-Sheet
-    guide_sheet = workbook.add_worksheet("Anleitung")
-
-    # --------------------------------------------------
-    # 3) Formatierungen
-    # --------------------------------------------------
+from .models import Question
+from .report_store import report_key, model_fingerprint, get_or_create_report, email_delivery
+from .metrics import track_email
+
+logger = logging.getLogger(__name__)
+
+# MIME-Typ für angehängte .xlsx-Dateien
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Cache-Schlüssel für die vorberechneten Layout-Daten eines Formulars
+FORM_LAYOUT_CACHE_KEY = "dueb:form_layout:{form_id}"
+
+# Deutsch-Mapping für den Antworttyp
+ANSWER_TYPE_MAP = {
+    'none': 'Keine',
+    'checkbox': 'Checkbox',
+    'dropdown': 'Auswahlmenü',
+    'scale': 'Skala',
+    'image': 'Bild'
+}
+
+# Zellformate der Formular-Auswertung. Die Eigenschaften sind unveränderlich und werden
+# nur einmal definiert; pro Arbeitsmappe müssen die Format-Objekte aber neu angelegt
+# werden, da xlsxwriter sie an die jeweilige Arbeitsmappe bindet.
+CELL_FORMATS = {
     # a) Standard-Format: gesperrt, Rahmen, Zeilenumbruch
-    locked_bordered_format = workbook.add_format({
+    'locked_bordered': {
         'locked': True,
         'border': 1,
         'text_wrap': True,
         'valign': 'top',
         'bg_color': '#F2F2F2',  # Hellgrau → gesperrt
-    })
-
+    },
     # b) Format für Zellen, die bearbeitet werden dürfen (unlocked)
-    unlocked_bordered_format = workbook.add_format({
+    'unlocked_bordered': {
         'locked': False,
         'border': 1,
         'text_wrap': True,
         'valign': 'top',
         'bg_color': '#FFFFFF',  # Weiß → editierbar
-    })
-
+    },
     # c) Kopfzeilen-Format (gesperrt + fett + grauer Hintergrund, zentriert)
-    header_format = workbook.add_format({
+    'header': {
         'bold': True,
         'locked': True,
         'border': 1,
         'bg_color': '#D0CECE',
         'valign': 'top',
         'align': 'center',
-    })
-
+    },
     # d) Fettschrift (gesperrt)
-    bold_format = workbook.add_format({
+    'bold': {
         'bold': True,
         'locked': True
-    })
-
+    },
     # e) Weiß ohne Rahmen (für Leerzeilen u. ä., entsperrt)
-    white_no_border = workbook.add_format({
+    'white_no_border': {
         'bg_color': '#FFFFFF',
         'border': 0,
         'locked': False
-    })
-
+    },
     # f) Format für zentrierten Hinweis (Zeile 6)
-    centered_bold_wrap = workbook.add_format({
+    'centered_bold_wrap': {
         'bold': True,
         'text_wrap': True,
         'align': 'center',
         'valign': 'vcenter',
         'locked': True
-    })
-
+    },
     # g) Format für zusammengeführte Zellen Zeile 7 (dicker Rahmen, zentriert)
-    merged_header_center = workbook.add_format({
+    'merged_header_center': {
         'bold': True,
         'locked': True,
         'border': 2,  # dickerer Rahmen
         'bg_color': '#D0CECE',
         'align': 'center',
         'valign': 'vcenter'
-    })
-
-    # h) Format für "Keine Antwort erforderlich" (gesperrt)
-    locked_message_format = workbook.add_format({
+    },
+    # h) Format für "Keine Antwort erforderlich" bzw. "Keine Freitext-Antwort erforderlich" (gesperrt)
+    'locked_message': {
         'locked': True,
         'border': 1,
         'text_wrap': True,
         'valign': 'top',
         'bg_color': '#F2F2F2',  # Hellgrau
         'align': 'center'
-    })
+    },
+    # i) Gelbe Markierung leerer Antwortzellen (bedingte Formatierung)
+    'highlight_blank': {
+        'bg_color': '#FFFF00'
+    },
+}
+
+# Datenvalidierungen für Spalte E je Antworttyp ("none"/"image" => keine Validierung)
+CHECKBOX_VALIDATION = {
+    'validate': 'any',
+    'input_title': 'Mehrfachauswahl möglich',
+    'input_message': (
+        "Geben Sie mehrere Antworten ein.\n"
+        "Pro Antwort Zeilenumbruch (ALT+ENTER)\n"
+        "und trennen/enden Sie sie mit Semikolon."
+    )
+}
 
-    # i) Format für "Keine Freitext-Antwort erforderlich" (gesperrt)
-    locked_freetext_format = workbook.add_format({
-        'locked': True,
-        'border': 1,
-        'text_wrap': True,
-        'valign': 'top',
-        'bg_color': '#F2F2F2',
-        'align': 'center'
-    })
+SCALE_VALIDATION = {
+    'validate': 'integer',
+    'criteria': 'between',
+    'minimum': 1,
+    'maximum': 10,
+    'input_title': 'Skala 1–10',
+    'input_message': 'Bitte einen Wert zwischen 1 und 10 eingeben.'
+}
 
-    # Deutsch-Mapping für den Antworttyp
-    answer_type_map = {
-        'none': 'Keine',
-        'checkbox': 'Checkbox',
-        'dropdown': 'Auswahlmenü',
-        'scale': 'Skala',
-        'image': 'Bild'
-    }
+
+# --------------------------------------------------
+# 1) LAYOUT-DATEN DES FORMULARS (GECACHT)
+# --------------------------------------------------
+def build_form_layout(form_id):
+    """
+    Lädt den Fragen-/Optionsbaum eines Formulars mit einer einzigen Prefetch-Abfrage
+    und berechnet daraus alle antwortunabhängigen Angaben für die Excel-Auswertung.
+
+    Gibt eine Liste von Dictionaries (eines pro Frage) zurück, die nur einfache
+    Python-Datentypen enthalten und daher im Cache abgelegt werden können.
+    """
+    questions = (
+        Question.objects
+        .filter(form_id=form_id)
+        .order_by('id')
+        .prefetch_related('options')
+    )
+
+    layout = []
+    for question in questions:
+        option_type = question.option_type or "none"
+        options = [(opt.id, opt.label) for opt in question.options.all()]
+
+        # Spalte D: Optionsliste (nur Anzeige)
+        bullet_options = []
+        if option_type in ["checkbox", "dropdown"]:
+            bullet_options = [label for _opt_id, label in options]
+
+        if option_type == "checkbox":
+            validation = CHECKBOX_VALIDATION
+        elif option_type == "dropdown":
+            validation = {
+                'validate': 'list',
+                'source': bullet_options if bullet_options else ["(Keine Optionen vorhanden)"],
+                'input_title': 'Mögliche Werte',
+                'input_message': 'Wählen Sie genau eine Option aus.'
+            }
+        elif option_type == "scale":
+            validation = SCALE_VALIDATION
+        else:
+            validation = None
+
+        layout.append({
+            'id': question.id,
+            'text': question.question_text or "",
+            'option_type': option_type,
+            'mapped_answer_type': ANSWER_TYPE_MAP.get(option_type, option_type),
+            'options': options,
+            'options_list': "\n".join(f"• {o}" for o in bullet_options),
+            'input_field_added': question.input_field_added,
+            'validation': validation,
+        })
+    return layout
+
+
+def get_form_layout(form_id):
+    """
+    Gibt die Layout-Daten eines Formulars aus dem Cache zurück und berechnet sie
+    bei Bedarf neu. Der Eintrag bleibt gültig, bis invalidate_form_layout() nach
+    einer Änderung an Formular, Frage oder Option aufgerufen wird (siehe signals.py).
+    """
+    key = FORM_LAYOUT_CACHE_KEY.format(form_id=form_id)
+    layout = cache.get(key)
+    if layout is None:
+        layout = build_form_layout(form_id)
+        cache.set(key, layout, None)
+    return layout
+
+
+def invalidate_form_layout(form_id):
+    """Verwirft die gecachten Layout-Daten eines Formulars"""
+    cache.delete(FORM_LAYOUT_CACHE_KEY.format(form_id=form_id))
+
+
+# --------------------------------------------------
+# 2) EXCEL-DATEI GENERIERUNG
+# --------------------------------------------------
+def form_response_file_name(form_response):
+    """Dateiname der Auswertung, z.B. "Formular_Max_Mustermann_20012025.xlsx" """
+    observer_name_sanitized = form_response.observer_name.replace(' ', '_') or "Unbekannt"
+    date_str = datetime.now().strftime("%d%m%Y")  # z.B. "20012025"
+    return f"Formular_{observer_name_sanitized}_{date_str}.xlsx"
+
+
+def generate_excel_file(form_response):
+    """
+    Generiert eine Excel-Datei mit den Daten aus dem FormResponse vollständig im
+    Arbeitsspeicher. Gibt ein Tupel (Dateiname, Dateiinhalt als bytes) zurück.
+
+    Bei Checkbox-Fragen erlaubt wir Mehrfachauswahl:
+    - Validation: "any" (Erlaubt alle Werte)
+    - input_message: beschreibt, wie der Nutzer Zeilenumbrüche (ALT+ENTER) und
+      Semikolons verwenden soll.
+    """
+
+    # --------------------------------------------------
+    # 1) Dateiname
+    # --------------------------------------------------
+    file_name = form_response_file_name(form_response)
+
+    # Fragen und Optionen (ggf. aus dem Cache) – danach keine weiteren DB-Zugriffe
+    layout = get_form_layout(form_response.form_id)
+
+    # --------------------------------------------------
+    # 2) Workbook & Worksheets
+    # --------------------------------------------------
+    # Kein Zwischenspeichern auf der Festplatte: parallele Einsendungen desselben
+    # Beobachters können sich so nicht mehr gegenseitig die Datei überschreiben.
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+
+    # Hauptsheet (wird später geschützt)
+    worksheet = workbook.add_worksheet("Formular-Auswertung")
+    # Leeres Anleitungs-Sheet
+    guide_sheet = workbook.add_worksheet("Anleitung")
+
+    # --------------------------------------------------
+    # 3) Formatierungen
+    # --------------------------------------------------
+    formats = {name: workbook.add_format(props) for name, props in CELL_FORMATS.items()}
+    locked_bordered_format = formats['locked_bordered']
+    unlocked_bordered_format = formats['unlocked_bordered']
+    header_format = formats['header']
+    bold_format = formats['bold']
+    white_no_border = formats['white_no_border']
+    centered_bold_wrap = formats['centered_bold_wrap']
+    merged_header_center = formats['merged_header_center']
+    locked_message_format = formats['locked_message']
 
     # --------------------------------------------------
     # 4) Schreibschutz nur ab Zeile 8 für Spalten A–D
@@ -199,52 +316,44 @@ def generate_excel_file(form_response):
     # --------------------------------------------------
     # 7) Fragen/Antworten aus form_response
     # --------------------------------------------------
-    questions = form_response.form.questions.all()
     responses = form_response.responses or {}
     picker_selections = form_response.picker_selections or {}
     scale_values = form_response.scale_values or {}
     timestamps = form_response.timestamps or {}
 
     row = start_row + 1  # ab Zeile 9
-    for idx, question in enumerate(questions, start=1):
-        q_text = question.question_text or ""
-        original_answer_type = question.option_type or "none"
-        mapped_answer_type = answer_type_map.get(original_answer_type, original_answer_type)
-
-        # Spalte D: Optionsliste (nur Anzeige)
-        bullet_options = []
-        if original_answer_type in ["checkbox", "dropdown"]:
-            bullet_options = [opt.label for opt in question.options.all()]
-        options_list = "\n".join(f"• {o}" for o in bullet_options)
+    for idx, question in enumerate(layout, start=1):
+        question_id = str(question['id'])
+        original_answer_type = question['option_type']
+        mapped_answer_type = question['mapped_answer_type']
 
         # Spalte E: Ausgewählte Antwort(en)
         if original_answer_type == "checkbox":
             # Mehrfachauswahl => Values in responses[f"{question.id}_{opt.id}"] = bool
-            selected_opts = []
-            for opt in question.options.all():
-                key = f"{question.id}_{opt.id}"
-                if responses.get(key):
-                    selected_opts.append(opt.label)
+            selected_opts = [
+                label for opt_id, label in question['options']
+                if responses.get(f"{question_id}_{opt_id}")
+            ]
             # semikolon-getrennte Darstellung
             user_answer = ";".join(selected_opts)
 
         elif original_answer_type == "dropdown":
-            user_answer = picker_selections.get(str(question.id), "")
+            user_answer = picker_selections.get(question_id, "")
         elif original_answer_type == "scale":
-            user_answer = str(scale_values.get(str(question.id), ""))
+            user_answer = str(scale_values.get(question_id, ""))
         else:
             user_answer = ""
 
         # Spalte F: Freitext
-        if question.input_field_added:
-            free_text_answer = responses.get(str(question.id), "")
+        if question['input_field_added']:
+            free_text_answer = responses.get(question_id, "")
         else:
             free_text_answer = "Keine Freitext-Antwort erforderlich"
 
         # Spalte G: Zeitstempel
         ts_entries = []
-        if str(question.id) in timestamps:
-            for i, ts_obj in enumerate(timestamps[str(question.id)], start=1):
+        if question_id in timestamps:
+            for i, ts_obj in enumerate(timestamps[question_id], start=1):
                 line = f"{i}) {ts_obj.get('timestamp', '')}"
                 if ts_obj.get("note"):
                     line += f"\n   Notiz: {ts_obj['note']}"
@@ -253,12 +362,12 @@ def generate_excel_file(form_response):
 
         # Zusammenbauen der Zeile
         row_data = [
-            idx,                # Spalte A: Frage #
-            q_text,             # Spalte B
-            mapped_answer_type, # Spalte C
-            options_list,       # Spalte D
-            user_answer,        # Spalte E
-            free_text_answer,   # Spalte F
+            idx,                      # Spalte A: Frage #
+            question['text'],         # Spalte B
+            mapped_answer_type,       # Spalte C
+            question['options_list'], # Spalte D
+            user_answer,              # Spalte E
+            free_text_answer,         # Spalte F
             question_timestamps_str,  # Spalte G
         ]
 
@@ -267,41 +376,15 @@ def generate_excel_file(form_response):
             if col_num == 4 and mapped_answer_type == "Keine":
                 # Spalte E + "Keine" => gesperrt
                 worksheet.write(row, col_num, "Keine Antwort erforderlich", locked_message_format)
-            elif col_num == 5 and not question.input_field_added:
+            elif col_num == 5 and not question['input_field_added']:
                 # Spalte F + kein Freitext => gesperrt
-                worksheet.write(row, col_num, "Keine Freitext-Antwort erforderlich", locked_freetext_format)
+                worksheet.write(row, col_num, "Keine Freitext-Antwort erforderlich", locked_message_format)
             else:
                 worksheet.write(row, col_num, value)
 
-        # Datenvalidierung in Spalte E
-        if original_answer_type == "checkbox":
-            worksheet.data_validation(row, 4, row, 4, {
-                'validate': 'any',
-                'input_title': 'Mehrfachauswahl möglich',
-                'input_message': (
-                    "Geben Sie mehrere Antworten ein.\n"
-                    "Pro Antwort Zeilenumbruch (ALT+ENTER)\n"
-                    "und trennen/enden Sie sie mit Semikolon."
-                )
-            })
-        elif original_answer_type == "dropdown":
-            source = bullet_options if bullet_options else ["(Keine Optionen vorhanden)"]
-            worksheet.data_validation(row, 4, row, 4, {
-                'validate': 'list',
-                'source': source,
-                'input_title': 'Mögliche Werte',
-                'input_message': 'Wählen Sie genau eine Option aus.'
-            })
-        elif original_answer_type == "scale":
-            worksheet.data_validation(row, 4, row, 4, {
-                'validate': 'integer',
-                'criteria': 'between',
-                'minimum': 1,
-                'maximum': 10,
-                'input_title': 'Skala 1–10',
-                'input_message': 'Bitte einen Wert zwischen 1 und 10 eingeben.'
-            })
-        # "none"/"image" => keine Data Validation
+        # Datenvalidierung in Spalte E (vorberechnet je Frage)
+        if question['validation']:
+            worksheet.data_validation(row, 4, row, 4, question['validation'])
 
         row += 1
 
@@ -341,11 +424,11 @@ def generate_excel_file(form_response):
         range_f = f"F9:F{last_question_row}"
         worksheet.conditional_format(
             range_e,
-            {'type': 'blanks', 'format': workbook.add_format({'bg_color': '#FFFF00'})}
+            {'type': 'blanks', 'format': formats['highlight_blank']}
         )
         worksheet.conditional_format(
             range_f,
-            {'type': 'blanks', 'format': workbook.add_format({'bg_color': '#FFFF00'})}
+            {'type': 'blanks', 'format': formats['highlight_blank']}
         )
 
     # --------------------------------------------------
@@ -359,11 +442,33 @@ def generate_excel_file(form_response):
     worksheet.protect('1234', {'objects': True, 'scenarios': True})
 
     workbook.close()
-    return file_path
+    return file_name, output.getvalue()
+
+
+def get_form_response_report(form_response):
+    """
+    Liefert die Excel-Auswertung einer Formularantwort aus dem Berichtsspeicher.
+    Der Schlüssel umfasst alle Felder der Antwort, das Formular-Layout und den
+    Dateinamen (mit Tagesdatum); bei unveränderten Daten wird die gespeicherte
+    Datei wiederverwendet.
+
+    Returns:
+        tuple: (StoredReport, Dateiinhalt als bytes)
+    """
+    file_name = form_response_file_name(form_response)
+    key = report_key(
+        'formresponse',
+        file_name,
+        model_fingerprint(form_response),
+        get_form_layout(form_response.form_id),
+    )
+    return get_or_create_report(
+        key, file_name, XLSX_MIMETYPE, lambda: generate_excel_file(form_response)[1], kind='formresponse',
+    )
 
 
 # --------------------------------------------------
-# 2) E-MAIL VERSAND
+# 3) E-MAIL VERSAND
 # --------------------------------------------------
 def send_confirmation_email(form_response):
     """
@@ -374,10 +479,11 @@ def send_confirmation_email(form_response):
     """
     if form_response.observer_email == "unknown@observer":
         # Stattdessen nur ein Log-Eintrag
-        print("[INFO] send_confirmation_email: Kein Versand, da 'unknown@observer'.")
+        logger.info("send_confirmation_email: Kein Versand, da 'unknown@observer'.")
         return
 
-    excel_file_path = generate_excel_file(form_response)
+    stored, excel_content = get_form_response_report(form_response)
+    download_url, attach = email_delivery(stored)
 
     hint_about_images = (
         "\n\nHinweis: Falls Sie Bilder zum Formular hinzugefügt haben, "
@@ -385,12 +491,21 @@ def send_confirmation_email(form_response):
         "Sie müssen nicht erneut per Mail gesendet werden."
     )
 
+    download_hint = (
+        f"\n\nDownload der Zusammenfassung: {download_url}" if download_url else ""
+    )
+
     subject = "Ihre Formularantwort"
     message = (
         f"Hallo {form_response.observer_name},\n\n"
         f"vielen Dank für das Ausfüllen des Formulars \"{form_response.form.name}\". "
-        f"Im Anhang finden Sie eine Zusammenfassung Ihrer Antworten.\n\n"
-        f"Beste Grüße,\nIhr Team"
+        + (
+            "Im Anhang finden Sie eine Zusammenfassung Ihrer Antworten.\n\n"
+            if attach else
+            "Die Zusammenfassung Ihrer Antworten können Sie über den folgenden Link herunterladen.\n\n"
+        )
+        + f"Beste Grüße,\nIhr Team"
+        + download_hint
         + hint_about_images
     )
 
@@ -401,11 +516,9 @@ def send_confirmation_email(form_response):
         [form_response.observer_email],
     )
 
-    if excel_file_path:
-        email.attach_file(excel_file_path)
+    if attach:
+        email.attach(stored.file_name, excel_content, XLSX_MIMETYPE)
 
-    email.send()
+    with track_email('confirmation'):
+        email.send()
 
-    # Temporäre Datei entfernen
-    if excel_file_path and os.path.exists(excel_file_path):
-        os.remove(excel_file_path)
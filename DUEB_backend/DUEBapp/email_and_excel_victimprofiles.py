@@ -5,26 +5,112 @@
 # email_and_excel.py ist diese Datei speziell auf die Strukturierung und Formatierung 
 # von Patientenbegleitbögen ausgerichtet, die während der Digitale Übungsbeobachtung verwendet werden.
 
-import os
-import tempfile
+import io
+import logging
 import xlsxwriter
-import copy
 from datetime import datetime
 from django.core.mail import EmailMessage
 from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from .models import TestScenarioVictim, VictimProfileResponse  # Import für Button-Nummer Zuordnung und Response-Daten
+from .email_and_excel import XLSX_MIMETYPE
+from .report_store import report_key, model_fingerprint, get_or_create_report, email_delivery
+from .metrics import track_email
+
+logger = logging.getLogger(__name__)
+
+# Felder einer VictimProfileResponse, die in die Patientenbegleitbögen übernommen werden
+RESPONSE_SHEET_FIELDS = (
+    'kh_intern',
+    'ist_sichtung',
+    'sichtung_data',
+    'diagnostik_data',
+    'therapie_data',
+    'op_team',
+    'verlauf',
+)
+
+
+# --------------------------------------------------
+# 1) DATENZEILEN FÜR DIE ARBEITSBLÄTTER
+# --------------------------------------------------
+class SheetResponse:
+    """
+    Leichtgewichtige Antwortdaten eines Patientenbegleitbogens, z.B. aus den vom
+    Frontend übermittelten profile_data. Enthält nur die Felder aus RESPONSE_SHEET_FIELDS.
+    """
+    __slots__ = RESPONSE_SHEET_FIELDS
+
+    def __init__(self, **values):
+        for field in RESPONSE_SHEET_FIELDS:
+            setattr(self, field, values.get(field))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Erzeugt die Antwortdaten aus einem profile_data-Eintrag des Frontends"""
+        values = {field: data.get(field) for field in RESPONSE_SHEET_FIELDS}
+        # Das Frontend übermittelt den Verlauf unter "verlaufseintraege"
+        if not values['verlauf']:
+            values['verlauf'] = data.get('verlaufseintraege')
+        return cls(**values)
+
+
+class PatientSheet:
+    """
+    Ein Arbeitsblatt des Excel-Berichts: Patientenprofil, Button-Nummer und
+    (optional) die zugehörigen Antwortdaten. Ersetzt das frühere Klonen der
+    Profil-Objekte mit angehängten Attributen.
+    """
+    __slots__ = ('profile', 'button_number', 'response')
+
+    def __init__(self, profile, button_number=None, response=None):
+        self.profile = profile
+        self.button_number = button_number
+        self.response = response
+
+
+def latest_responses_by_button(button_numbers):
+    """
+    Lädt zu allen Button-Nummern die jeweils neueste VictimProfileResponse mit einer
+    einzigen Abfrage (Fensterfunktion ROW_NUMBER je Button-Nummer).
+    Gibt ein Dictionary Button-Nummer → VictimProfileResponse zurück.
+    """
+    button_numbers = {bn for bn in button_numbers if bn}
+    if not button_numbers:
+        return {}
+    latest = (
+        VictimProfileResponse.objects
+        .filter(button_number__in=button_numbers)
+        .annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('button_number')],
+            order_by=[F('erstellt_am').desc(), F('id').desc()],
+        ))
+        .filter(row_number=1)
+        .only('button_number', *RESPONSE_SHEET_FIELDS)
+    )
+    return {resp.button_number: resp for resp in latest}
+
 
 # --------------------------------------------------
-# 1) EXCEL-DATEI GENERIERUNG
+# 2) EXCEL-DATEI GENERIERUNG
 # --------------------------------------------------
-def generate_victim_profiles_excel_file(observer_account, profiles):
+def victim_profiles_file_name(observer_account):
+    """Dateiname der Patientenbegleitbögen, z.B. "Patientenbegleitboegen_Max_20012025.xlsx" """
+    observer_name_sanitized = getattr(observer_account, 'first_name', '').replace(' ', '_') or "Unbekannt"
+    date_str = datetime.now().strftime("%d%m%Y")  # z.B. "20012025"
+    return f"Patientenbegleitboegen_{observer_name_sanitized}_{date_str}.xlsx"
+
+
+def generate_victim_profiles_excel_file(observer_account, sheets):
     """
-    Generiert eine temporäre Excel-Datei mit den Daten aus den VictimProfiles.
-    Gibt den Pfad zur erstellten Datei zurück.
+    Generiert eine Excel-Datei mit den Daten aus den VictimProfiles im Arbeitsspeicher.
+    Gibt ein Tupel (Dateiname, Dateiinhalt als bytes) zurück.
     
     Parameter:
     - observer_account: Objekt mit first_name und email Attributen
-    - profiles: Liste von VictimProfile-Objekten oder deren „Klone".
+    - sheets: Liste von PatientSheet-Objekten (Profil, Button-Nummer, Antwortdaten).
     
     Jedes Profil erhält ein eigenes Arbeitsblatt basierend auf der Button-Nummer.
     """
@@ -32,17 +118,14 @@ def generate_victim_profiles_excel_file(observer_account, profiles):
     # --------------------------------------------------
     # 1) Dateiname erstellen
     # --------------------------------------------------
-    observer_name_sanitized = getattr(observer_account, 'first_name', '').replace(' ', '_') or "Unbekannt"
-    date_str = datetime.now().strftime("%d%m%Y")  # z.B. "20012025"
-    file_name = f"Patientenbegleitboegen_{observer_name_sanitized}_{date_str}.xlsx"
-
-    temp_dir = tempfile.gettempdir()
-    file_path = os.path.join(temp_dir, file_name)
+    file_name = victim_profiles_file_name(observer_account)
 
     # --------------------------------------------------
     # 2) Workbook & Worksheets
     # --------------------------------------------------
-    workbook = xlsxwriter.Workbook(file_path)
+    # Die Arbeitsmappe wird direkt in einen Puffer geschrieben (keine temporäre Datei)
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
     
     # --------------------------------------------------
     # 3) Standard-Formatierungen
@@ -220,7 +303,7 @@ def generate_victim_profiles_excel_file(observer_account, profiles):
     overview_sheet.write('B4', datetime.now().strftime("%d.%m.%Y"), locked_bordered_format)
     
     overview_sheet.write('C4', "Anzahl Profile:", bold_format)
-    overview_sheet.write('D4', len(profiles), locked_bordered_format)
+    overview_sheet.write('D4', len(sheets), locked_bordered_format)
     
     # Übersichtstabelle der Profile
     overview_sheet.merge_range('A6:E6', "Zusammenfassung der Profile", subheader_format)
@@ -232,15 +315,16 @@ def generate_victim_profiles_excel_file(observer_account, profiles):
     overview_sheet.write('D7', "KH interne Pat.-Nr.", overview_header_format)
     
     row = 8
-    for profile in profiles:
-        if profile is None or not hasattr(profile, 'id'):
+    for sheet in sheets:
+        profile = sheet.profile
+        if profile is None:
             continue
             
-        button_number = getattr(profile, '_button_number', None)
+        button_number = sheet.button_number
         if not button_number:
             button_number = getattr(profile, 'profile_number', None) or f"P{profile.id}"
             
-        response = getattr(profile, '_victim_response', None)
+        response = sheet.response
         
         soll_kategorie = getattr(profile, 'category', '') or ''
         ist_sichtung = ""
@@ -265,24 +349,25 @@ def generate_victim_profiles_excel_file(observer_account, profiles):
     # 5) Arbeitsblätter erstellen – pro Profil
     # --------------------------------------------------
     # Für jedes Profil wird ein separates Arbeitsblatt erstellt
-    print(f"[DEBUG] Erstelle Excel-Datei mit {len(profiles)} Profilen")
+    logger.debug("Erstelle Excel-Datei mit %s Profilen", len(sheets))
     used_sheet_names = set()
 
-    for profile in profiles:
-        if profile is None or not hasattr(profile, 'id'):
+    for sheet in sheets:
+        profile = sheet.profile
+        if profile is None:
             continue
 
         profile_id = profile.id
         
         # 1) Button-Nummer ermitteln
-        button_number = getattr(profile, '_button_number', None)
+        button_number = sheet.button_number
         if not button_number:
             button_number = getattr(profile, 'profile_number', None) or f"P{profile_id}"
         
-        # 2) Falls wir eine VictimProfileResponse-artige Struktur haben
-        response = getattr(profile, '_victim_response', None)
+        # 2) Antwortdaten (VictimProfileResponse oder SheetResponse), falls vorhanden
+        response = sheet.response
 
-        print(f"[DEBUG] Erstelle Arbeitsblatt für Profil {profile_id} mit Button {button_number}")
+        logger.debug("Erstelle Arbeitsblatt für Profil %s mit Button %s", profile_id, button_number)
 
         # Arbeitsblatt-Name
         base_sheet_name = f"Button_{button_number}"
@@ -305,7 +390,7 @@ def generate_victim_profiles_excel_file(observer_account, profiles):
         try:
             worksheet = workbook.add_worksheet(sheet_name)
         except Exception as e:
-            print(f"[ERROR] Fehler beim Erstellen des Arbeitsblatts '{sheet_name}': {e}")
+            logger.error("Fehler beim Erstellen des Arbeitsblatts '%s': %s", sheet_name, e)
             import random
             fallback_name = f"Profil_{random.randint(1000,9999)}"
             while fallback_name.lower() in used_sheet_names:
@@ -313,9 +398,9 @@ def generate_victim_profiles_excel_file(observer_account, profiles):
             used_sheet_names.add(fallback_name.lower())
             try:
                 worksheet = workbook.add_worksheet(fallback_name)
-                print(f"[INFO] Verwende Fallback-Namen '{fallback_name}' für Profil {profile_id}")
+                logger.info("Verwende Fallback-Namen '%s' für Profil %s", fallback_name, profile_id)
             except Exception as e2:
-                print(f"[ERROR] Auch Fallback-Name konnte nicht erstellt werden: {e2}")
+                logger.error("Auch Fallback-Name konnte nicht erstellt werden: %s", e2)
                 continue
         
         # Zurück zu den ursprünglichen Spaltenbreiten
@@ -829,9 +914,11 @@ def generate_victim_profiles_excel_file(observer_account, profiles):
         # Fußzeile
         # --------------------------------------------------
         current_row += 2  # Zwei Leerzeilen vor der Fußzeile
+        # Nur das Datum: die Datei wird über den Berichtsschlüssel (mit Tagesdatum im
+        # Dateinamen) im Laufe des Tages wiederverwendet, eine Uhrzeit wäre dann falsch
         worksheet.merge_range(
             f'A{current_row}:E{current_row}',
-            f"Erstellt am {datetime.now().strftime('%d.%m.%Y %H:%M')} für {observer_account.first_name} {observer_account.last_name}",
+            f"Erstellt am {datetime.now().strftime('%d.%m.%Y')} für {observer_account.first_name} {observer_account.last_name}",
             workbook.add_format({
                 'italic': True,
                 'font_color': '#666666',
@@ -843,102 +930,122 @@ def generate_victim_profiles_excel_file(observer_account, profiles):
         worksheet.protect('1234')
 
     workbook.close()
-    return file_path
+    return file_name, output.getvalue()
+
+
+def get_victim_profiles_report(observer_account, sheets):
+    """
+    Liefert die Patientenbegleitbögen aus dem Berichtsspeicher. Der Schlüssel umfasst
+    Beobachter, Dateiname (mit Tagesdatum) sowie Profil, Button-Nummer und Antwortdaten
+    jedes Arbeitsblatts; bei unveränderten Daten wird die gespeicherte Datei wiederverwendet.
+
+    Returns:
+        tuple: (StoredReport, Dateiinhalt als bytes)
+    """
+    file_name = victim_profiles_file_name(observer_account)
+    key = report_key(
+        'victimprofiles',
+        file_name,
+        [getattr(observer_account, attr, '') for attr in ('first_name', 'last_name', 'email')],
+        [
+            [
+                model_fingerprint(sheet.profile),
+                sheet.button_number,
+                [getattr(sheet.response, field, None) for field in RESPONSE_SHEET_FIELDS] if sheet.response else None,
+            ]
+            for sheet in sheets
+        ],
+    )
+    return get_or_create_report(
+        key, file_name, XLSX_MIMETYPE,
+        lambda: generate_victim_profiles_excel_file(observer_account, sheets)[1],
+        kind='victimprofiles',
+    )
 
 
 # --------------------------------------------------
-# 2) E-MAIL VERSAND
+# 3) E-MAIL VERSAND
 # --------------------------------------------------
-def send_victimprofiles_email(observer_account, profiles, profile_data=None):
+def send_victimprofiles_email(observer_account, sheets, profile_data=None):
     """
     Sendet eine E-Mail mit angehängter Excel-Zusammenfassung der VictimProfiles.
     
     Pro Button/Profil ein eigenes Tabellenblatt. Falls in profile_data
-    nutzerspezifische Daten enthalten sind, werden sie einem 
-    geklonten Profil-Objekt zugewiesen.
+    nutzerspezifische Daten enthalten sind, werden sie als SheetResponse
+    übernommen; andernfalls werden die neuesten gespeicherten Antworten aller
+    Button-Nummern mit einer einzigen Abfrage geladen.
+
+    Gibt den gespeicherten Bericht (StoredReport) zurück, oder None, wenn nichts
+    versendet wurde.
     """
     try:
         # Validiere Eingabedaten
         if not observer_account or not hasattr(observer_account, 'email') or not observer_account.email:
-            print("[INFO] send_victimprofiles_email: Kein Versand, da kein Observer-Account oder keine E-Mail.")
+            logger.info("send_victimprofiles_email: Kein Versand, da kein Observer-Account oder keine E-Mail.")
             return
         if observer_account.email == "unknown@observer":
-            print("[INFO] send_victimprofiles_email: Kein Versand, da 'unknown@observer'.")
+            logger.info("send_victimprofiles_email: Kein Versand, da 'unknown@observer'.")
             return
-        if not profiles:
-            print("[INFO] Keine Profile für E-Mail-Versand übergeben.")
+        if not sheets:
+            logger.info("Keine Profile für E-Mail-Versand übergeben.")
             return
 
-        # Jedes Profile → ein Klon
-        valid_profiles = []
+        valid_sheets = []
 
         # Wenn zusätzliche Profildaten vorhanden sind, diese für die Excel-Generierung verwenden
         if profile_data and isinstance(profile_data, list):
-            print(f"[DEBUG] Profile-Daten direkt verwendet für Excel-Generierung: {len(profile_data)} Einträge")
-            for idx, original_profile in enumerate(profiles):
-                if not original_profile:
+            logger.debug("Profile-Daten direkt verwendet für Excel-Generierung: %s Einträge", len(profile_data))
+            # Zuordnung über die Button-Nummer, falls die Reihenfolge nicht 1:1 sein sollte
+            data_by_button = {}
+            for pd in profile_data:
+                if isinstance(pd, dict) and pd.get('button_number'):
+                    data_by_button.setdefault(pd['button_number'], pd)
+
+            for idx, sheet in enumerate(sheets):
+                if not sheet or sheet.profile is None:
                     continue
-                
-                cloned_profile = copy.copy(original_profile)
-                
-                # Versuche hier, passendes data_item anhand button_number zu finden
-                # falls die Reihenfolge nicht 1:1 sein sollte
-                data_item = None
-                bn = getattr(original_profile, '_button_number', None)
-                if bn:
-                    for pd in profile_data:
-                        if pd.get('button_number') == bn:
-                            data_item = pd
-                            break
-                
+
+                data_item = data_by_button.get(sheet.button_number) if sheet.button_number else None
                 if not data_item and idx < len(profile_data):
                     data_item = profile_data[idx]
-                
+
                 if data_item:
-                    btn_number = data_item.get('button_number', '')
-                    setattr(cloned_profile, '_button_number', btn_number)
-                    
-                    response_obj = type('VictimProfileResponse', (), {})()
-                    for key, value in data_item.items():
-                        setattr(response_obj, key, value)
-                    
-                    setattr(cloned_profile, '_victim_response', response_obj)
+                    valid_sheets.append(PatientSheet(
+                        sheet.profile,
+                        data_item.get('button_number', ''),
+                        SheetResponse.from_dict(data_item),
+                    ))
                 else:
                     # minimal fallback
-                    setattr(cloned_profile, '_button_number', getattr(original_profile, 'profile_number', None))
-                    setattr(cloned_profile, '_victim_response', None)
-                
-                valid_profiles.append(cloned_profile)
+                    valid_sheets.append(PatientSheet(sheet.profile, sheet.profile.profile_number))
         else:
-            # Fallback: Daten aus der Datenbank verwenden
-            for p in profiles:
-                if not p or not hasattr(p, 'id'):
+            # Fallback: neueste Antworten aller Button-Nummern aus der Datenbank (eine Abfrage)
+            for sheet in sheets:
+                if not sheet or sheet.profile is None:
                     continue
-                btn_num = getattr(p, '_button_number', None) or p.profile_number or f"P{p.id}"
-
-                cloned_profile = copy.copy(p)
-                setattr(cloned_profile, '_button_number', btn_num)
-                
-                # VictimProfileResponse?
-                try:
-                    response = VictimProfileResponse.objects.filter(button_number=btn_num).first()
-                    setattr(cloned_profile, '_victim_response', response)
-                except Exception as e:
-                    print(f"[ERROR] Konnte Response nicht abrufen: {e}")
-                    setattr(cloned_profile, '_victim_response', None)
-                
-                valid_profiles.append(cloned_profile)
+                p = sheet.profile
+                btn_num = sheet.button_number or p.profile_number or f"P{p.id}"
+                valid_sheets.append(PatientSheet(p, btn_num))
+
+            try:
+                responses = latest_responses_by_button(s.button_number for s in valid_sheets)
+            except Exception as e:
+                logger.error("Konnte Responses nicht abrufen: %s", e)
+                responses = {}
+            for sheet in valid_sheets:
+                sheet.response = responses.get(sheet.button_number)
 
         # Listenanzeige für E-Mail-Text erstellen
         profile_info = []
-        for vp in valid_profiles:
-            bnn = getattr(vp, '_button_number', 'Unbekannt')
-            cat = getattr(vp, 'category', '')
+        for sheet in valid_sheets:
+            bnn = sheet.button_number or 'Unbekannt'
+            cat = sheet.profile.category or ''
             profile_info.append(f"• Button/Profil {bnn} ({cat})")
         profile_list_text = "\n".join(profile_info)
         
-        # Excel-Datei generieren
-        excel_file_path = generate_victim_profiles_excel_file(observer_account, valid_profiles)
+        # Excel-Datei generieren bzw. aus dem Berichtsspeicher laden
+        stored, excel_content = get_victim_profiles_report(observer_account, valid_sheets)
+        download_url, attach = email_delivery(stored)
         
         # Vor- und Nachname des Beobachters für die E-Mail-Begrüßung
         observer_name = f"{getattr(observer_account, 'first_name', '')} {getattr(observer_account, 'last_name', '')}"
@@ -949,15 +1056,20 @@ def send_victimprofiles_email(observer_account, profiles, profile_data=None):
         message = (
             f"Hallo {observer_name},\n\n"
             f"vielen Dank für Ihre Teilnahme an der Krankenhausübung. "
-            f"Im Anhang finden Sie eine Excel-Datei mit den Patientenbegleitbögen "
-            f"für folgende Patienten:\n\n"
+            + (
+                "Im Anhang finden Sie eine Excel-Datei mit den Patientenbegleitbögen "
+                if attach else
+                "Über den unten stehenden Link erhalten Sie eine Excel-Datei mit den Patientenbegleitbögen "
+            )
+            + f"für folgende Patienten:\n\n"
             f"{profile_list_text}\n\n"
             f"Sie können die Daten in der Excel-Datei einsehen und die weißen Felder "
             f"bei Bedarf bearbeiten. Die gelb markierten Felder benötigen Ihre Eingabe. "
             f"Die grauen Felder enthalten die Originaldaten und sind zum Schutz gesperrt "
             f"(Kennwort: 1234).\n\n"
             f"Das Übersichtsblatt enthält eine Zusammenfassung aller Profile.\n\n"
-            f"Beste Grüße,\n"
+            + (f"Download der Excel-Datei: {download_url}\n\n" if download_url else "")
+            + f"Beste Grüße,\n"
             f"Ihr DÜB-Team"
         )
 
@@ -969,24 +1081,18 @@ def send_victimprofiles_email(observer_account, profiles, profile_data=None):
             [observer_account.email],
         )
         
-        if excel_file_path and os.path.exists(excel_file_path):
-            email.attach_file(excel_file_path)
+        if excel_content:
+            if attach:
+                email.attach(stored.file_name, excel_content, XLSX_MIMETYPE)
             try:
-                email.send()
-                print(f"[INFO] E-Mail mit Patientenbegleitbögen erfolgreich an {observer_account.email} versendet.")
+                with track_email('victimprofiles'):
+                    email.send()
+                logger.info("E-Mail mit Patientenbegleitbögen erfolgreich an %s versendet.", observer_account.email)
             except Exception as e:
-                print(f"[ERROR] Fehler beim Senden der E-Mail: {e}")
+                logger.exception("Fehler beim Senden der E-Mail: %s", e)
+            return stored
         else:
-            print("[ERROR] Excel-Datei existiert nicht oder wurde nicht erfolgreich erstellt.")
-        
-        # Temporäre Datei löschen
-        if excel_file_path and os.path.exists(excel_file_path):
-            try:
-                os.remove(excel_file_path)
-            except Exception as e:
-                print(f"[WARNING] Konnte temporäre Datei nicht löschen: {e}")
+            logger.error("Excel-Datei wurde nicht erfolgreich erstellt.")
 
     except Exception as e:
-        import traceback
-        print("[ERROR] Unerwarteter Fehler beim E-Mail-Versand:", e)
-        print("[ERROR] Details:", traceback.format_exc())
\ No newline at end of file
+        logger.exception("Unerwarteter Fehler beim E-Mail-Versand: %s", e)
\ No newline at end of file
@@ -0,0 +1,248 @@
+# exercise_data.py - Realistische Übungsdaten für Lasttests und Benchmarks
+#
+# Erzeugt die JSON-Inhalte, die die App während einer Übung sendet (Formularantworten
+# und Patientenbegleitbögen), im selben Format wie die echten Geräte:
+#   - FormResponse.responses          {"<Frage-ID>_<Option-ID>": true, "<Frage-ID>": "Freitext"}
+#   - FormResponse.picker_selections  {"<Frage-ID>": "<Label>"}
+#   - FormResponse.scale_values       {"<Frage-ID>": 3}
+#   - FormResponse.timestamps         {"<Frage-ID>": [{"timestamp": "19.10.2026, 14:05", "note": ...}]}
+#   - VictimProfileResponse.verlauf   [{"uhrzeit": "14:05", "khBereich": ..., "beobachtungen": ...}]
+#
+# Alle Funktionen erhalten einen random.Random-Generator; mit demselben Startwert entstehen
+# dieselben Daten. Verwendet von den Management-Befehlen loadtest_exercise und seed_exercise.
+
+from datetime import timedelta
+
+# Sichtungskategorien und typische Inhalte einer Übung
+CATEGORIES = ("SK 1", "SK 2", "SK 3", "SK 4")
+DIAGNOSES = (
+    "Polytrauma mit Beckenfraktur und Milzruptur",
+    "Offene Unterschenkelfraktur links",
+    "Schädel-Hirn-Trauma Grad II",
+    "Verbrennung 2. Grades an beiden Unterarmen",
+    "Prellung Thorax rechts",
+    "Spannungspneumothorax rechts",
+    "Distale Radiusfraktur rechts",
+    "Rauchgasintoxikation",
+    "Amputationsverletzung Hand links",
+    "Akutes Abdomen nach stumpfem Bauchtrauma",
+)
+VISUAL_DIAGNOSES = ("blass, kaltschweißig", "ansprechbar, orientiert", "somnolent", "Blutung Oberschenkel", "Zyanose")
+HOSPITAL_AREAS = ("Sichtung", "Schockraum", "OP", "Intensivstation", "Normalstation", "Notaufnahme", "Radiologie")
+OBSERVATIONS = (
+    "Übergabe vollständig",
+    "Wartezeit auf Arzt",
+    "Monitoring angeschlossen",
+    "Zugang gelegt",
+    "Patient verlegt",
+    "Rückfrage zur Sichtung",
+    "Dokumentation unvollständig",
+)
+FREE_TEXTS = (
+    "Ablauf ohne Auffälligkeiten",
+    "Kommunikation zwischen den Teams gut",
+    "Material fehlte kurzzeitig",
+    "Verzögerung bei der Anmeldung",
+    "Zuständigkeit unklar",
+)
+SPECIALTIES = ("Unfallchirurgie", "Allgemeinchirurgie", "Neurochirurgie", "Innere Medizin", "Anästhesie")
+FIRST_NAMES = ("Anna", "Ben", "Clara", "David", "Eva", "Felix", "Greta", "Hannes", "Ida", "Jonas", "Lena", "Moritz")
+LAST_NAMES = ("Becker", "Fischer", "Hoffmann", "Koch", "Meyer", "Neumann", "Richter", "Schulz", "Wagner", "Weber")
+MEASURES = ("Sauerstoffgabe", "Beckenschlinge", "Tourniquet", "Intubation", "Analgesie", "Volumengabe", "Thoraxdrainage")
+EXAMINATIONS = ("Sonographie (FAST)", "Röntgen Thorax", "CT Polytrauma", "Labor", "BGA", "EKG")
+
+# Format der Zeitstempel auf den Geräten
+DEVICE_TIME_FORMAT = "%d.%m.%Y, %H:%M"
+
+
+# --------------------------------------------------
+# 1) FORMULARANTWORTEN
+# --------------------------------------------------
+def device_time(moment):
+    """Zeitstempel im Format der Geräte ("19.10.2026, 14:05")"""
+    return moment.strftime(DEVICE_TIME_FORMAT)
+
+
+def form_response_payload(rng, layout, observed_at, answer_rate=0.8, timestamp_rate=0.3):
+    """
+    Inhalt einer Formularantwort zum Layout eines Formulars (siehe get_form_layout).
+
+    Parameters:
+        rng (random.Random): Zufallsgenerator
+        layout (list): Fragen des Formulars
+        observed_at (datetime): Beginn der Beobachtung (für die Zeitstempel)
+        answer_rate (float): Anteil der beantworteten Fragen
+        timestamp_rate (float): Anteil der beantworteten Fragen mit Zeitstempel
+
+    Returns:
+        dict: Felder responses, picker_selections, scale_values, timestamps, note, note_timestamps
+    """
+    responses = {}
+    picker_selections = {}
+    scale_values = {}
+    timestamps = {}
+    moment = observed_at
+
+    for question in layout:
+        if rng.random() > answer_rate:
+            continue
+        qid = str(question['id'])
+        options = question['options']
+        option_type = question['option_type']
+
+        if option_type == 'checkbox' and options:
+            for opt_id, _label in rng.sample(options, rng.randint(1, min(3, len(options)))):
+                responses[f"{qid}_{opt_id}"] = True
+        elif option_type == 'dropdown' and options:
+            picker_selections[qid] = rng.choice(options)[1]
+        elif option_type == 'scale':
+            scale_values[qid] = rng.randint(1, 5)
+
+        if question['input_field_added'] and rng.random() < 0.5:
+            responses[qid] = rng.choice(FREE_TEXTS)
+
+        if rng.random() < timestamp_rate:
+            moment += timedelta(minutes=rng.randint(1, 6))
+            timestamps[qid] = [{"timestamp": device_time(moment), "note": rng.choice(OBSERVATIONS)}]
+
+    note_timestamps = [
+        {"timestamp": device_time(observed_at + timedelta(minutes=5 * index)), "note": rng.choice(FREE_TEXTS)}
+        for index in range(rng.randint(0, 3))
+    ]
+    return {
+        'responses': responses,
+        'picker_selections': picker_selections,
+        'scale_values': scale_values,
+        'timestamps': timestamps,
+        'note': rng.choice(FREE_TEXTS) if rng.random() < 0.4 else "",
+        'note_timestamps': note_timestamps,
+    }
+
+
+def observer_identity(rng, domain="example.org"):
+    """Name und E-Mail-Adresse eines Beobachters, z.B. ("Anna Becker", "anna.becker@example.org")"""
+    first_name = rng.choice(FIRST_NAMES)
+    last_name = rng.choice(LAST_NAMES)
+    return f"{first_name} {last_name}", f"{first_name}.{last_name}@{domain}".lower()
+
+
+# --------------------------------------------------
+# 2) PATIENTENBEGLEITBÖGEN
+# --------------------------------------------------
+def _shifted_category(rng, category):
+    """IST-Sichtung: meist korrekt, sonst eine Kategorie daneben (Über-/Untertriage)"""
+    if category not in CATEGORIES or rng.random() < 0.75:
+        return category
+    index = CATEGORIES.index(category) + rng.choice((-1, 1))
+    return CATEGORIES[min(max(index, 0), len(CATEGORIES) - 1)]
+
+
+def victim_response_payload(rng, button_number, category, observed_at):
+    """
+    Inhalt eines Patientenbegleitbogens (VictimProfileResponse ohne Beobachterangaben).
+
+    Parameters:
+        rng (random.Random): Zufallsgenerator
+        button_number (str): Button-Nummer des Patienten
+        category (str): SOLL-Sichtungskategorie des Profils
+        observed_at (datetime): Beginn der Beobachtung
+
+    Returns:
+        dict: Felder des Modells (JSON-fähig)
+    """
+    moment = observed_at
+    verlauf = []
+    for _index in range(rng.randint(2, 10)):
+        moment += timedelta(minutes=rng.randint(2, 15))
+        verlauf.append({
+            "uhrzeit": moment.strftime("%H:%M"),
+            "khBereich": rng.choice(HOSPITAL_AREAS),
+            "beobachtungen": rng.choice(OBSERVATIONS),
+        })
+
+    return {
+        'button_number': button_number,
+        'kh_intern': f"KH-{rng.randint(1000, 9999)}",
+        'soll_sichtung': category,
+        'diagnostic_loaded': {
+            "diagnosis": rng.choice(DIAGNOSES),
+            "visual": rng.choice(VISUAL_DIAGNOSES),
+            "findings": "",
+            "symptoms": "",
+        },
+        'vitalwerte': {
+            "gcs": str(rng.randint(3, 15)),
+            "spo2": str(rng.randint(82, 100)),
+            "rekap": f"{rng.randint(1, 4)} s",
+            "resp_rate": str(rng.randint(8, 35)),
+            "sys_rr": str(rng.randint(70, 180)),
+            "ekg": rng.choice(("Sinusrhythmus", "Sinustachykardie", "Vorhofflimmern")),
+            "hb": f"{rng.uniform(7.0, 16.0):.1f}",
+        },
+        'ist_sichtung': _shifted_category(rng, category),
+        'sichtung_data': [
+            {"punkt": "Sichtung", "uhrzeit": observed_at.strftime("%H:%M"), "kategorie": category},
+        ],
+        'diagnostik_data': [
+            {"untersuchung": name, "uhrzeit": (observed_at + timedelta(minutes=10 + 5 * index)).strftime("%H:%M")}
+            for index, name in enumerate(rng.sample(EXAMINATIONS, rng.randint(1, 3)))
+        ],
+        'therapie_data': [
+            {"massnahme": name, "uhrzeit": (observed_at + timedelta(minutes=5 + 5 * index)).strftime("%H:%M")}
+            for index, name in enumerate(rng.sample(MEASURES, rng.randint(1, 3)))
+        ],
+        'op_team': [
+            {"rolle": role, "anwesend": rng.random() < 0.9}
+            for role in ("Operateur", "Assistenz", "Anästhesie")
+        ] if rng.random() < 0.3 else [],
+        'verlauf': verlauf,
+    }
+
+
+# --------------------------------------------------
+# 3) PATIENTENPROFILE
+# --------------------------------------------------
+def victim_profile_fields(rng, profile_number):
+    """
+    Felder eines Patientenprofils (wie aus dem Excel-Import).
+
+    Parameters:
+        rng (random.Random): Zufallsgenerator
+        profile_number (str): Profilnummer
+
+    Returns:
+        dict: Felder des Modells VictimProfile
+    """
+    category = rng.choice(CATEGORIES)
+    critical = category == "SK 1"
+
+    def yes_no(probability):
+        return "J" if rng.random() < probability else "N"
+
+    return {
+        'profile_number': profile_number,
+        'category': category,
+        'pcz_ivena': str(rng.randint(100, 799)),
+        'expected_med_action': ", ".join(rng.sample(MEASURES, 2)),
+        'diagnosis': rng.choice(DIAGNOSES),
+        'visual_diagnosis': rng.choice(VISUAL_DIAGNOSES),
+        'findings': rng.choice(OBSERVATIONS),
+        'symptoms': rng.choice(VISUAL_DIAGNOSES),
+        'required_specialty': rng.choice(SPECIALTIES),
+        'gcs': str(rng.randint(3, 15)),
+        'spo2': str(rng.randint(82, 100)),
+        'rekap': str(rng.randint(1, 4)),
+        'resp_rate': str(rng.randint(8, 35)),
+        'sys_rr': str(rng.randint(70, 180)),
+        'ekg_monitor': rng.choice(("Sinusrhythmus", "Sinustachykardie", "Vorhofflimmern")),
+        'fast_sono': rng.choice(("unauffällig", "freie Flüssigkeit", "")),
+        'hb_value': f"{rng.uniform(7.0, 16.0):.1f}",
+        'blood_units': str(rng.randint(0, 6)) if critical else "0",
+        'red_treatment_area': yes_no(0.9 if critical else 0.1),
+        'ventilation_place': yes_no(0.6 if critical else 0.05),
+        'icu_place': yes_no(0.7 if critical else 0.1),
+        'emergency_op': yes_no(0.5 if critical else 0.05),
+        'lastname': rng.choice(LAST_NAMES),
+        'firstname': rng.choice(FIRST_NAMES),
+        'birthdate': f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(1940, 2010)}",
+    }
@@ -0,0 +1,205 @@
+# export_formresponses.py - Gesammelter Export aller Formularantworten eines Formulars
+#
+# Diese Datei erzeugt aus allen FormResponse-Objekten eines Formulars eine einzige breite
+# Tabelle (eine Zeile pro Antwort, eine Spalte pro Frage bzw. Antwortoption). Der Export
+# steht als CSV (gestreamt über StreamingHttpResponse) und als Excel-Datei (xlsxwriter im
+# constant_memory-Modus) zur Verfügung. Die Antworten werden mit .iterator() gelesen,
+# sodass der Speicherbedarf unabhängig von der Anzahl der Antworten konstant bleibt.
+
+import csv
+import re
+import tempfile
+import xlsxwriter
+from django.http import StreamingHttpResponse, FileResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from .models import FormResponse
+from .email_and_excel import get_form_layout, XLSX_MIMETYPE
+
+# Anzahl der Antworten, die pro Datenbankabfrage geladen werden
+EXPORT_CHUNK_SIZE = 500
+
+# Trennzeichen für den CSV-Export (Semikolon für deutschsprachiges Excel)
+CSV_DELIMITER = ';'
+
+# Feste Spalten am Anfang jeder Zeile
+BASE_HEADERS = [
+    "Antwort-ID",
+    "Beobachter-Name",
+    "Beobachter-Email",
+    "Eingereicht am",
+    "Allgemeine Notiz",
+    "Anzahl Zeitstempel Notiz",
+]
+
+
+# --------------------------------------------------
+# 1) SPALTENAUFBAU
+# --------------------------------------------------
+def build_export_columns(form_id):
+    """
+    Erzeugt die Spaltendefinition für den Export eines Formulars.
+
+    Gibt eine Liste von Tupeln (Überschrift, Extraktor) zurück. Jeder Extraktor ist
+    eine Funktion, die aus den entpackten JSON-Feldern einer Antwort
+    (responses, picker_selections, scale_values, timestamps) den Zellwert liefert.
+    Die Spalten werden aus dem gecachten Formular-Layout abgeleitet.
+    """
+    columns = []
+    for idx, question in enumerate(get_form_layout(form_id), start=1):
+        qid = str(question['id'])
+        prefix = f"{idx}. {question['text']}".strip()
+        option_type = question['option_type']
+
+        if option_type == 'checkbox':
+            # Eine Spalte pro Option ("x" = ausgewählt)
+            for opt_id, label in question['options']:
+                key = f"{qid}_{opt_id}"
+                columns.append((
+                    f"{prefix} [{label}]",
+                    lambda r, p, s, t, key=key: "x" if r.get(key) else "",
+                ))
+        elif option_type == 'dropdown':
+            columns.append((
+                f"{prefix} (Auswahl)",
+                lambda r, p, s, t, qid=qid: p.get(qid, ""),
+            ))
+        elif option_type == 'scale':
+            columns.append((
+                f"{prefix} (Skala)",
+                lambda r, p, s, t, qid=qid: s.get(qid, ""),
+            ))
+
+        if question['input_field_added']:
+            columns.append((
+                f"{prefix} (Freitext)",
+                lambda r, p, s, t, qid=qid: r.get(qid, ""),
+            ))
+
+        columns.append((
+            f"{prefix} (Anzahl Zeitstempel)",
+            lambda r, p, s, t, qid=qid: len(t.get(qid) or []),
+        ))
+    return columns
+
+
+def iter_export_rows(form_id):
+    """
+    Liefert zuerst die Kopfzeile und danach eine Zeile pro FormResponse des Formulars.
+    Die Antworten werden in Blöcken über .iterator() gelesen.
+    """
+    columns = build_export_columns(form_id)
+    yield BASE_HEADERS + [header for header, _extract in columns]
+
+    extractors = [extract for _header, extract in columns]
+    queryset = (
+        FormResponse.objects
+        .filter(form_id=form_id)
+        .order_by('submitted_at', 'id')
+        .only(
+            'id', 'observer_name', 'observer_email', 'submitted_at', 'note',
+            'note_timestamps', 'responses', 'picker_selections', 'scale_values', 'timestamps',
+        )
+    )
+    for fr in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        responses = fr.responses or {}
+        picker_selections = fr.picker_selections or {}
+        scale_values = fr.scale_values or {}
+        timestamps = fr.timestamps or {}
+        submitted_at = timezone.localtime(fr.submitted_at).strftime('%d.%m.%Y %H:%M:%S') if fr.submitted_at else ""
+
+        row = [
+            fr.id,
+            fr.observer_name,
+            fr.observer_email,
+            submitted_at,
+            fr.note or "",
+            len(fr.note_timestamps or []),
+        ]
+        row.extend(extract(responses, picker_selections, scale_values, timestamps) for extract in extractors)
+        yield row
+
+
+def export_file_name(form, extension):
+    """
+    Dateiname des Exports, z.B. "Antworten_Krankenhausübung_19102026.csv". Leerraum
+    (auch Zeilenumbrüche aus dem Admin) wird zu "_", Pfadtrenner zu "-".
+    """
+    form_name = re.sub(r'\s+', '_', form.name or "Formular").replace('/', '-').replace('\\', '-')
+    return f"Antworten_{form_name}_{timezone.localtime():%d%m%Y}.{extension}"
+
+
+# --------------------------------------------------
+# 2) CSV-EXPORT (GESTREAMT)
+# --------------------------------------------------
+class _Echo:
+    """Pseudo-Puffer für csv.writer, der die geschriebene Zeile direkt zurückgibt"""
+    def write(self, value):
+        return value
+
+
+def stream_csv_response(form):
+    """
+    Gibt eine StreamingHttpResponse zurück, die alle Antworten des Formulars
+    zeilenweise als CSV (UTF-8 mit BOM, Semikolon-getrennt) ausliefert.
+    """
+    writer = csv.writer(_Echo(), delimiter=CSV_DELIMITER)
+
+    def content():
+        yield '\ufeff'  # BOM, damit Excel die Umlaute korrekt erkennt
+        for row in iter_export_rows(form.id):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(content(), content_type='text/csv; charset=utf-8')
+    # Anführungszeichen, Semikolons und Umlaute im Formularnamen: Kodierung nach RFC 6266/5987
+    response['Content-Disposition'] = content_disposition_header(True, export_file_name(form, "csv"))
+    return response
+
+
+# --------------------------------------------------
+# 3) EXCEL-EXPORT (CONSTANT_MEMORY)
+# --------------------------------------------------
+def write_xlsx_export(form, output):
+    """
+    Schreibt alle Antworten des Formulars in eine Excel-Datei.
+
+    Im constant_memory-Modus hält xlsxwriter immer nur die aktuelle Zeile im Speicher;
+    die Zeilen müssen daher streng in aufsteigender Reihenfolge geschrieben werden.
+    """
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet("Antworten")
+    header_format = workbook.add_format({
+        'bold': True,
+        'border': 1,
+        'bg_color': '#D0CECE',
+        'text_wrap': True,
+        'valign': 'top',
+    })
+
+    rows = iter_export_rows(form.id)
+    header = next(rows)
+    worksheet.set_column(0, len(header) - 1, 20)
+    worksheet.freeze_panes(1, 1)
+    worksheet.write_row(0, 0, header, header_format)
+
+    for row_num, row in enumerate(rows, start=1):
+        worksheet.write_row(row_num, 0, row)
+
+    workbook.close()
+
+
+def xlsx_file_response(form):
+    """
+    Gibt eine FileResponse mit dem Excel-Export zurück. Die Datei wird in einer
+    anonymen temporären Datei erzeugt (kein gemeinsamer Pfad, keine Kollisionen)
+    und anschließend blockweise ausgeliefert.
+    """
+    tmp = tempfile.TemporaryFile()
+    write_xlsx_export(form, tmp)
+    tmp.seek(0)
+    return FileResponse(
+        tmp,
+        as_attachment=True,
+        filename=export_file_name(form, "xlsx"),
+        content_type=XLSX_MIMETYPE,
+    )
@@ -0,0 +1,253 @@
+# export_victimprofiles.py - Übungsweiter Gesamtbericht aller Patientenbegleitbögen
+#
+# Diese Datei erzeugt einen einzigen Excel-Bericht über alle VictimProfileResponse-Objekte
+# der Übung – über alle Beobachter und Organisationen hinweg. Jede Antwort wird über die
+# Button-Nummer mit der Zuweisung (TestScenarioVictim) und dem Patientenprofil verknüpft.
+# Ein Übersichtsblatt stellt SOLL- und IST-Sichtung gegenüber.
+#
+# Die Zuweisungen werden mit einer einzigen Abfrage geladen, die Antworten per .iterator()
+# gestreamt und die Datei mit xlsxwriter im constant_memory-Modus geschrieben.
+
+import re
+import tempfile
+import xlsxwriter
+from collections import Counter
+from django.http import FileResponse
+from django.utils import timezone
+from .models import TestScenarioVictim, VictimProfileResponse
+from .email_and_excel import XLSX_MIMETYPE
+
+# Anzahl der Antworten, die pro Datenbankabfrage geladen werden
+REPORT_CHUNK_SIZE = 500
+
+# Vereinheitlichte Sichtungskategorien in der Reihenfolge der Dringlichkeit
+TRIAGE_CATEGORIES = ['SK 1', 'SK 2', 'SK 3', 'SK 4']
+TRIAGE_NONE = 'ohne Angabe'
+
+_TRIAGE_PATTERN = re.compile(r'SK\s*(IV|III|II|I|[1-4])', re.IGNORECASE)
+_ROMAN = {'I': '1', 'II': '2', 'III': '3', 'IV': '4'}
+
+DETAIL_HEADERS = [
+    "Button-Nr.",
+    "Organisation",
+    "Profil-Nr.",
+    "Kategorie (Profil)",
+    "SOLL-Sichtung",
+    "IST-Sichtung",
+    "Bewertung",
+    "KH interne Pat.-Nr.",
+    "Beobachter",
+    "Beobachter-Email",
+    "Diagnose",
+    "Anzahl Verlaufseinträge",
+    "Anzahl OP-Team",
+    "Erstellt am",
+    "Aktualisiert am",
+]
+
+
+# --------------------------------------------------
+# 1) SICHTUNGSKATEGORIEN
+# --------------------------------------------------
+def normalize_triage(value):
+    """
+    Vereinheitlicht eine Sichtungskategorie auf "SK 1" bis "SK 4".
+    Erkennt arabische und römische Schreibweisen ("SK 2 (schwer verletzt)", "SK II").
+    Bei kombinierten Angaben wie "SK 1/SK 4" zählt die erste Kategorie.
+    Gibt TRIAGE_NONE zurück, wenn keine Kategorie erkennbar ist.
+    """
+    if not value:
+        return TRIAGE_NONE
+    match = _TRIAGE_PATTERN.search(str(value))
+    if not match:
+        return TRIAGE_NONE
+    token = match.group(1).upper()
+    return f"SK {_ROMAN.get(token, token)}"
+
+
+def rate_triage(soll, ist):
+    """
+    Bewertet die IST- gegenüber der SOLL-Sichtung (beide bereits vereinheitlicht).
+    Eine dringlichere IST-Kategorie (kleinere Zahl) gilt als Übertriage, eine weniger
+    dringliche als Untertriage. Abweichungen mit SK 4 werden nur als "abweichend" markiert.
+    """
+    if TRIAGE_NONE in (soll, ist):
+        return "nicht bewertbar"
+    if soll == ist:
+        return "korrekt"
+    if 'SK 4' in (soll, ist):
+        return "abweichend"
+    return "Übertriage" if ist < soll else "Untertriage"
+
+
+# --------------------------------------------------
+# 2) DATEN LADEN
+# --------------------------------------------------
+def load_assignments_by_button():
+    """
+    Lädt alle Zuweisungen inklusive Profil und Organisation mit einer Abfrage
+    und gibt ein Dictionary Button-Nummer → TestScenarioVictim zurück.
+
+    Eine Antwort speichert nur die Button-Nummer, nicht das Szenario. Ist dieselbe
+    Button-Nummer in mehreren Szenarien vergeben (z.B. Szenario einer früheren Übung noch
+    nicht gelöscht), gilt bewusst die Zuweisung des neuesten Szenarios (höchste ID) –
+    wie in der Sichtungsauswertung (analytics.triage_counts).
+    """
+    assignments = (
+        TestScenarioVictim.objects
+        .select_related('victim_profile', 'organization')
+        .order_by('-scenario_id', 'sequential_number')
+    )
+    by_button = {}
+    for assignment in assignments:
+        by_button.setdefault(assignment.button_number, assignment)
+    return by_button
+
+
+def iter_report_rows(assignments):
+    """
+    Liefert pro VictimProfileResponse ein Tupel (Zeilenwerte, SOLL, IST).
+    SOLL stammt aus dem Patientenprofil der Zuweisung, ersatzweise aus der Antwort.
+    """
+    queryset = (
+        VictimProfileResponse.objects
+        .order_by('button_number', 'erstellt_am', 'id')
+        .only(
+            'id', 'button_number', 'kh_intern', 'soll_sichtung', 'ist_sichtung',
+            'observer_name', 'observer_email', 'verlauf', 'op_team',
+            'erstellt_am', 'aktualisiert_am',
+        )
+    )
+    for resp in queryset.iterator(chunk_size=REPORT_CHUNK_SIZE):
+        assignment = assignments.get(resp.button_number)
+        profile = assignment.victim_profile if assignment else None
+        organization = assignment.organization if assignment else None
+
+        soll_raw = (profile.category if profile and profile.category else resp.soll_sichtung) or ""
+        soll = normalize_triage(soll_raw)
+        ist = normalize_triage(resp.ist_sichtung)
+
+        row = [
+            resp.button_number,
+            organization.name if organization else "",
+            (profile.profile_number or "") if profile else "",
+            soll_raw,
+            soll,
+            ist,
+            rate_triage(soll, ist),
+            resp.kh_intern or "",
+            resp.observer_name or "",
+            resp.observer_email or "",
+            (profile.diagnosis or "") if profile else "",
+            len(resp.verlauf or []),
+            len(resp.op_team or []),
+            timezone.localtime(resp.erstellt_am).strftime('%d.%m.%Y %H:%M') if resp.erstellt_am else "",
+            timezone.localtime(resp.aktualisiert_am).strftime('%d.%m.%Y %H:%M') if resp.aktualisiert_am else "",
+        ]
+        yield row, soll, ist
+
+
+# --------------------------------------------------
+# 3) EXCEL-BERICHT
+# --------------------------------------------------
+def write_exercise_report(output):
+    """
+    Schreibt den Gesamtbericht in output (Pfad oder Dateiobjekt).
+
+    Das Übersichtsblatt steht in der Arbeitsmappe vorne, wird aber erst nach dem
+    Detailblatt befüllt, da die Zählungen beim Durchlaufen der Antworten entstehen.
+    Im constant_memory-Modus ist das zulässig, solange innerhalb jedes Blatts die
+    Zeilen aufsteigend geschrieben werden.
+
+    Returns:
+        int: Anzahl der geschriebenen Antworten
+    """
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    header_format = workbook.add_format({
+        'bold': True,
+        'border': 1,
+        'bg_color': '#4472C4',  # Dunkelblau
+        'font_color': '#FFFFFF',
+        'align': 'center',
+        'valign': 'vcenter',
+        'text_wrap': True,
+    })
+    title_format = workbook.add_format({'bold': True, 'font_size': 14})
+    bold_format = workbook.add_format({'bold': True})
+    match_format = workbook.add_format({'border': 1, 'bg_color': '#C6EFCE', 'align': 'center'})
+    cell_format = workbook.add_format({'border': 1, 'align': 'center'})
+
+    overview_sheet = workbook.add_worksheet("Übersicht")
+    detail_sheet = workbook.add_worksheet("Alle Patientenbegleitbögen")
+
+    # --------------------------------------------------
+    # a) Detailblatt – eine Zeile pro Antwort
+    # --------------------------------------------------
+    detail_sheet.set_column(0, len(DETAIL_HEADERS) - 1, 18)
+    detail_sheet.freeze_panes(1, 1)
+    detail_sheet.write_row(0, 0, DETAIL_HEADERS, header_format)
+
+    matrix = Counter()
+    ratings = Counter()
+    row_num = 0
+    for row_num, (row, soll, ist) in enumerate(iter_report_rows(load_assignments_by_button()), start=1):
+        detail_sheet.write_row(row_num, 0, row)
+        matrix[(soll, ist)] += 1
+        ratings[row[6]] += 1
+    total = row_num
+    if total:
+        detail_sheet.autofilter(0, 0, total, len(DETAIL_HEADERS) - 1)
+
+    # --------------------------------------------------
+    # b) Übersichtsblatt – SOLL×IST-Matrix und Bewertung
+    # --------------------------------------------------
+    categories = TRIAGE_CATEGORIES + [TRIAGE_NONE]
+    overview_sheet.set_column(0, 0, 24)
+    overview_sheet.set_column(1, len(categories) + 1, 14)
+    overview_sheet.write(0, 0, "Gesamtbericht Patientenbegleitbögen", title_format)
+    overview_sheet.write(1, 0, f"Erstellt am {timezone.localtime():%d.%m.%Y %H:%M}")
+    overview_sheet.write(2, 0, "Anzahl Antworten:", bold_format)
+    overview_sheet.write(2, 1, total)
+
+    overview_sheet.write(4, 0, "SOLL \\ IST", header_format)
+    overview_sheet.write_row(4, 1, categories + ["Summe"], header_format)
+    for r, soll in enumerate(categories, start=5):
+        overview_sheet.write(r, 0, soll, header_format)
+        row_sum = 0
+        for c, ist in enumerate(categories, start=1):
+            count = matrix[(soll, ist)]
+            row_sum += count
+            overview_sheet.write(r, c, count, match_format if soll == ist else cell_format)
+        overview_sheet.write(r, len(categories) + 1, row_sum, cell_format)
+
+    r = 5 + len(categories) + 1
+    overview_sheet.write(r, 0, "Bewertung", header_format)
+    overview_sheet.write(r, 1, "Anzahl", header_format)
+    overview_sheet.write(r, 2, "Anteil", header_format)
+    for label in ["korrekt", "Übertriage", "Untertriage", "abweichend", "nicht bewertbar"]:
+        r += 1
+        count = ratings[label]
+        overview_sheet.write(r, 0, label, cell_format)
+        overview_sheet.write(r, 1, count, cell_format)
+        overview_sheet.write(r, 2, f"{(count / total * 100) if total else 0:.1f} %", cell_format)
+
+    workbook.close()
+    return total
+
+
+def exercise_report_file_name():
+    """Dateiname des Gesamtberichts, z.B. "Gesamtbericht_Patientenbegleitboegen_19102026.xlsx" """
+    return f"Gesamtbericht_Patientenbegleitboegen_{timezone.localtime():%d%m%Y}.xlsx"
+
+
+def exercise_report_response():
+    """Erzeugt den Gesamtbericht in einer anonymen temporären Datei und liefert ihn aus"""
+    tmp = tempfile.TemporaryFile()
+    write_exercise_report(tmp)
+    tmp.seek(0)
+    return FileResponse(
+        tmp,
+        as_attachment=True,
+        filename=exercise_report_file_name(),
+        content_type=XLSX_MIMETYPE,
+    )
@@ -0,0 +1,113 @@
+# log_queue.py - Nicht blockierendes Logging für die DÜB-Anwendung
+#
+# Die Logger der Anwendung ("DUEBapp.*") schreiben nicht direkt auf die Konsole, sondern in
+# eine Warteschlange (QueueHandler). Ein QueueListener-Thread übernimmt die eigentliche
+# Ausgabe über die in settings.LOGGING konfigurierten Handler. Der Request-Thread wartet
+# damit nicht mehr auf stdout/stderr.
+#
+# Zusätzlich gilt für Einträge, die in die Warteschlange gelangen:
+#   - Häufige DEBUG-Einträge werden gesampelt: Pro Aufrufstelle wird nur jeder
+#     LOG_DEBUG_SAMPLE_RATE-te Eintrag ausgegeben (1 = alle).
+#   - Tokens und Authorization-Header werden vor der Ausgabe maskiert (Absicherung, falls
+#     ein Aufrufer sie doch in eine Meldung übernimmt).
+#
+# Eingerichtet wird das Ganze in apps.py (KhuappConfig.ready) über install_queue_logging().
+
+import atexit
+import logging
+import queue
+import re
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from django.conf import settings
+
+# Logger, deren Handler hinter die Warteschlange verlegt werden
+QUEUED_LOGGERS = ('DUEBapp',)
+
+# Token im Authorization-Header ("Token <key>", "Bearer <key>") sowie DRF-Tokens (40 Hex-Zeichen)
+_SECRET_PATTERNS = (
+    (re.compile(r"\b(Token|Bearer)\s+[A-Za-z0-9._\-]{20,}"), r"\1 ***"),
+    (re.compile(r"\b[0-9a-f]{40}\b"), "***"),
+)
+
+_listeners = []
+_install_lock = threading.Lock()
+
+
+# --------------------------------------------------
+# 1) FILTER
+# --------------------------------------------------
+class DebugSamplingFilter(logging.Filter):
+    """
+    Lässt von DEBUG-Einträgen derselben Aufrufstelle (Logger + Meldungsvorlage) nur jeden
+    n-ten durch. Einträge ab INFO werden nie verworfen.
+    """
+
+    def __init__(self, rate=1):
+        super().__init__()
+        self.rate = max(1, int(rate))
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate == 1 or record.levelno > logging.DEBUG:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % self.rate == 0
+
+
+def redact_secrets(text):
+    """Maskiert Tokens in einem Text"""
+    for pattern, replacement in _SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class RedactingQueueHandler(QueueHandler):
+    """QueueHandler, der die fertige Meldung vor dem Einreihen von Tokens befreit"""
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.msg = redact_secrets(record.msg)
+        return record
+
+
+# --------------------------------------------------
+# 2) EINRICHTUNG
+# --------------------------------------------------
+def install_queue_logging(logger_names=QUEUED_LOGGERS):
+    """
+    Verlegt die Handler der angegebenen Logger hinter eine Warteschlange und startet je
+    Logger einen QueueListener. Mehrfache Aufrufe (z.B. durch den Autoreloader) sind
+    unschädlich.
+    """
+    with _install_lock:
+        for name in logger_names:
+            target_logger = logging.getLogger(name)
+            if any(isinstance(handler, QueueHandler) for handler in target_logger.handlers):
+                continue
+            handlers = list(target_logger.handlers)
+            if not handlers:
+                continue
+
+            log_queue = queue.SimpleQueue()
+            queue_handler = RedactingQueueHandler(log_queue)
+            queue_handler.addFilter(DebugSamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+            for handler in handlers:
+                target_logger.removeHandler(handler)
+            target_logger.addHandler(queue_handler)
+
+            listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+
+
+@atexit.register
+def stop_queue_logging():
+    """Gibt beim Beenden noch wartende Einträge aus"""
+    with _install_lock:
+        while _listeners:
+            _listeners.pop().stop()
@@ -0,0 +1,19 @@
+# backfill_timeline.py - Management-Befehl zum Aufbau der Zeitstrahl-Ereignisse
+#
+# Aufruf: python manage.py backfill_timeline
+
+import time
+from django.core.management.base import BaseCommand
+from DUEBapp.timeline import backfill_timeline_events
+
+
+class Command(BaseCommand):
+    help = "Überträgt die Zeitstempel aller vorhandenen Antworten neu in die Ereignistabelle (TimelineEvent)."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        created = backfill_timeline_events()
+        duration = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} Ereignisse in {duration:.2f} s angelegt."
+        ))
@@ -0,0 +1,97 @@
+# benchmark_overview.py - Management-Befehl zur Messung der Übersichtsdarstellung
+#
+# Aufruf: python manage.py benchmark_overview [--rows ANZAHL] [--repeat N]
+#
+# Vergleicht den Textumbruch ohne Cache (jedes Wort wird pro Zelle neu gemessen, wie vor
+# Einführung des Textlayouts) mit dem gecachten Textlayout aus pillow_utils und gibt die
+# gezeichneten Zeilen pro Sekunde aus. Anschließend werden Dauer und Dateigröße der
+# PNG- und SVG-Ausgabe verglichen (in einem temporären Ordner).
+
+import os
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from DUEBapp.pillow_utils import (
+    CELL_MAX_LINES, OVERVIEW_FORMATS, ROWS_PER_PAGE, generate_overview_image, get_font,
+    layout_rows, render_overview_page, text_width, wrap_cell, wrap_words,
+)
+
+# Typische, sich wiederholende Zelleninhalte einer Übung
+SAMPLE_CATEGORIES = ["SK 1", "SK 2", "SK 3", "SK 1/SK 4", "SK 2 (schwer verletzt)"]
+SAMPLE_DIAGNOSES = [
+    "Polytrauma mit Beckenfraktur und Milzruptur",
+    "Offene Unterschenkelfraktur links",
+    "Schädel-Hirn-Trauma Grad II",
+    "Verbrennung 2. Grades an beiden Unterarmen",
+    "Prellung Thorax rechts",
+]
+SAMPLE_VISUALS = ["blass, kaltschweißig", "ansprechbar, orientiert", "somnolent", "Blutung Oberschenkel"]
+
+
+def uncached_wrap(text, available_width):
+    """Textumbruch ohne Cache: misst jedes Wort bei jedem Aufruf neu"""
+    font = get_font()
+    return wrap_words(text, available_width, lambda word: font.getlength(word, mode="L"))[:CELL_MAX_LINES]
+
+
+class Command(BaseCommand):
+    help = "Misst die Darstellung der Szenario-Übersicht mit und ohne gecachtes Textlayout."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=400, help="Anzahl Datenzeilen (Standard: 400)")
+        parser.add_argument('--repeat', type=int, default=3, help="Anzahl Messdurchläufe (Standard: 3)")
+
+    def handle(self, *args, **options):
+        entries = [
+            {
+                "button_number": f"{i + 1}",
+                "profile_number": f"P{(i % 60) + 1}",
+                "category": SAMPLE_CATEGORIES[i % len(SAMPLE_CATEGORIES)],
+                "diagnosis": SAMPLE_DIAGNOSES[i % len(SAMPLE_DIAGNOSES)],
+                "visual": SAMPLE_VISUALS[i % len(SAMPLE_VISUALS)],
+                "pcz": f"{100 + i % 7}",
+            }
+            for i in range(options['rows'])
+        ]
+        pages = [entries[i:i + ROWS_PER_PAGE] for i in range(0, len(entries), ROWS_PER_PAGE)]
+
+        def render(wrap):
+            for page, chunk in enumerate(pages, start=1):
+                render_overview_page(chunk, "Benchmark", "19.10.2026", page, len(pages), wrap=wrap).close()
+
+        def measure(run, wrap):
+            # Bester Durchlauf; Caches werden vorher geleert (kalter Start je Durchlauf)
+            best = None
+            for _ in range(options['repeat']):
+                text_width.cache_clear()
+                wrap_cell.cache_clear()
+                start = time.perf_counter()
+                run(wrap)
+                duration = time.perf_counter() - start
+                best = duration if best is None else min(best, duration)
+            return len(entries) / best if best else 0.0
+
+        for label, run in (("Textlayout", lambda wrap: layout_rows(entries, wrap)), ("Zeichnen", render)):
+            before = measure(run, uncached_wrap)
+            after = measure(run, wrap_cell)
+            factor = f"{after / before:.2f}" if before else "-"
+            self.stdout.write(self.style.SUCCESS(
+                f"{label}: ohne Cache {before:10.1f} Zeilen/s, mit Cache {after:10.1f} Zeilen/s (Faktor {factor})"
+            ))
+
+        # Ausgabeformate: Dauer (bester Durchlauf) und Gesamtgröße aller Seiten
+        for output_format in OVERVIEW_FORMATS:
+            best = None
+            for _ in range(options['repeat']):
+                with tempfile.TemporaryDirectory() as media_root:
+                    start = time.perf_counter()
+                    paths = generate_overview_image(entries, "Benchmark", "19.10.2026", media_root, output_format)
+                    duration = time.perf_counter() - start
+                    size = sum(os.path.getsize(os.path.join(media_root, path)) for path in paths)
+                best = duration if best is None else min(best, duration)
+            self.stdout.write(self.style.SUCCESS(
+                f"{output_format.upper()}: {len(paths)} Seiten, {size / 1024:.1f} KiB, "
+                f"{best:.2f} s ({len(entries) / best:.1f} Zeilen/s)"
+            ))
+        self.stdout.write(f"Textbreiten-Cache: {text_width.cache_info()}")
+        self.stdout.write(f"Umbruch-Cache:     {wrap_cell.cache_info()}")
@@ -0,0 +1,134 @@
+# benchmark_sqlite.py - Management-Befehl zur Messung gleichzeitiger Schreibzugriffe auf SQLite
+#
+# Aufruf: python manage.py benchmark_sqlite [--threads N] [--writes N] [--payload BYTES]
+#
+# Simuliert Einsendungen mehrerer gleichzeitiger Worker auf einer temporären Datenbankdatei
+# und vergleicht zwei Profile:
+#   - Standard: neue Verbindung pro Einsendung, Rollback-Journal, BEGIN DEFERRED
+#     (entspricht den bisherigen Django-Standardeinstellungen)
+#   - Profil:   eine Verbindung pro Worker, PRAGMAs aus settings.SQLITE_PRAGMAS, BEGIN IMMEDIATE
+# Jede Einsendung liest (wie die Validierung) das Formular, fügt eine Antwort ein und
+# aktualisiert einen Zähler (wie die Kennzahlen in QuestionRollup).
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from DUEBapp.sqlite_profile import apply_pragmas
+
+SCHEMA = (
+    "CREATE TABLE form (id INTEGER PRIMARY KEY, name TEXT)",
+    "CREATE TABLE response (id INTEGER PRIMARY KEY, form_id INTEGER, payload TEXT, submitted_at REAL)",
+    "CREATE TABLE rollup (form_id INTEGER PRIMARY KEY, count INTEGER)",
+    "INSERT INTO form (id, name) VALUES (1, 'Beobachtungsbogen')",
+    "INSERT INTO rollup (form_id, count) VALUES (1, 0)",
+)
+
+# Standardverhalten der Django-Verbindung (sqlite3-Timeout von 5 s, keine PRAGMAs)
+STOCK_TIMEOUT = 5.0
+
+
+def _percentile(values, fraction):
+    """Einfaches Perzentil einer Liste (ohne Interpolation)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = "Vergleicht den Schreibdurchsatz gleichzeitiger Einsendungen mit und ohne SQLite-Verbindungsprofil."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Anzahl gleichzeitiger Worker (Standard: 8)")
+        parser.add_argument('--writes', type=int, default=50, help="Einsendungen pro Worker (Standard: 50)")
+        parser.add_argument('--payload', type=int, default=4000, help="Größe einer Antwort in Bytes (Standard: 4000)")
+
+    def run_profile(self, path, tuned, threads, writes, payload):
+        """Führt die Einsendungen aller Worker aus und liefert (Dauer, Latenzen, Fehler)"""
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        body = json.dumps({"text": "x" * payload})
+
+        def connect():
+            if tuned:
+                conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+                apply_pragmas(conn.cursor(), settings.SQLITE_PRAGMAS)
+            else:
+                conn = sqlite3.connect(path, timeout=STOCK_TIMEOUT, isolation_level=None)
+            return conn
+
+        def submit(conn):
+            conn.execute("BEGIN IMMEDIATE" if tuned else "BEGIN")
+            try:
+                conn.execute("SELECT id FROM form WHERE id = 1").fetchone()
+                conn.execute(
+                    "INSERT INTO response (form_id, payload, submitted_at) VALUES (1, ?, ?)",
+                    (body, time.time()),
+                )
+                conn.execute("UPDATE rollup SET count = count + 1 WHERE form_id = 1")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        def worker():
+            conn = connect() if tuned else None
+            for _ in range(writes):
+                start = time.perf_counter()
+                try:
+                    if tuned:
+                        submit(conn)
+                    else:
+                        # Neue Verbindung pro Request (CONN_MAX_AGE = 0)
+                        per_request = connect()
+                        try:
+                            submit(per_request)
+                        finally:
+                            per_request.close()
+                except sqlite3.OperationalError as exc:
+                    with lock:
+                        errors.append(str(exc))
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            if conn is not None:
+                conn.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - start, latencies, errors
+
+    def handle(self, *args, **options):
+        threads, writes, payload = options['threads'], options['writes'], options['payload']
+        self.stdout.write(f"{threads} Worker x {writes} Einsendungen, {payload} Bytes je Antwort")
+
+        for label, tuned in (("Standard", False), ("Profil", True)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "benchmark.sqlite3")
+                setup = sqlite3.connect(path)
+                for statement in SCHEMA:
+                    setup.execute(statement)
+                setup.commit()
+                setup.close()
+
+                duration, latencies, errors = self.run_profile(path, tuned, threads, writes, payload)
+
+            throughput = len(latencies) / duration if duration else 0.0
+            self.stdout.write(self.style.SUCCESS(
+                f"{label:8}: {throughput:8.1f} Einsendungen/s, "
+                f"p50 {_percentile(latencies, 0.50) * 1000:7.1f} ms, "
+                f"p95 {_percentile(latencies, 0.95) * 1000:7.1f} ms, "
+                f"{len(errors)} Fehler"
+            ))
+            for message in sorted(set(errors)):
+                self.stdout.write(f"          {errors.count(message)}x {message}")
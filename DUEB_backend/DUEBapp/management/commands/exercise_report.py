@@ -0,0 +1,26 @@
+# exercise_report.py - Management-Befehl für den Gesamtbericht aller Patientenbegleitbögen
+#
+# Aufruf: python manage.py exercise_report [--output PFAD]
+
+import time
+from django.core.management.base import BaseCommand
+from DUEBapp.export_victimprofiles import write_exercise_report, exercise_report_file_name
+
+
+class Command(BaseCommand):
+    help = "Erzeugt den übungsweiten Gesamtbericht aller Patientenbegleitbögen als Excel-Datei."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help="Zielpfad der Excel-Datei (Standard: Gesamtbericht_Patientenbegleitboegen_<Datum>.xlsx)",
+        )
+
+    def handle(self, *args, **options):
+        output = options['output'] or exercise_report_file_name()
+        start = time.perf_counter()
+        total = write_exercise_report(output)
+        duration = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} Antworten in {duration:.2f} s nach {output} geschrieben."
+        ))
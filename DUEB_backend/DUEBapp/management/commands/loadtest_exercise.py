@@ -0,0 +1,445 @@
+# loadtest_exercise.py - Management-Befehl für einen Lasttest mit simulierter Übung
+#
+# Aufruf: python manage.py loadtest_exercise [--observers N] [--iterations N] [--rate R]
+#                                            [--patients N] [--questions N] [--images N]
+#                                            [--seed S] [--url URL] [--output DATEI]
+#
+# Simuliert N Beobachter, die parallel über HTTP
+#   1. sich über api-token-auth anmelden,
+#   2. die Offline-Daten laden (Formulare, Organisationen, Szenarien, Zuweisungen, Profile,
+#      Startbilder, Kontakte),
+#   3. je Durchlauf einen Patientenbogen über die Button-Nummer öffnen, eine Formularantwort
+#      (optional mit Bildern) und einen Patientenbegleitbogen senden.
+# Ausgegeben werden je Endpunkt Anzahl, Fehlerquote und die Latenzen p50/p95/p99.
+#
+# Ohne --url startet der Befehl einen eigenen HTTP-Server (wie LiveServerTestCase) auf einer
+# temporären Datenbankdatei; Medien, Berichte, Cache und E-Mails landen in temporären Ordnern
+# bzw. im Speicher, die Messung pro Request (REQUEST_PROFILING) ist abgeschaltet. Mit --url wird
+# ein laufender Server (z.B. gunicorn) getestet; die Testdaten (Benutzer "loadtest-observer-N",
+# Szenario "Lasttest") werden dann in der konfigurierten Datenbank angelegt bzw.
+# wiederverwendet, die dieser Server verwenden muss.
+#
+# Mit demselben --seed werden dieselben Patienten, Antworten und Bilder erzeugt. Beim
+# eingebauten Server teilen sich Server und Beobachter einen Prozess (GIL); für
+# belastbare Kapazitätswerte daher gegen den produktiven Server mit --url messen.
+
+import http.client
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+from PIL import Image
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.testcases import LiveServerThread
+from django.test.utils import override_settings
+from DUEBapp.email_and_excel import get_form_layout
+from DUEBapp.exercise_data import CATEGORIES, DIAGNOSES, form_response_payload, victim_response_payload
+from DUEBapp.models import (
+    Form, Option, Organization, Question, TestScenario, TestScenarioVictim, VictimProfile,
+)
+
+OBSERVER_USERNAME = "loadtest-observer-{index}"
+OBSERVER_PASSWORD = "loadtest-passwort"
+# Beobachter-Adresse ohne E-Mail-Versand (siehe send_confirmation_email)
+OBSERVER_EMAIL = "unknown@observer"
+SCENARIO_NAME = "Lasttest"
+FORM_NAME = "Lasttest-Beobachtungsbogen"
+ORGANIZATION_CODES = ("LT-A", "LT-B", "LT-C")
+QUESTION_TYPES = ("checkbox", "dropdown", "scale", "none")
+
+HTTP_TIMEOUT = 60
+
+
+def percentile(values, fraction):
+    """Perzentil einer Liste nach dem Nearest-Rank-Verfahren"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def encode_multipart(files):
+    """Kodiert Dateien {Feldname: (Dateiname, bytes, Content-Type)} als multipart/form-data"""
+    boundary = f"----dueb-loadtest-{random.getrandbits(64):016x}"
+    body = io.BytesIO()
+    for field, (file_name, content, content_type) in files.items():
+        body.write(f"--{boundary}\r\n".encode())
+        body.write(f'Content-Disposition: form-data; name="{field}"; filename="{file_name}"\r\n'.encode())
+        body.write(f"Content-Type: {content_type}\r\n\r\n".encode())
+        body.write(content)
+        body.write(b"\r\n")
+    body.write(f"--{boundary}--\r\n".encode())
+    return body.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+
+def make_test_image(rng, size):
+    """JPEG mit Rauschen (komprimiert ähnlich schlecht wie ein Handyfoto)"""
+    width, height = size
+    image = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+# --------------------------------------------------
+# 1) HTTP-CLIENT EINES BEOBACHTERS
+# --------------------------------------------------
+class ObserverClient:
+    """Sendet Anfragen an den Server und erfasst Dauer und Status je Endpunkt"""
+
+    def __init__(self, base_url, results, lock):
+        parts = urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.results = results
+        self.lock = lock
+        self.token = None
+
+    def request(self, label, method, path, payload=None, files=None):
+        """
+        Führt eine Anfrage aus und liefert (Status, JSON-Antwort oder None).
+        Verbindungsfehler werden mit Status 0 erfasst.
+        """
+        headers = {"Accept": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Token {self.token}"
+        body = None
+        if files is not None:
+            body, headers["Content-Type"] = encode_multipart(files)
+        elif payload is not None:
+            body = json.dumps(payload).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        conn = self.connection_class(self.netloc, timeout=HTTP_TIMEOUT)
+        start = time.perf_counter()
+        try:
+            conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status, data = 0, b""
+        finally:
+            conn.close()
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.results.setdefault(label, []).append((status, elapsed))
+        try:
+            return status, json.loads(data) if data else None
+        except ValueError:
+            return status, None
+
+
+# --------------------------------------------------
+# 2) BEFEHL
+# --------------------------------------------------
+class Command(BaseCommand):
+    help = "Lasttest: simuliert Beobachter einer Übung und misst die Latenzen je Endpunkt."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--observers', type=int, default=10, help="Gleichzeitige Beobachter (Standard: 10)")
+        parser.add_argument('--iterations', type=int, default=10, help="Patienten je Beobachter (Standard: 10)")
+        parser.add_argument('--rate', type=float, default=0.0,
+                            help="Patienten pro Sekunde je Beobachter (Standard: 0 = so schnell wie möglich)")
+        parser.add_argument('--patients', type=int, default=60, help="Patienten im Lasttest-Szenario (Standard: 60)")
+        parser.add_argument('--questions', type=int, default=40, help="Fragen im Lasttest-Formular (Standard: 40)")
+        parser.add_argument('--images', type=int, default=1, help="Bilder je Formularantwort (Standard: 1, 0 = keine)")
+        parser.add_argument('--image-size', default="1024x768", help="Bildgröße BREITExHÖHE (Standard: 1024x768)")
+        parser.add_argument('--seed', type=int, default=42, help="Startwert für die Zufallsdaten (Standard: 42)")
+        parser.add_argument('--url', help="Basis-URL eines laufenden Servers (ohne: eigener Testserver)")
+        parser.add_argument('--output', help="Ergebnis zusätzlich als JSON in diese Datei schreiben")
+
+    def handle(self, *args, **options):
+        if options['observers'] < 1 or options['iterations'] < 0:
+            raise CommandError("--observers muss mindestens 1 sein, --iterations darf nicht negativ sein.")
+        try:
+            width, height = (int(value) for value in options['image_size'].lower().split('x'))
+        except ValueError:
+            raise CommandError("--image-size muss im Format BREITExHÖHE angegeben werden, z.B. 1024x768.")
+        options['image_size'] = (width, height)
+
+        if options['url']:
+            fixtures = self.prepare_fixtures(options)
+            report = self.run_load(options['url'], fixtures, options)
+        else:
+            report = self.run_with_test_server(options)
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Ergebnis gespeichert: {options['output']}")
+
+    # ----------------------------------------------
+    # Eigener Testserver
+    # ----------------------------------------------
+    def run_with_test_server(self, options):
+        """Startet einen HTTP-Server auf einer temporären Datenbank und führt den Lasttest aus"""
+        with tempfile.TemporaryDirectory(prefix="dueb-loadtest-") as directory:
+            test_settings = connection.settings_dict.setdefault('TEST', {})
+            previous_test_name = test_settings.get('NAME')
+            test_settings['NAME'] = os.path.join(directory, "loadtest.sqlite3")
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                with override_settings(
+                    MEDIA_ROOT=os.path.join(directory, "media"),
+                    REPORT_STORE_ROOT=os.path.join(directory, "reports"),
+                    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                    # Eigener Cache: Die Formular-IDs der temporären Datenbank dürfen keine
+                    # Einträge (z.B. Formular-Layouts) der echten Datenbank überschreiben
+                    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                    OVERVIEW_AUTO_REFRESH=False,
+                    REQUEST_PROFILING=False,
+                    ALLOWED_HOSTS=['*'],
+                ):
+                    fixtures = self.prepare_fixtures(options)
+                    server = LiveServerThread("localhost", lambda handler: handler)
+                    server.daemon = True
+                    server.start()
+                    server.is_ready.wait()
+                    if server.error:
+                        raise server.error
+                    try:
+                        return self.run_load(f"http://localhost:{server.port}", fixtures, options)
+                    finally:
+                        server.terminate()
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                test_settings['NAME'] = previous_test_name
+
+    # ----------------------------------------------
+    # Testdaten
+    # ----------------------------------------------
+    def prepare_fixtures(self, options):
+        """
+        Legt Beobachter, Formular, Organisationen, Patienten und Szenario an (bzw. verwendet
+        vorhandene Lasttest-Daten wieder).
+
+        Returns:
+            dict: form_id, scenario_id, layout, patients [(Button, Profil-ID, Kategorie), ...]
+        """
+        rng = random.Random(options['seed'])
+
+        # Beobachter (ein Passwort-Hash für alle, das Hashen ist absichtlich teuer)
+        password = make_password(OBSERVER_PASSWORD)
+        usernames = [OBSERVER_USERNAME.format(index=index + 1) for index in range(options['observers'])]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.filter(username__in=existing).update(password=password)
+        User.objects.bulk_create([
+            User(username=name, password=password, email=OBSERVER_EMAIL, first_name="Lasttest", last_name=name)
+            for name in usernames if name not in existing
+        ])
+
+        with transaction.atomic():
+            form = Form.objects.filter(name=FORM_NAME).first()
+            if form is None:
+                form = Form.objects.create(name=FORM_NAME, description_form="Formular für Lasttests")
+                for index in range(options['questions']):
+                    option_type = QUESTION_TYPES[index % len(QUESTION_TYPES)]
+                    question = Question.objects.create(
+                        form=form,
+                        question_text=f"Frage {index + 1}",
+                        option_type=option_type,
+                        input_field_added=index % 3 == 0,
+                    )
+                    if option_type in ('checkbox', 'dropdown'):
+                        Option.objects.bulk_create([
+                            Option(question=question, label=f"Antwort {number + 1}") for number in range(5)
+                        ])
+
+            organizations = [
+                Organization.objects.get_or_create(short_code=code, defaults={'name': f"Lasttest {code}"})[0]
+                for code in ORGANIZATION_CODES
+            ]
+            scenario, _created = TestScenario.objects.get_or_create(
+                name=SCENARIO_NAME, defaults={'date': datetime.now().date()},
+            )
+            if not scenario.assignments.exists():
+                numbers = [f"LT-{index + 1:05d}" for index in range(options['patients'])]
+                profiles = VictimProfile.objects.in_bulk(numbers, field_name='profile_number')
+                VictimProfile.objects.bulk_create([
+                    VictimProfile(
+                        profile_number=number,
+                        category=rng.choice(CATEGORIES),
+                        diagnosis=rng.choice(DIAGNOSES),
+                    )
+                    for number in numbers if number not in profiles
+                ])
+                profiles = VictimProfile.objects.in_bulk(numbers, field_name='profile_number')
+                assignments = []
+                for index, number in enumerate(numbers):
+                    organization = organizations[index % len(organizations)]
+                    sequential = index // len(organizations) + 1
+                    assignments.append(TestScenarioVictim(
+                        scenario=scenario,
+                        victim_profile=profiles[number],
+                        organization=organization,
+                        sequential_number=sequential,
+                        button_number=f"{organization.short_code}-{sequential:03d}",
+                    ))
+                TestScenarioVictim.objects.bulk_create(assignments)
+
+        patients = list(
+            scenario.assignments
+            .order_by('button_number')
+            .values_list('button_number', 'victim_profile_id', 'victim_profile__category')
+        )
+        if not patients:
+            raise CommandError("Das Lasttest-Szenario enthält keine Patienten.")
+        return {
+            'form_id': form.id,
+            'scenario_id': scenario.id,
+            'layout': get_form_layout(form.id),
+            'patients': patients,
+        }
+
+    # ----------------------------------------------
+    # Ablauf eines Beobachters
+    # ----------------------------------------------
+    def observe(self, client, index, fixtures, options):
+        """Anmeldung, Offline-Daten und Patientenbögen eines Beobachters"""
+        rng = random.Random(options['seed'] * 1000 + index)
+        images = [
+            make_test_image(rng, options['image_size']) for _number in range(options['images'])
+        ]
+        scenario_id = fixtures['scenario_id']
+        form_id = fixtures['form_id']
+
+        status, data = client.request("POST /api/api-token-auth/", "POST", "/api/api-token-auth/", {
+            'username': OBSERVER_USERNAME.format(index=index + 1),
+            'password': OBSERVER_PASSWORD,
+        })
+        if status != 200 or not data:
+            return
+        client.token = data['token']
+
+        # Offline-Daten vor der Übung
+        for label, path in (
+            ("GET /api/forms/", "/api/forms/"),
+            ("GET /api/forms/{id}/", f"/api/forms/{form_id}/"),
+            ("GET /api/organizations/", "/api/organizations/"),
+            ("GET /api/test-scenarios/", "/api/test-scenarios/"),
+            ("GET /api/test-scenario-victims/?scenario", f"/api/test-scenario-victims/?scenario={scenario_id}"),
+            ("GET /api/victim-profiles/", "/api/victim-profiles/"),
+            ("GET /api/images/", "/api/images/"),
+            ("GET /api/contacts/", "/api/contacts/"),
+        ):
+            client.request(label, "GET", path)
+
+        interval = 1.0 / options['rate'] if options['rate'] > 0 else 0.0
+        next_start = time.perf_counter()
+        for iteration in range(options['iterations']):
+            if interval:
+                delay = next_start - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_start += interval
+
+            button, profile_id, category = rng.choice(fixtures['patients'])
+            observed_at = datetime.now() - timedelta(minutes=rng.randint(0, 90))
+
+            # Patientenbogen über die Button-Nummer öffnen
+            query = urlencode({'scenario': scenario_id, 'search': button})
+            client.request("GET /api/test-scenario-victims/?search", "GET", f"/api/test-scenario-victims/?{query}")
+            client.request("GET /api/victim-profiles/{id}/", "GET", f"/api/victim-profiles/{profile_id}/")
+
+            # Formularantwort, ggf. mit Bildern
+            payload = form_response_payload(rng, fixtures['layout'], observed_at)
+            payload['form'] = form_id
+            status, data = client.request("POST /api/form-responses/", "POST", "/api/form-responses/", payload)
+            if images and status == 201 and data:
+                files = {
+                    f"image_{number + 1}": (f"{button}_{iteration}_{number + 1}.jpg", content, "image/jpeg")
+                    for number, content in enumerate(images)
+                }
+                client.request(
+                    "POST /api/form-responses/{id}/upload_images/", "POST",
+                    f"/api/form-responses/{data['id']}/upload_images/", files=files,
+                )
+
+            # Patientenbegleitbogen
+            client.request(
+                "POST /api/victim-profile-responses/", "POST", "/api/victim-profile-responses/",
+                victim_response_payload(rng, button, category or "", observed_at),
+            )
+
+    def run_load(self, base_url, fixtures, options):
+        """Startet alle Beobachter parallel und wertet die Messwerte aus"""
+        results = {}
+        lock = threading.Lock()
+        self.stdout.write(
+            f"{options['observers']} Beobachter x {options['iterations']} Patienten gegen {base_url} "
+            f"({len(fixtures['patients'])} Patienten, {len(fixtures['layout'])} Fragen, Seed {options['seed']})"
+        )
+
+        threads = [
+            threading.Thread(
+                target=self.observe,
+                args=(ObserverClient(base_url, results, lock), index, fixtures, options),
+                name=f"observer-{index + 1}",
+            )
+            for index in range(options['observers'])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+
+        endpoints = []
+        for label, samples in sorted(results.items()):
+            latencies = [elapsed for _status, elapsed in samples]
+            errors = sum(1 for status, _elapsed in samples if status == 0 or status >= 400)
+            endpoints.append({
+                'endpoint': label,
+                'requests': len(samples),
+                'errors': errors,
+                'error_rate': errors / len(samples),
+                'p50_ms': percentile(latencies, 0.50) * 1000,
+                'p95_ms': percentile(latencies, 0.95) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'max_ms': max(latencies) * 1000,
+            })
+        total = sum(entry['requests'] for entry in endpoints)
+        return {
+            'base_url': base_url,
+            'observers': options['observers'],
+            'iterations': options['iterations'],
+            'seed': options['seed'],
+            'duration_s': duration,
+            'requests': total,
+            'errors': sum(entry['errors'] for entry in endpoints),
+            'throughput_rps': total / duration if duration else 0.0,
+            'endpoints': endpoints,
+        }
+
+    def print_report(self, report):
+        width = max([len(entry['endpoint']) for entry in report['endpoints']] + [8])
+        self.stdout.write(
+            f"{'Endpunkt':{width}}  {'Anzahl':>7} {'Fehler':>7} {'Quote':>7} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+        )
+        for entry in report['endpoints']:
+            line = (
+                f"{entry['endpoint']:{width}}  {entry['requests']:7d} {entry['errors']:7d} "
+                f"{entry['error_rate'] * 100:6.1f}% {entry['p50_ms']:8.1f} {entry['p95_ms']:8.1f} "
+                f"{entry['p99_ms']:8.1f} {entry['max_ms']:8.1f}"
+            )
+            self.stdout.write(self.style.ERROR(line) if entry['errors'] else line)
+        summary = (
+            f"{report['requests']} Anfragen in {report['duration_s']:.1f} s "
+            f"({report['throughput_rps']:.1f}/s), {report['errors']} Fehler"
+        )
+        self.stdout.write(self.style.SUCCESS(summary) if not report['errors'] else self.style.WARNING(summary))
@@ -0,0 +1,22 @@
+# prune_reports.py - Management-Befehl zum Aufräumen des Berichtsspeichers
+#
+# Aufruf: python manage.py prune_reports [--days TAGE]
+
+from django.core.management.base import BaseCommand
+from DUEBapp.report_store import prune_reports
+
+
+class Command(BaseCommand):
+    help = "Löscht gespeicherte Berichte (Excel-Dateien), die älter als die angegebene Anzahl Tage sind."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help="Maximales Alter der Berichte in Tagen (Standard: 30)",
+        )
+
+    def handle(self, *args, **options):
+        removed = prune_reports(options['days'] * 24 * 3600)
+        self.stdout.write(self.style.SUCCESS(f"{removed} Berichte gelöscht."))
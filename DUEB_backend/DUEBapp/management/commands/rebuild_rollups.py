@@ -0,0 +1,26 @@
+# rebuild_rollups.py - Management-Befehl zur Neuberechnung der Antwort-Statistiken
+#
+# Aufruf: python manage.py rebuild_rollups [--form ID]
+
+import time
+from django.core.management.base import BaseCommand
+from DUEBapp.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Berechnet die vorberechneten Kennzahlen (QuestionRollup) aus allen Formularantworten neu."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--form',
+            type=int,
+            help="Nur das Formular mit dieser ID neu berechnen (Standard: alle Formulare)",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        processed = rebuild_rollups(options['form'])
+        duration = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{processed} Antworten in {duration:.2f} s ausgewertet."
+        ))
@@ -0,0 +1,358 @@
+# seed_exercise.py - Management-Befehl zum Anlegen realistischer Übungsdaten
+#
+# Aufruf: python manage.py seed_exercise [--profiles N] [--victims N] [--organizations N]
+#                                        [--forms N] [--questions N] [--form-responses N]
+#                                        [--victim-responses N] [--seed S] [--date JJJJ-MM-TT]
+#                                        [--batch-size N] [--reset] [--overview]
+#
+# Legt für Benchmarks eine vollständige Übung in der konfigurierten Datenbank an:
+#   - Patientenprofile (Profilnummern "UE-00001", ...),
+#   - Organisationen und ein Testszenario mit zugewiesenen Patienten (Button-Codes wie im
+#     Admin: Kürzel + fortlaufende Nummer),
+#   - Formulare mit vielen Fragen und Antwortoptionen,
+#   - Formularantworten und Patientenbegleitbögen mit JSON-Inhalten wie von den Geräten
+#     (siehe exercise_data.py), verteilt über den Übungstag.
+# Mit demselben --seed und --date entstehen dieselben Daten.
+#
+# Alle Zeilen werden blockweise per bulk_create in einer Transaktion eingefügt. bulk_create
+# löst keine Signale aus; die abgeleiteten Daten werden daher direkt aufgebaut: Kennzahlen
+# der neuen Formulare (rebuild_rollups), Zeitstrahl-Ereignisse der neuen Antworten und das
+# Verwerfen der betroffenen Caches. Die Szenario-Übersicht wird nur mit --overview gezeichnet.
+#
+# Die Anwendung erlaubt nur ein Testszenario: Existiert bereits ein anderes, bricht der Befehl
+# ab. Vorhandene Übungsdaten werden mit --reset vorher entfernt (nur die von diesem Befehl
+# angelegten Daten, erkennbar an der Profilnummer "UE-...", dem Namenszusatz "(Übungsdaten)"
+# und der Beobachter-Domain).
+
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.signals import post_delete
+from django.test.utils import override_settings
+from DUEBapp.analytics import invalidate_scenario_category_stats, invalidate_triage_analytics
+from DUEBapp.email_and_excel import get_form_layout, invalidate_form_layout
+from DUEBapp.exercise_data import (
+    OBSERVATIONS, form_response_payload, observer_identity, victim_profile_fields, victim_response_payload,
+)
+from DUEBapp.models import (
+    Form, FormResponse, Option, Organization, Question, TestScenario, TestScenarioVictim,
+    TimelineEvent, VictimProfile, VictimProfileResponse,
+)
+from DUEBapp.overview import refresh_scenario_overview
+from DUEBapp.rollups import rebuild_rollups
+from DUEBapp.signals import form_response_deleted
+from DUEBapp.timeline import form_response_events, victim_response_events
+
+# Kennzeichnung der angelegten Daten (für --reset)
+PROFILE_PREFIX = "UE-"
+NAME_SUFFIX = " (Übungsdaten)"
+SCENARIO_NAME = f"Großübung{NAME_SUFFIX}"
+FORM_NAME = "Übungsbogen {index}" + NAME_SUFFIX
+ORGANIZATION_PREFIX = "U"
+OBSERVER_DOMAIN = "uebung.example"
+ORGANIZATIONS = (
+    ("Feuerwehr", "FW"),
+    ("Deutsches Rotes Kreuz", "DRK"),
+    ("Johanniter-Unfall-Hilfe", "JUH"),
+    ("Malteser Hilfsdienst", "MHD"),
+    ("Arbeiter-Samariter-Bund", "ASB"),
+    ("Technisches Hilfswerk", "THW"),
+    ("DLRG", "DLRG"),
+    ("Bundeswehr", "BW"),
+)
+QUESTION_TYPES = ("checkbox", "checkbox", "dropdown", "scale", "none")
+OPTION_LABELS = (
+    "ja", "nein", "teilweise", "nicht beobachtet", "sofort", "verzögert", "nicht erfolgt",
+    "unklar", "durch Arzt", "durch Pflege", "durch Rettungsdienst", "nach Rückfrage",
+)
+DEFAULT_DATE = "2026-09-19"
+# Übungsbeginn (Ortszeit) und Dauer, über die die Antworten verteilt werden
+EXERCISE_START_HOUR = 9
+EXERCISE_HOURS = 6
+
+
+@contextmanager
+def rollups_detached():
+    """
+    Löscht Formularantworten ohne Einzelverbuchung in QuestionRollup. Nur zulässig, wenn
+    die zugehörigen Formulare (und damit ihre Kennzahlen) mitgelöscht werden.
+    """
+    post_delete.disconnect(form_response_deleted, sender=FormResponse)
+    try:
+        yield
+    finally:
+        post_delete.connect(form_response_deleted, sender=FormResponse)
+
+
+class Command(BaseCommand):
+    help = "Legt deterministisch realistische Übungsdaten für Benchmarks an (Profile, Szenario, Formulare, Antworten)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=3000, help="Patientenprofile (Standard: 3000)")
+        parser.add_argument('--victims', type=int, default=600,
+                            help="Dem Szenario zugewiesene Patienten (Standard: 600)")
+        parser.add_argument('--organizations', type=int, default=6,
+                            help=f"Organisationen, 1 bis {len(ORGANIZATIONS)} (Standard: 6)")
+        parser.add_argument('--forms', type=int, default=3, help="Formulare (Standard: 3)")
+        parser.add_argument('--questions', type=int, default=120, help="Fragen je Formular (Standard: 120)")
+        parser.add_argument('--form-responses', type=int, default=20000,
+                            help="Formularantworten insgesamt (Standard: 20000)")
+        parser.add_argument('--victim-responses', type=int, default=10000,
+                            help="Patientenbegleitbögen insgesamt (Standard: 10000)")
+        parser.add_argument('--seed', type=int, default=42, help="Startwert für die Zufallsdaten (Standard: 42)")
+        parser.add_argument('--date', default=DEFAULT_DATE, help=f"Übungsdatum (Standard: {DEFAULT_DATE})")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Zeilen je bulk_create (Standard: 1000)")
+        parser.add_argument('--reset', action='store_true',
+                            help="Vorhandene Übungsdaten dieses Befehls vorher entfernen")
+        parser.add_argument('--overview', action='store_true',
+                            help="Szenario-Übersicht anschließend neu zeichnen")
+
+    def handle(self, *args, **options):
+        if not 1 <= options['organizations'] <= len(ORGANIZATIONS):
+            raise CommandError(f"--organizations muss zwischen 1 und {len(ORGANIZATIONS)} liegen.")
+        if options['victims'] > options['profiles']:
+            raise CommandError("--victims darf nicht größer als --profiles sein.")
+        if min(options['forms'], options['questions'], options['victims'], options['batch_size']) < 1:
+            raise CommandError("--forms, --questions, --victims und --batch-size müssen mindestens 1 sein.")
+        try:
+            exercise_date = date.fromisoformat(options['date'])
+        except ValueError:
+            raise CommandError("--date muss im Format JJJJ-MM-TT angegeben werden.")
+        self.batch_size = options['batch_size']
+        self.start = datetime.combine(
+            exercise_date, datetime.min.time(), tzinfo=ZoneInfo(settings.TIMELINE_TIME_ZONE),
+        ) + timedelta(hours=EXERCISE_START_HOUR)
+
+        # Die Übersicht wird nicht bei jeder Zuweisung im Hintergrund geplant (siehe --overview)
+        with override_settings(OVERVIEW_AUTO_REFRESH=False):
+            if options['reset']:
+                self.step("Vorhandene Übungsdaten entfernt", self.reset)
+            self.check_existing()
+
+            rng = random.Random(options['seed'])
+            with transaction.atomic():
+                profiles = self.step("Patientenprofile", self.create_profiles, rng, options)
+                scenario, patients = self.step(
+                    "Organisationen, Szenario und Zuweisungen", self.create_scenario, rng, profiles, options,
+                )
+                forms = self.step("Formulare, Fragen und Optionen", self.create_forms, rng, options)
+                self.step("Formularantworten", self.create_form_responses, rng, forms, options)
+                self.step("Patientenbegleitbögen", self.create_victim_responses, rng, patients, options)
+                self.step("Kennzahlen (QuestionRollup)", self.rebuild_derived, forms)
+            invalidate_triage_analytics()
+            invalidate_scenario_category_stats(scenario.pk)
+
+        if options['overview']:
+            self.step("Szenario-Übersicht", refresh_scenario_overview, scenario.pk)
+
+    def step(self, label, function, *args):
+        """Führt einen Schritt aus und gibt dessen Dauer aus"""
+        start = time.perf_counter()
+        result = function(*args)
+        self.stdout.write(self.style.SUCCESS(f"{label}: {time.perf_counter() - start:.2f} s"))
+        return result
+
+    def moment(self, rng):
+        """Zufälliger Zeitpunkt während der Übung"""
+        return self.start + timedelta(minutes=rng.randint(0, EXERCISE_HOURS * 60 - 30))
+
+    # ----------------------------------------------
+    # Vorhandene Daten
+    # ----------------------------------------------
+    def seeded_forms(self):
+        return Form.objects.filter(name__endswith=NAME_SUFFIX)
+
+    def reset(self):
+        """Entfernt die von diesem Befehl angelegten Daten"""
+        with transaction.atomic():
+            VictimProfileResponse.objects.filter(observer_email__endswith=f"@{OBSERVER_DOMAIN}").delete()
+            # Formulare samt Antworten und Kennzahlen; die Kennzahlen entfallen ohnehin
+            with rollups_detached():
+                self.seeded_forms().delete()
+            TestScenario.objects.filter(name=SCENARIO_NAME).delete()
+            VictimProfile.objects.filter(profile_number__startswith=PROFILE_PREFIX).delete()
+            Organization.objects.filter(name__endswith=NAME_SUFFIX).delete()
+        invalidate_triage_analytics()
+
+    def check_existing(self):
+        """Bricht ab, wenn Übungsdaten oder ein anderes Testszenario vorhanden sind"""
+        if (
+            TestScenario.objects.filter(name=SCENARIO_NAME).exists()
+            or VictimProfile.objects.filter(profile_number__startswith=PROFILE_PREFIX).exists()
+            or self.seeded_forms().exists()
+        ):
+            raise CommandError("Es sind bereits Übungsdaten vorhanden. Mit --reset werden sie vorher entfernt.")
+        if TestScenario.objects.exists():
+            raise CommandError(
+                "Es existiert bereits ein Testszenario. Die Anwendung erlaubt nur eines; "
+                "bitte verwenden Sie eine leere Datenbank oder löschen Sie das Szenario."
+            )
+
+    # ----------------------------------------------
+    # Stammdaten
+    # ----------------------------------------------
+    def create_profiles(self, rng, options):
+        """Legt die Patientenprofile an und gibt sie in Reihenfolge der Profilnummern zurück"""
+        profiles = [
+            VictimProfile(**victim_profile_fields(rng, f"{PROFILE_PREFIX}{index + 1:05d}"))
+            for index in range(options['profiles'])
+        ]
+        return VictimProfile.objects.bulk_create(profiles, batch_size=self.batch_size)
+
+    def create_scenario(self, rng, profiles, options):
+        """
+        Legt Organisationen und Szenario an und weist zufällig gewählte Profile reihum den
+        Organisationen zu.
+
+        Returns:
+            tuple: (Szenario, [(Button-Code, Kategorie), ...])
+        """
+        organizations = Organization.objects.bulk_create([
+            Organization(name=f"{name}{NAME_SUFFIX}", short_code=f"{ORGANIZATION_PREFIX}{code}")
+            for name, code in ORGANIZATIONS[:options['organizations']]
+        ])
+        scenario = TestScenario.objects.create(
+            name=SCENARIO_NAME, date=self.start.date(), description="Automatisch erzeugte Übungsdaten",
+        )
+
+        assignments = []
+        for index, profile in enumerate(rng.sample(profiles, options['victims'])):
+            organization = organizations[index % len(organizations)]
+            sequential = index // len(organizations) + 1
+            assignments.append(TestScenarioVictim(
+                scenario=scenario,
+                victim_profile=profile,
+                organization=organization,
+                sequential_number=sequential,
+                # wie TestScenarioVictim.save()
+                button_number=f"{organization.short_code}{sequential:02d}",
+            ))
+        TestScenarioVictim.objects.bulk_create(assignments, batch_size=self.batch_size)
+        return scenario, [
+            (assignment.button_number, assignment.victim_profile.category) for assignment in assignments
+        ]
+
+    def create_forms(self, rng, options):
+        """Legt Formulare mit Fragen und Optionen an und gibt [(Formular-ID, Layout), ...] zurück"""
+        forms = Form.objects.bulk_create([
+            Form(
+                name=FORM_NAME.format(index=index + 1),
+                description_form="Automatisch erzeugter Beobachtungsbogen",
+                show_patient_profile_search=index == 0,
+            )
+            for index in range(options['forms'])
+        ])
+
+        questions = []
+        for form in forms:
+            for index in range(options['questions']):
+                questions.append(Question(
+                    form=form,
+                    question_text=f"Frage {index + 1}: {rng.choice(OBSERVATIONS)}?",
+                    option_type=rng.choice(QUESTION_TYPES),
+                    input_field_added=rng.random() < 0.3,
+                    image_upload_desired=rng.random() < 0.05,
+                ))
+        Question.objects.bulk_create(questions, batch_size=self.batch_size)
+
+        # Option.save() verbietet Optionen für Skala-Fragen; hier nur Checkbox und Dropdown
+        Option.objects.bulk_create(
+            [
+                Option(question=question, label=label)
+                for question in questions if question.option_type in ('checkbox', 'dropdown')
+                for label in rng.sample(OPTION_LABELS, rng.randint(3, 8))
+            ],
+            batch_size=self.batch_size,
+        )
+
+        layouts = []
+        for form in forms:
+            invalidate_form_layout(form.pk)
+            layouts.append((form.pk, get_form_layout(form.pk)))
+        return layouts
+
+    # ----------------------------------------------
+    # Antworten
+    # ----------------------------------------------
+    def insert(self, model, rows, timestamp_fields, events_of):
+        """
+        Fügt einen Block ein und legt die Zeitstrahl-Ereignisse an.
+
+        bulk_create setzt auto_now/auto_now_add-Felder auf die aktuelle Zeit; die
+        vorgesehenen Zeitpunkte werden danach mit einem UPDATE je Zeile (executemany)
+        wiederhergestellt. bulk_update wäre hier durch die CASE-Ausdrücke deutlich langsamer.
+        """
+        objects = [obj for obj, _times in rows]
+        model.objects.bulk_create(objects)
+        fields = [model._meta.get_field(name) for name in timestamp_fields]
+        for obj, times in rows:
+            for field, value in zip(fields, times):
+                setattr(obj, field.attname, value)
+
+        quote = connection.ops.quote_name
+        assignments = ", ".join(f"{quote(field.column)} = %s" for field in fields)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {quote(model._meta.db_table)} SET {assignments} WHERE {quote(model._meta.pk.column)} = %s",
+                [
+                    [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields] + [obj.pk]
+                    for obj in objects
+                ],
+            )
+        TimelineEvent.objects.bulk_create(
+            [event for obj in objects for event in events_of(obj)], batch_size=self.batch_size,
+        )
+
+    def create_form_responses(self, rng, forms, options):
+        """Formularantworten, gleichmäßig auf die Formulare verteilt"""
+        question_ids = {form_id: {question['id'] for question in layout} for form_id, layout in forms}
+
+        def events_of(response):
+            return form_response_events(response, question_ids[response.form_id])
+
+        rows = []
+        for index in range(options['form_responses']):
+            form_id, layout = forms[index % len(forms)]
+            observer_name, observer_email = observer_identity(rng, OBSERVER_DOMAIN)
+            observed_at = self.moment(rng)
+            payload = form_response_payload(rng, layout, observed_at, timestamp_rate=0.05)
+            response = FormResponse(
+                form_id=form_id, observer_name=observer_name, observer_email=observer_email, **payload,
+            )
+            rows.append((response, (observed_at + timedelta(minutes=rng.randint(5, 30)),)))
+            if len(rows) >= self.batch_size:
+                self.insert(FormResponse, rows, ['submitted_at'], events_of)
+                rows = []
+        if rows:
+            self.insert(FormResponse, rows, ['submitted_at'], events_of)
+
+    def create_victim_responses(self, rng, patients, options):
+        """Patientenbegleitbögen zu zufälligen Patienten des Szenarios"""
+        rows = []
+        for _index in range(options['victim_responses']):
+            button_number, category = rng.choice(patients)
+            observer_name, observer_email = observer_identity(rng, OBSERVER_DOMAIN)
+            observed_at = self.moment(rng)
+            response = VictimProfileResponse(
+                observer_name=observer_name,
+                observer_email=observer_email,
+                **victim_response_payload(rng, button_number, category, observed_at),
+            )
+            created = observed_at + timedelta(minutes=rng.randint(10, 30))
+            rows.append((response, (created, created + timedelta(minutes=rng.randint(0, 20)))))
+            if len(rows) >= self.batch_size:
+                self.insert(VictimProfileResponse, rows, ['erstellt_am', 'aktualisiert_am'], victim_response_events)
+                rows = []
+        if rows:
+            self.insert(VictimProfileResponse, rows, ['erstellt_am', 'aktualisiert_am'], victim_response_events)
+
+    def rebuild_derived(self, forms):
+        """Berechnet die Kennzahlen der neuen Formulare (die Signale entfallen bei bulk_create)"""
+        for form_id, _layout in forms:
+            rebuild_rollups(form_id)
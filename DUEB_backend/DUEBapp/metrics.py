@@ -0,0 +1,272 @@
+# metrics.py - Betriebskennzahlen im Prometheus-Textformat
+#
+# Stellt einfache Zähler (Counter), Momentanwerte (Gauge) und Histogramme bereit, die
+# über /metrics (siehe views.MetricsView) im Prometheus-Textformat 0.0.4 abgerufen werden
+# können. Es wird kein externer Dienst und keine zusätzliche Bibliothek benötigt.
+#
+# Eine Aktualisierung hält nur kurz die Sperre der jeweiligen Kennzahl (ein Dictionary-
+# Zugriff und eine Addition). Werte wie die Länge der Schreibwarteschlange werden erst beim
+# Abruf von /metrics über eine Callback-Funktion ermittelt und kosten im Request nichts.
+#
+# Die Werte gelten pro Prozess: Bei mehreren Worker-Prozessen liefert jeder Abruf die
+# Werte des Workers, der ihn beantwortet.
+
+import threading
+import time
+from contextlib import contextmanager
+from django.db import OperationalError
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Obergrenzen der Histogramm-Buckets in Sekunden
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RENDER_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LOCK_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+REGISTRY = []
+
+
+# --------------------------------------------------
+# 1) KENNZAHL-TYPEN
+# --------------------------------------------------
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Gemeinsame Basis: Name, Beschreibung, Label-Namen und Werte je Label-Kombination"""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} erwartet die Labels {self.labelnames}")
+        return tuple(str(label) for label in labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, extra, value in self.samples():
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(self.labelnames, labels, extra)} {_format_value(value)}"
+            )
+        return lines
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield '', labels, (), value
+
+
+class Counter(Metric):
+    """Monoton steigender Zähler"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            # Ohne Labels von Anfang an mit 0 ausgeben
+            self._values[()] = 0
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Momentanwert; mit callback wird der Wert erst beim Abruf ermittelt"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def samples(self):
+        if self.callback is None:
+            yield from super().samples()
+            return
+        yield '', (), (), self.callback()
+
+
+class Histogram(Metric):
+    """Verteilung von Dauern in festen Buckets (kumulativ ausgegeben)"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [Anzahl je Bucket ..., +Inf-Bucket, Summe]
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[index] += 1
+                    break
+            else:
+                entry[len(self.buckets)] += 1
+            entry[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """Misst die Dauer des with-Blocks (auch wenn er mit einer Ausnahme endet)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(entry)) for labels, entry in self._values.items())
+        for labels, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry[:-1]):
+                cumulative += count
+                yield '_bucket', labels, (('le', _format_value(float(bound))),), cumulative
+            yield '_sum', labels, (), entry[-1]
+            yield '_count', labels, (), cumulative
+
+
+def render_metrics():
+    """Alle Kennzahlen im Prometheus-Textformat"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# --------------------------------------------------
+# 2) KENNZAHLEN DER ANWENDUNG
+# --------------------------------------------------
+def _pending_writes():
+    from .write_queue import pending_writes
+    return pending_writes()
+
+
+def _pending_overview_refreshes():
+    from .overview import pending_overview_refreshes
+    return len(pending_overview_refreshes())
+
+
+REQUEST_LATENCY = Histogram(
+    'dueb_request_duration_seconds', "Laufzeit der Requests je View und Aktion",
+    ('view', 'action', 'status'),
+)
+FORM_SUBMISSIONS = Counter(
+    'dueb_form_submissions_total', "Gespeicherte Formularantworten je Formular", ('form',),
+)
+VICTIM_PROFILE_SUBMISSIONS = Counter(
+    'dueb_victimprofile_submissions_total', "Gespeicherte Patientenbegleitbögen",
+)
+EXCEL_RENDER = Histogram(
+    'dueb_excel_render_seconds', "Dauer der Erzeugung einer Excel-Datei (ohne Treffer im Berichtsspeicher)",
+    ('report',), buckets=RENDER_BUCKETS,
+)
+EMAIL_SEND = Histogram(
+    'dueb_email_send_seconds', "Dauer des E-Mail-Versands", ('kind',), buckets=RENDER_BUCKETS,
+)
+EMAIL_FAILURES = Counter(
+    'dueb_email_failures_total', "Fehlgeschlagene E-Mail-Versendungen", ('kind',),
+)
+IMPORT_RUNNING = Gauge(
+    'dueb_import_running', "Laufende Excel-Importe von Patientenprofilen",
+)
+IMPORT_ROWS = Gauge(
+    'dueb_import_rows_processed', "Gelesene Zeilen des laufenden bzw. letzten Excel-Imports",
+)
+IMPORT_PROFILES = Counter(
+    'dueb_import_profiles_total', "Importierte Patientenprofile", ('result',),
+)
+DB_LOCK_WAIT = Histogram(
+    'dueb_db_lock_wait_seconds', "Wartezeit auf die Schreibsperre beim Transaktionsbeginn (BEGIN)",
+    ('database',), buckets=LOCK_WAIT_BUCKETS,
+)
+DB_LOCK_ERRORS = Counter(
+    'dueb_db_lock_errors_total', "Abfragen, die mit 'database is locked' abgebrochen wurden", ('database',),
+)
+WRITE_QUEUE_PENDING = Gauge(
+    'dueb_write_queue_pending', "Einsendungen, die auf den nächsten Gruppen-Commit warten",
+    callback=_pending_writes,
+)
+OVERVIEW_REFRESH_PENDING = Gauge(
+    'dueb_overview_refresh_pending', "Szenarien mit ausstehender Neuerzeugung der Übersicht",
+    callback=_pending_overview_refreshes,
+)
+
+
+@contextmanager
+def track_email(kind):
+    """Misst einen E-Mail-Versand und zählt Fehler (die Ausnahme wird weitergereicht)"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EMAIL_FAILURES.inc(kind)
+        raise
+    finally:
+        EMAIL_SEND.observe(time.perf_counter() - start, kind)
+
+
+# --------------------------------------------------
+# 3) WARTEZEIT AUF DIE DATENBANK-SPERRE
+# --------------------------------------------------
+# Mit transaction_mode IMMEDIATE (siehe settings.DATABASES) wartet SQLite beim BEGIN auf
+# die Schreibsperre (bis busy_timeout). Die Dauer des BEGIN entspricht daher der Wartezeit.
+
+def _db_lock_wrapper(execute, sql, params, many, context):
+    alias = context['connection'].alias
+    try:
+        if not sql.startswith('BEGIN'):
+            return execute(sql, params, many, context)
+        with DB_LOCK_WAIT.time(alias):
+            return execute(sql, params, many, context)
+    except OperationalError as exc:
+        if 'locked' in str(exc):
+            DB_LOCK_ERRORS.inc(alias)
+        raise
+
+
+def install_db_metrics(sender, connection, **kwargs):
+    """Handler für connection_created: misst Sperr-Wartezeiten auf SQLite-Verbindungen"""
+    if connection.vendor == 'sqlite' and _db_lock_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _db_lock_wrapper)
@@ -0,0 +1,227 @@
+# middleware.py - Messung von SQL-Abfragen und Laufzeit pro Request
+#
+# RequestProfilingMiddleware zählt für jeden Request die ausgeführten SQL-Abfragen, deren
+# Gesamtdauer und die Gesamtlaufzeit der View. Gleichartige Abfragen (gleiches SQL, nur
+# andere Parameter) werden über einen Fingerabdruck zusammengefasst; tritt derselbe
+# Fingerabdruck mehrfach auf, deutet das auf ein N+1-Problem hin.
+#
+# Die Werte werden
+#   - als Server-Timing-Header ausgeliefert (sichtbar in den Entwicklertools des Browsers),
+#   - als strukturierte Logzeile (Logger "DUEBapp.middleware") geschrieben und
+#   - bei Überschreitung der Schwellwerte (REQUEST_PROFILING_SLOW_MS,
+#     REQUEST_PROFILING_MAX_QUERIES) zusammen mit den auffälligen Abfragen als Warnung geloggt.
+#
+# Die Abfragen werden über connection.execute_wrapper erfasst und funktionieren daher
+# auch mit DEBUG = False. Schreibvorgänge der Schreibwarteschlange (write_queue.py) laufen
+# in einem eigenen Thread und erscheinen nicht in den Werten des Requests.
+#
+# MetricsMiddleware erfasst die Laufzeit zusätzlich je ViewSet und Aktion im Histogramm
+# dueb_request_duration_seconds (abrufbar über /metrics, siehe metrics.py).
+
+import hashlib
+import logging
+import re
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from .metrics import REQUEST_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Anzahl der Abfragen, die bei einer Warnung höchstens aufgeführt werden
+SLOW_QUERY_LOG_LIMIT = 5
+# Maximale Länge des SQL-Textes in Logzeilen
+SQL_LOG_LENGTH = 300
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*%s\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+# --------------------------------------------------
+# 1) FINGERABDRUCK EINER ABFRAGE
+# --------------------------------------------------
+def normalize_sql(sql):
+    """
+    Ersetzt Literale und Parameterlisten durch Platzhalter, damit Abfragen, die sich
+    nur in den Parametern unterscheiden, denselben Text erhalten.
+    """
+    sql = _STRING_LITERAL.sub("%s", sql)
+    sql = _NUMBER_LITERAL.sub("%s", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def sql_fingerprint(sql):
+    """Kurzer, stabiler Fingerabdruck einer Abfrage (für Logzeilen)"""
+    return hashlib.sha1(normalize_sql(sql).encode("utf-8")).hexdigest()[:10]
+
+
+# --------------------------------------------------
+# 2) ERFASSUNG DER ABFRAGEN
+# --------------------------------------------------
+class QueryRecorder:
+    """execute_wrapper, der Dauer und Fingerabdruck jeder Abfrage festhält"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_seconds(self):
+        return sum(duration for _sql, duration in self.queries)
+
+    def duplicates(self):
+        """
+        Mehrfach ausgeführte Abfragen, absteigend nach Häufigkeit.
+
+        Returns:
+            list: [(Fingerabdruck, Anzahl, Gesamtdauer in s, Beispiel-SQL), ...]
+        """
+        groups = {}
+        for sql, duration in self.queries:
+            normalized = normalize_sql(sql)
+            count, total, _sample = groups.get(normalized, (0, 0.0, sql))
+            groups[normalized] = (count + 1, total + duration, sql)
+        return sorted(
+            (
+                (sql_fingerprint(normalized), count, total, sample)
+                for normalized, (count, total, sample) in groups.items()
+                if count > 1
+            ),
+            key=lambda item: (-item[1], -item[2]),
+        )
+
+    def slowest(self, limit=SLOW_QUERY_LOG_LIMIT):
+        """Die langsamsten Abfragen [(Dauer in s, SQL), ...]"""
+        return sorted(((duration, sql) for sql, duration in self.queries), reverse=True)[:limit]
+
+
+def _shorten(sql):
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    return sql if len(sql) <= SQL_LOG_LENGTH else sql[:SQL_LOG_LENGTH] + "..."
+
+
+# --------------------------------------------------
+# 3) MIDDLEWARE
+# --------------------------------------------------
+class RequestProfilingMiddleware:
+    """
+    Misst Abfragen und Laufzeit pro Request und liefert sie als Server-Timing-Header
+    und Logzeile aus. Abschaltbar mit REQUEST_PROFILING = False.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REQUEST_PROFILING:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        self.report(request, response, recorder, total)
+        return response
+
+    def view_name(self, request):
+        """Name der aufgerufenen View (URL-Name oder Pfad der View-Funktion)"""
+        match = getattr(request, "resolver_match", None)
+        return match.view_name if match is not None else "-"
+
+    def report(self, request, response, recorder, total):
+        db_ms = recorder.total_seconds * 1000
+        total_ms = total * 1000
+        duplicates = recorder.duplicates()
+        duplicate_count = sum(count - 1 for _fp, count, _total, _sql in duplicates)
+
+        if settings.REQUEST_PROFILING_HEADER:
+            response["Server-Timing"] = ", ".join((
+                f'db;dur={db_ms:.1f};desc="{recorder.count} queries"',
+                f'dup;desc="{duplicate_count} duplicate queries"',
+                f"app;dur={max(total_ms - db_ms, 0.0):.1f}",
+                f"total;dur={total_ms:.1f}",
+            ))
+
+        view = self.view_name(request)
+        fields = {
+            "view": view,
+            "method": request.method,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "duplicates": duplicate_count,
+            "db_ms": round(db_ms, 1),
+            "total_ms": round(total_ms, 1),
+        }
+        logger.info(
+            "request view=%s method=%s status=%s queries=%s duplicates=%s db_ms=%.1f total_ms=%.1f",
+            view, request.method, response.status_code, recorder.count, duplicate_count, db_ms, total_ms,
+            extra={"profiling": fields},
+        )
+
+        slow = total_ms >= settings.REQUEST_PROFILING_SLOW_MS
+        chatty = recorder.count >= settings.REQUEST_PROFILING_MAX_QUERIES
+        if not (slow or chatty):
+            return
+
+        lines = [
+            f"Auffälliger Request {request.method} {view}: {recorder.count} Abfragen, "
+            f"{duplicate_count} Wiederholungen, {db_ms:.1f} ms SQL, {total_ms:.1f} ms gesamt"
+        ]
+        for fingerprint, count, duration, sql in duplicates[:SLOW_QUERY_LOG_LIMIT]:
+            lines.append(f"  {count}x [{fingerprint}] {duration * 1000:.1f} ms: {_shorten(sql)}")
+        for duration, sql in recorder.slowest():
+            lines.append(f"  Dauer [{sql_fingerprint(sql)}] {duration * 1000:.1f} ms: {_shorten(sql)}")
+        logger.warning("\n".join(lines), extra={"profiling": fields})
+
+
+# --------------------------------------------------
+# 4) LATENZ-HISTOGRAMM FÜR /metrics
+# --------------------------------------------------
+def view_labels(request):
+    """
+    Labels (view, action) eines Requests: bei ViewSets Klasse und Aktion (list, create, ...),
+    bei APIViews Klasse und HTTP-Methode, bei unbekannten URLs "-".
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "-", request.method.lower()
+    view_class = getattr(match.func, "cls", None)
+    view = view_class.__name__ if view_class is not None else match.view_name
+    actions = getattr(match.func, "actions", None) or {}
+    return view, actions.get(request.method.lower(), request.method.lower())
+
+
+class MetricsMiddleware:
+    """Erfasst die Laufzeit jedes Requests in dueb_request_duration_seconds"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        view, action = view_labels(request)
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start, view, action, f"{response.status_code // 100}xx",
+        )
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DUEBapp', '0049_alter_victimprofileresponse_verlauf'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('responses', 'Antworten des Formulars'), ('answered', 'Frage beantwortet'), ('option', 'Checkbox-Option gewählt'), ('choice', 'Auswahlmenü-Wert gewählt'), ('scale', 'Skalenwert'), ('text', 'Freitext ausgefüllt'), ('timestamps', 'Zeitstempel')], max_length=20, verbose_name='Art')),
+                ('value', models.CharField(blank=True, default='', max_length=255, verbose_name='Wert')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Anzahl')),
+                ('total', models.FloatField(default=0, verbose_name='Summe')),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_rollups', to='DUEBapp.form', verbose_name='Formular')),
+                ('question', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='DUEBapp.question', verbose_name='Frage')),
+            ],
+            options={
+                'verbose_name': 'Antwort-Statistik',
+                'verbose_name_plural': 'Antwort-Statistiken',
+                'constraints': [models.UniqueConstraint(fields=('form', 'question', 'kind', 'value'), name='unique_question_rollup')],
+            },
+        ),
+    ]
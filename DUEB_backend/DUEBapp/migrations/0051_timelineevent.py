@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DUEBapp', '0050_questionrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('question', 'Zeitstempel zu einer Frage'), ('note', 'Zeitstempel zur allgemeinen Notiz'), ('verlauf', 'Verlaufseintrag Patientenbegleitbogen')], max_length=20, verbose_name='Quelle')),
+                ('button_number', models.CharField(blank=True, default='', max_length=50, verbose_name='Button-Nr')),
+                ('occurred_at', models.DateTimeField(verbose_name='Zeitpunkt')),
+                ('raw_time', models.CharField(blank=True, default='', max_length=50, verbose_name='Zeitangabe (Original)')),
+                ('area', models.CharField(blank=True, default='', max_length=255, verbose_name='KH-Bereich')),
+                ('note', models.TextField(blank=True, default='', verbose_name='Notiz')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='Position in der Liste')),
+                ('form_response', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='timeline_events', to='DUEBapp.formresponse', verbose_name='Formular-Antwort')),
+                ('question', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='timeline_events', to='DUEBapp.question', verbose_name='Frage')),
+                ('victim_response', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='timeline_events', to='DUEBapp.victimprofileresponse', verbose_name='Antwort Patientenbegleitbogen')),
+            ],
+            options={
+                'verbose_name': 'Zeitstrahl-Ereignis',
+                'verbose_name_plural': 'Zeitstrahl-Ereignisse',
+                'ordering': ['occurred_at', 'id'],
+                'indexes': [models.Index(fields=['occurred_at'], name='timeline_occurred_idx'), models.Index(fields=['button_number', 'occurred_at'], name='timeline_button_idx'), models.Index(fields=['question', 'occurred_at'], name='timeline_question_idx')],
+            },
+        ),
+    ]
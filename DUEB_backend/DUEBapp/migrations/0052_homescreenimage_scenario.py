@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DUEBapp', '0051_timelineevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='homescreenimage',
+            name='scenario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='overview_images', to='DUEBapp.testscenario', verbose_name='Übersicht für Szenario'),
+        ),
+    ]
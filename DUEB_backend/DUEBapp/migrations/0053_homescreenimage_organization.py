@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DUEBapp', '0052_homescreenimage_scenario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='homescreenimage',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='overview_images', to='DUEBapp.organization', verbose_name='Organisation'),
+        ),
+    ]
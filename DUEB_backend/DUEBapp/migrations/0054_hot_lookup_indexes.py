@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DUEBapp', '0053_homescreenimage_organization'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='form',
+            index=models.Index(fields=['name'], name='form_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='formresponse',
+            index=models.Index(fields=['form', 'submitted_at'], name='formresponse_form_sub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='victimprofile',
+            index=models.Index(fields=['category'], name='victimprofile_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='victimprofileresponse',
+            index=models.Index(fields=['button_number', '-erstellt_am'], name='vpr_button_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='victimprofileresponse',
+            index=models.Index(fields=['-erstellt_am'], name='vpr_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='victimprofileresponse',
+            index=models.Index(fields=['ist_sichtung'], name='vpr_ist_sichtung_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='victimprofileresponse',
+            index=models.Index(fields=['soll_sichtung'], name='vpr_soll_sichtung_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='victimprofileresponse',
+            index=models.Index(fields=['observer_name'], name='vpr_observer_name_idx'),
+        ),
+    ]
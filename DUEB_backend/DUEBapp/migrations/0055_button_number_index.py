@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DUEBapp', '0054_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='testscenariovictim',
+            index=models.Index(fields=['button_number', '-scenario'], name='tsv_button_scenario_idx'),
+        ),
+    ]
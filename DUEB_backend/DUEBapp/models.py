@@ -29,6 +29,9 @@ class Form(models.Model):
     class Meta:
         verbose_name = "Formular"
         verbose_name_plural = "Formulare"
+        indexes = [
+            models.Index(fields=['name'], name='form_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -129,6 +132,9 @@ class FormResponse(models.Model):
     class Meta:
         verbose_name = "Formular-Antwort"
         verbose_name_plural = "Formular-Antworten"
+        indexes = [
+            models.Index(fields=['form', 'submitted_at'], name='formresponse_form_sub_idx'),
+        ]
 
     def __str__(self):
         return f"Response to {self.form.name} by {self.observer_name}"
@@ -160,6 +166,23 @@ class HomeScreenImage(models.Model):
     """Bilder für den Startbildschirm der Anwendung"""
     image = models.ImageField("Bilddatei", upload_to='homescreen/')
     description = models.TextField("Beschreibung", blank=True, null=True)
+    # Gesetzt bei automatisch erzeugten Szenario-Übersichten (je Organisation, siehe overview.py)
+    scenario = models.ForeignKey(
+        'TestScenario',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='overview_images',
+        verbose_name="Übersicht für Szenario"
+    )
+    organization = models.ForeignKey(
+        'Organization',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='overview_images',
+        verbose_name="Organisation"
+    )
 
     class Meta:
         verbose_name = "Startbild"
@@ -239,6 +262,9 @@ class VictimProfile(models.Model):
     class Meta:
         verbose_name = "Patientenprofil"
         verbose_name_plural = "Patientenprofile"
+        indexes = [
+            models.Index(fields=['category'], name='victimprofile_category_idx'),
+        ]
 
     def __str__(self):
         base = f"Profil {self.profile_number or self.pk}"
@@ -370,6 +396,11 @@ class TestScenarioVictim(models.Model):
         verbose_name = "Zuweisung Profil–Szenario"
         verbose_name_plural = "Zuweisungen Profil–Szenario"
         ordering = ['sequential_number']
+        indexes = [
+            # Zuweisung zu einer Button-Nummer (Sichtungsauswertung, Patientensuche); der
+            # Unique-Constraint beginnt mit scenario und hilft bei dieser Suche nicht
+            models.Index(fields=['button_number', '-scenario'], name='tsv_button_scenario_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['scenario', 'organization', 'sequential_number'],
@@ -471,6 +502,133 @@ class VictimProfileResponse(models.Model):
         verbose_name = "Antwort Patientenbegleitbogen"
         verbose_name_plural = "Antworten Patientenbegleitbogen"
         ordering = ['-erstellt_am']  # Neueste zuerst anzeigen
+        indexes = [
+            # Neueste Antwort je Button-Nummer (Excel-Versand, Sichtungsauswertung)
+            models.Index(fields=['button_number', '-erstellt_am'], name='vpr_button_created_idx'),
+            models.Index(fields=['-erstellt_am'], name='vpr_created_idx'),
+            # Filter der Admin-Änderungsliste
+            models.Index(fields=['ist_sichtung'], name='vpr_ist_sichtung_idx'),
+            models.Index(fields=['soll_sichtung'], name='vpr_soll_sichtung_idx'),
+            models.Index(fields=['observer_name'], name='vpr_observer_name_idx'),
+        ]
 
     def __str__(self):
         return f"VictimProfileResponse ({self.button_number}) - {self.observer_name}"
+
+
+# ----------------------------
+# 9. QuestionRollup - Vorberechnete Kennzahlen der Formularantworten
+# ----------------------------
+# Speichert laufend aktualisierte Zählungen und Summen je Frage/Option, damit
+# Statistiken ohne Auslesen aller FormResponse-JSON-Felder abgefragt werden können.
+
+class QuestionRollup(models.Model):
+    """
+    Kennzahl zu einer Frage eines Formulars, die bei jedem Speichern oder Löschen
+    einer FormResponse inkrementell angepasst wird (siehe rollups.py).
+    Zeilen ohne Frage (kind="responses") zählen die Antworten des Formulars.
+    """
+    KIND_CHOICES = (
+        ('responses', 'Antworten des Formulars'),
+        ('answered', 'Frage beantwortet'),
+        ('option', 'Checkbox-Option gewählt'),
+        ('choice', 'Auswahlmenü-Wert gewählt'),
+        ('scale', 'Skalenwert'),
+        ('text', 'Freitext ausgefüllt'),
+        ('timestamps', 'Zeitstempel'),
+    )
+
+    form = models.ForeignKey(
+        Form,
+        related_name='question_rollups',
+        on_delete=models.CASCADE,
+        verbose_name="Formular"
+    )
+    question = models.ForeignKey(
+        Question,
+        related_name='rollups',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        verbose_name="Frage"
+    )
+    kind = models.CharField("Art", max_length=20, choices=KIND_CHOICES)
+    value = models.CharField("Wert", max_length=255, blank=True, default='')
+    count = models.BigIntegerField("Anzahl", default=0)
+    total = models.FloatField("Summe", default=0)
+
+    class Meta:
+        verbose_name = "Antwort-Statistik"
+        verbose_name_plural = "Antwort-Statistiken"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['form', 'question', 'kind', 'value'],
+                name='unique_question_rollup'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.form_id}/{self.question_id} {self.kind}={self.value}: {self.count}"
+
+
+
+# ----------------------------
+# 10. TimelineEvent - Zeitstempel aller Antworten als eigene Zeilen
+# ----------------------------
+# Die Zeitstempel der Fragen, der allgemeinen Notiz und die Verlaufseinträge der
+# Patientenbegleitbögen liegen in JSON-Listen. Beim Speichern werden sie zusätzlich
+# als einzelne, indizierte Ereignisse abgelegt, damit Zeitraumabfragen und
+# Zeitverläufe ohne Auslesen aller Antworten möglich sind (siehe timeline.py).
+
+class TimelineEvent(models.Model):
+    """Einzelnes Ereignis (Zeitstempel) aus einer FormResponse oder VictimProfileResponse"""
+    SOURCE_CHOICES = (
+        ('question', 'Zeitstempel zu einer Frage'),
+        ('note', 'Zeitstempel zur allgemeinen Notiz'),
+        ('verlauf', 'Verlaufseintrag Patientenbegleitbogen'),
+    )
+
+    source = models.CharField("Quelle", max_length=20, choices=SOURCE_CHOICES)
+    form_response = models.ForeignKey(
+        FormResponse,
+        related_name='timeline_events',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        verbose_name="Formular-Antwort"
+    )
+    victim_response = models.ForeignKey(
+        'VictimProfileResponse',
+        related_name='timeline_events',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        verbose_name="Antwort Patientenbegleitbogen"
+    )
+    question = models.ForeignKey(
+        Question,
+        related_name='timeline_events',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        verbose_name="Frage"
+    )
+    button_number = models.CharField("Button-Nr", max_length=50, blank=True, default='')
+    occurred_at = models.DateTimeField("Zeitpunkt")
+    raw_time = models.CharField("Zeitangabe (Original)", max_length=50, blank=True, default='')
+    area = models.CharField("KH-Bereich", max_length=255, blank=True, default='')
+    note = models.TextField("Notiz", blank=True, default='')
+    position = models.PositiveIntegerField("Position in der Liste", default=0)
+
+    class Meta:
+        verbose_name = "Zeitstrahl-Ereignis"
+        verbose_name_plural = "Zeitstrahl-Ereignisse"
+        ordering = ['occurred_at', 'id']
+        indexes = [
+            models.Index(fields=['occurred_at'], name='timeline_occurred_idx'),
+            models.Index(fields=['button_number', 'occurred_at'], name='timeline_button_idx'),
+            models.Index(fields=['question', 'occurred_at'], name='timeline_question_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_source_display()} {self.occurred_at:%d.%m.%Y %H:%M}"
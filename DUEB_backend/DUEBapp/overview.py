@@ -0,0 +1,231 @@
+# overview.py - Automatische Neuerzeugung der Szenario-Übersicht
+#
+# Die Übersicht (PNG-Seiten, siehe pillow_utils.py) wird nicht mehr im Admin-Request gezeichnet,
+# sondern nach Änderungen an den Zuweisungen in einem Hintergrund-Thread. Änderungen, die kurz
+# hintereinander eingehen (z.B. beim Speichern vieler Inline-Zeilen), werden entprellt: Jede
+# Änderung startet die Wartezeit neu, gezeichnet wird erst, wenn OVERVIEW_REFRESH_DELAY Sekunden
+# lang keine weitere Änderung eingegangen ist. Die neuen Seiten ersetzen die bisherigen
+# Übersichtsbilder des Szenarios (HomeScreenImage mit gesetztem scenario).
+#
+# Jede Organisation erhält eine eigene, kleine Übersicht mit ihren Patienten; die Übersichten
+# der Organisationen werden parallel in einem Prozesspool gezeichnet.
+#
+# Entprellung und Zeichensperre gelten nur innerhalb eines Prozesses. Bei mehreren Worker-
+# Prozessen plant jeder Worker, der eine Änderung speichert, eine eigene Neuerzeugung; dieselbe
+# Übersicht kann dann mehrfach gezeichnet werden. Das ist unschädlich: Die Seiten werden unter
+# einem Schlüssel ihres Inhalts gespeichert, über eindeutige temporäre Dateien geschrieben und
+# atomar ersetzt (siehe pillow_utils.generate_overview_image).
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from .models import HomeScreenImage, TestScenario
+from .pillow_utils import generate_overview_image
+
+logger = logging.getLogger(__name__)
+
+# Unterhalb dieser Gesamtzahl an Zeilen wird ohne Prozesspool gezeichnet (Startkosten der Prozesse)
+OVERVIEW_PARALLEL_MIN_ROWS = 200
+
+# Laufende Wartezeiten je Szenario {scenario_id: threading.Timer} (nur dieser Prozess)
+_pending = {}
+_pending_lock = threading.Lock()
+# Verhindert, dass zwei Neuerzeugungen im selben Prozess gleichzeitig zeichnen (nicht prozessübergreifend)
+_render_lock = threading.Lock()
+
+
+# --------------------------------------------------
+# 1) EINTRÄGE JE ORGANISATION
+# --------------------------------------------------
+def scenario_overview_groups(scenario):
+    """
+    Liefert die Einträge der Übersicht aufgeteilt nach Organisation der Zuweisung.
+
+    Returns:
+        dict: {Organization oder None: [Eintrag, ...]}
+    """
+    groups = {}
+    for asn in scenario.assignments.select_related("victim_profile", "organization"):
+        vp = asn.victim_profile
+        groups.setdefault(asn.organization, []).append({
+            "button_number": asn.button_number,
+            "profile_number": vp.profile_number or "",
+            "category": vp.category.strip() if vp.category else "",
+            "diagnosis": vp.diagnosis or "",
+            "visual": vp.visual_diagnosis or "",
+            "pcz": vp.pcz_ivena or "",
+        })
+    return groups
+
+
+def overview_title(scenario, organization):
+    """Titel der Übersicht einer Organisation (erscheint auch im Dateinamen)"""
+    if organization is None:
+        return f"{scenario.name} - ohne Organisation"
+    return f"{scenario.name} - {organization.short_code}"
+
+
+# --------------------------------------------------
+# 2) PARALLELES ZEICHNEN UND ERSETZEN
+# --------------------------------------------------
+def _overview_workers(job_count):
+    """Anzahl der Prozesse für das Zeichnen (höchstens eine pro Organisation)"""
+    configured = settings.OVERVIEW_WORKERS or os.cpu_count() or 1
+    return max(1, min(configured, job_count))
+
+
+def render_overview_sheets(jobs, date_str):
+    """
+    Zeichnet die Übersichten mehrerer Organisationen. Bei mehreren Übersichten mit
+    zusammen mindestens OVERVIEW_PARALLEL_MIN_ROWS Zeilen (und mehr als einem Prozess)
+    wird parallel in einem Prozesspool gezeichnet.
+
+    Parameters:
+        jobs (list): [(Titel, Einträge), ...]
+        date_str (str/date): Datum der Übung
+
+    Returns:
+        list: Relative Pfade je Job (in der Reihenfolge von jobs)
+    """
+    media_root = settings.MEDIA_ROOT
+    output_format = settings.OVERVIEW_FORMAT
+    workers = _overview_workers(len(jobs))
+    if workers == 1 or sum(len(entries) for _title, entries in jobs) < OVERVIEW_PARALLEL_MIN_ROWS:
+        return [
+            generate_overview_image(entries, title, date_str, media_root, output_format)
+            for title, entries in jobs
+        ]
+
+    # "spawn" statt "fork": Der Aufruf erfolgt aus einem Thread, ein Fork könnte belegte Locks erben
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    ) as pool:
+        futures = [
+            pool.submit(generate_overview_image, entries, title, date_str, media_root, output_format)
+            for title, entries in jobs
+        ]
+        return [future.result() for future in futures]
+
+
+def refresh_scenario_overview(scenario_id):
+    """
+    Zeichnet je Organisation eine Übersicht des Szenarios und ersetzt die bisherigen
+    Übersichtsbilder. Bei unveränderten Daten werden die vorhandenen Dateien wiederverwendet.
+
+    Returns:
+        list: Die aktuellen HomeScreenImage-Objekte (leer, wenn das Szenario nicht mehr existiert)
+    """
+    scenario = TestScenario.objects.filter(pk=scenario_id).first()
+    if scenario is None:
+        return []
+
+    with _render_lock:
+        groups = sorted(
+            scenario_overview_groups(scenario).items(),
+            key=lambda item: (item[0] is None, item[0].short_code if item[0] else ""),
+        )
+        results = render_overview_sheets(
+            [(overview_title(scenario, org), entries) for org, entries in groups],
+            scenario.date or "",
+        )
+
+        date_text = f" vom {scenario.date.strftime('%d.%m.%Y')}" if scenario.date else ""
+        current_paths = [path for rel_paths in results for path in rel_paths]
+        with transaction.atomic():
+            images = []
+            for (org, _entries), rel_paths in zip(groups, results):
+                org_text = f" ({org.name})" if org else ""
+                description = f"Übersicht für Szenario {scenario.name}{date_text}{org_text}"
+                for page, rel_path in enumerate(rel_paths, start=1):
+                    image, _created = HomeScreenImage.objects.update_or_create(
+                        image=rel_path,
+                        defaults={
+                            'scenario': scenario,
+                            'organization': org,
+                            'description': description if len(rel_paths) == 1
+                            else f"{description} (Seite {page} von {len(rel_paths)})",
+                        },
+                    )
+                    images.append(image)
+            outdated = list(scenario.overview_images.exclude(image__in=current_paths))
+            for image in outdated:
+                image.delete()
+
+        # Dateien erst nach erfolgreichem Umhängen entfernen (sofern nicht anderweitig verwendet)
+        delete_unused_files(outdated)
+    return images
+
+
+def delete_unused_files(images):
+    """Entfernt die Dateien gelöschter Übersichtsbilder, sofern kein anderes Bild sie verwendet"""
+    for image in images:
+        if not HomeScreenImage.objects.filter(image=image.image.name).exists():
+            image.image.storage.delete(image.image.name)
+
+
+def remove_overview_images(scenario_id):
+    """
+    Löscht die Übersichtsbilder eines Szenarios samt Dateien (beim Löschen des Szenarios).
+    Ohne Szenario und Organisation würden sie sonst als allgemeine Startbilder an alle
+    Teams ausgeliefert. Die Dateien werden erst nach dem Commit entfernt.
+    """
+    images = list(HomeScreenImage.objects.filter(scenario_id=scenario_id))
+    if not images:
+        return
+    HomeScreenImage.objects.filter(pk__in=[image.pk for image in images]).delete()
+    transaction.on_commit(lambda: delete_unused_files(images))
+
+
+# --------------------------------------------------
+# 3) ENTPRELLTE HINTERGRUND-AUSFÜHRUNG
+# --------------------------------------------------
+def _run_refresh(scenario_id, timer):
+    """Ausführung im Timer-Thread"""
+    with _pending_lock:
+        if _pending.get(scenario_id) is timer:
+            del _pending[scenario_id]
+    try:
+        refresh_scenario_overview(scenario_id)
+    except Exception:
+        logger.exception("Übersicht für Szenario %s konnte nicht erzeugt werden", scenario_id)
+    finally:
+        # Der Thread hat eigene Datenbankverbindungen, die hier wieder geschlossen werden
+        connections.close_all()
+
+
+def _start_timer(scenario_id, delay):
+    """Startet die Wartezeit für ein Szenario (neu) und verwirft eine laufende"""
+    with _pending_lock:
+        previous = _pending.pop(scenario_id, None)
+        if previous is not None:
+            previous.cancel()
+        timer = threading.Timer(delay, lambda: _run_refresh(scenario_id, timer))
+        timer.daemon = True
+        _pending[scenario_id] = timer
+        timer.start()
+
+
+def schedule_overview_refresh(scenario_id, delay=None):
+    """
+    Plant die Neuerzeugung der Übersicht eines Szenarios im Hintergrund. Die Wartezeit
+    beginnt erst nach dem Abschluss der laufenden Transaktion, damit der Thread die
+    gespeicherten Zuweisungen sieht.
+    """
+    if scenario_id is None:
+        return
+    if delay is None:
+        delay = settings.OVERVIEW_REFRESH_DELAY
+    transaction.on_commit(lambda: _start_timer(scenario_id, delay))
+
+
+def pending_overview_refreshes():
+    """IDs der Szenarien, deren Neuerzeugung noch aussteht"""
+    with _pending_lock:
+        return sorted(_pending)
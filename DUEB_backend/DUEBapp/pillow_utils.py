@@ -3,244 +3,460 @@
 # Diese Datei enthält Hilfsfunktionen zur Erzeugung von Bilddateien mittels der Pillow-Bibliothek.
 # Die Hauptfunktion generiert eine tabellarische Übersicht aller Patientenprofile eines Szenarios,
 # die farblich nach Sichtungskategorien unterschieden werden.
+#
+# Die Übersicht wird in Seiten fester Höhe aufgeteilt, sodass der Speicherbedarf auch bei
+# mehreren hundert Patienten begrenzt bleibt. Die Dateinamen enthalten einen Hash der
+# Einträge: Ist die Übersicht für unveränderte Daten bereits vorhanden, wird sie nicht
+# erneut gezeichnet.
+#
+# Neben PNG kann die Übersicht als SVG (Vektorgrafik) ausgegeben werden. Die SVG-Dateien
+# verwenden dieselbe Sortierung, Farben und denselben Textumbruch, sind deutlich kleiner
+# und bleiben beim Zoomen auf Tablets scharf.
 
 import os
-import random
+import json
+import tempfile
 import datetime
+from xml.sax.saxutils import escape, quoteattr
+from functools import lru_cache
 from django.conf import settings
-from django.utils import timezone
 from PIL import Image, ImageDraw, ImageFont
+from .report_store import report_key
 
-def generate_overview_image(entries, scenario_name="Krankenhausübung", date_str="22.04.2024"):
-    """
-    Erzeugt ein Übersichtsbild mit einer Tabelle aller Patientenprofile eines Szenarios.
-    
-    Parameters:
-        entries (list): Liste von Dictionaries mit Patientendaten
-        scenario_name (str): Name des Übungsszenarios
-        date_str (str/date): Datum der Übung als String oder Datetime-Objekt
-    
-    Returns:
-        str: Relativer Pfad zur erzeugten Bilddatei
-    """
-    
-    # ---------------------------------------------------
-    # 1) INITIALISIERUNG DER SCHRIFTART
-    # ---------------------------------------------------
+# Pfad der TrueType-Schriftart (Fallback: Pillow-Standardschrift)
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+FONT_SIZE = 16
+
+# Tabellenstruktur
+COLUMNS = ["Button-Nr.", "Profil-Nr", "Kategorie", "Diagnose", "Blickdiagnose", "PCZ"]
+COL_WIDTHS = [120, 100, 200, 300, 300, 200]
+ROW_HEIGHT = 40
+HEADER_HEIGHT = 60
+FOOTER_HEIGHT = 50
+LINE_HEIGHT = 15
+
+# Anzahl Textzeilen, die innerhalb einer Tabellenzeile Platz finden
+CELL_MAX_LINES = (ROW_HEIGHT - 5 - LINE_HEIGHT) // LINE_HEIGHT + 1
+
+# Größe der Caches für gemessene Textbreiten und umbrochene Zelleninhalte
+TEXT_WIDTH_CACHE_SIZE = 8192
+WRAP_CACHE_SIZE = 4096
+
+# Maximale Anzahl Datenzeilen pro Bild (Seite)
+ROWS_PER_PAGE = 40
+
+# Ablageordner unterhalb von MEDIA_ROOT
+OVERVIEW_DIR = "homescreen"
+
+# Version des Layouts; bei Änderungen am Zeichnen erhöhen, damit alte Bilder nicht wiederverwendet werden
+OVERVIEW_LAYOUT_VERSION = 4
+
+# Unterstützte Ausgabeformate
+OVERVIEW_FORMATS = ("png", "svg")
+
+# Schriftarten für die SVG-Ausgabe (DejaVu Sans entspricht der PNG-Ausgabe)
+SVG_FONT_FAMILY = "DejaVu Sans, Verdana, Arial, sans-serif"
+
+# Prioritäten-Mapping für die Sichtungskategorien
+# "SK 1/SK 4" und "SK 4" haben höchste Priorität (0)
+CATEGORY_PRIORITY = {
+    "SK 1/SK 4": 0,
+    "SK 4": 0,
+    "SK 1": 1,
+    "SK 1 (akute vitale Bedrohung)": 1,
+    "SK 2": 2,
+    "SK 2 (schwer verletzt)": 2,
+    "SK 3": 3,
+    "SK 3 (leicht verletzt)": 3
+}
+
+
+# ---------------------------------------------------
+# 1) SCHRIFTART (EINMAL PRO PROZESS)
+# ---------------------------------------------------
+@lru_cache(maxsize=None)
+def get_font(size=FONT_SIZE):
+    """Lädt die TrueType-Schriftart einmalig pro Prozess und Größe"""
     try:
         # Versuche, eine TrueType-Schriftart zu laden
-        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 16)
-    except:
+        return ImageFont.truetype(FONT_PATH, size)
+    except OSError:
         # Fallback auf die Standardschriftart, wenn die TrueType-Schrift nicht verfügbar ist
-        font = ImageFont.load_default()
+        return ImageFont.load_default()
+
+
+# ---------------------------------------------------
+# 2) SORTIERUNG UND FARBEN
+# ---------------------------------------------------
+def overview_sort_key(entry):
+    """
+    Hilfsfunktion zur Sortierung der Einträge nach Sichtungskategorie und Button-Nummer.
+    - Sortiert primär nach Kategorie (SK 1/SK 4 > SK 1 > SK 2 > SK 3)
+    - Sortiert sekundär nach Button-Nummer, mit Sonderbehandlung für Buttons mit 'K' am Ende
+    """
+    cat = entry.get("category", "").strip()
+    btn = entry.get("button_number", "")
+
+    # Extrahiere Nummer aus button_number, mit Sonderbehandlung für Buttons mit 'K' am Ende
+    try:
+        clean_btn = ''.join(c for c in btn if c.isdigit() or (c == 'K' and btn.endswith('K')))
+        if clean_btn.endswith('K'):
+            # Buttons mit 'K' am Ende bekommen 0.5 hinzuaddiert für Sortierzwecke
+            base_num = int(clean_btn[:-1])
+            btn_num = base_num + 0.5
+        else:
+            btn_num = int(clean_btn)
+    except ValueError:
+        # Fallback für ungültige Button-Nummern
+        btn_num = 999
+
+    # Sortierkriterium: Tuple aus (Kategorie-Priorität, Button-Nummer)
+    return (CATEGORY_PRIORITY.get(cat, 5), btn_num)
+
+
+def category_color(cat):
+    """
+    Hintergrundfarbe basierend auf Sichtungskategorie:
+    - SK 1/SK 4 und SK 4: Dunkelrot
+    - SK 1: Helleres Rot
+    - SK 2: Gelb
+    - SK 3: Grün
+    - Andere: Grau
+    """
+    if cat in ["SK 1/SK 4", "SK 4"]:
+        return (180, 0, 0)  # Dunkelrot
+    if cat.startswith("SK 1"):
+        return (255, 150, 150)  # Helleres Rot
+    if "SK 2" in cat:
+        return (255, 255, 150)  # Kräftiges Gelb
+    if "SK 3" in cat:
+        return (150, 255, 150)  # Kräftiges Grün
+    return (230, 230, 230)  # Standard-Grau
+
+
+def format_overview_date(date_str):
+    """Formatierung des Datums, abhängig vom Eingabetyp"""
+    if isinstance(date_str, datetime.date):
+        return date_str.strftime('%d.%m.%Y')
+    return date_str
+
 
-    # ---------------------------------------------------
-    # 2) BILDABMESSUNGEN UND TABELLENSTRUKTUR
-    # ---------------------------------------------------
-    # Definition der Spalten und ihrer Breiten
-    columns = ["Button-Nr.", "Profil-Nr", "Kategorie", "Diagnose", "Blickdiagnose", "PCZ"]
-    col_widths = [120, 100, 200, 300, 300, 200]
-    row_height = 40  
-    header_height = 60
+# ---------------------------------------------------
+# 3) TEXTLAYOUT (GEMESSENE BREITEN WERDEN GECACHT)
+# ---------------------------------------------------
+@lru_cache(maxsize=TEXT_WIDTH_CACHE_SIZE)
+def text_width(text, size=FONT_SIZE):
+    """Breite eines Textstücks in Pixeln (Ergebnis wird pro Text und Schriftgröße gecacht)"""
+    return get_font(size).getlength(text, mode="L")
+
+
+def wrap_words(text, available_width, measure):
+    """
+    Verteilt die Wörter eines Textes auf Zeilen, die in available_width passen.
+    measure(text) liefert die Breite eines Wortes inklusive folgendem Leerzeichen.
+    """
+    words = text.split()
+    lines = []
+    current_line = []
+    current_width = 0
+
+    # Wörter auf Zeilen verteilen basierend auf verfügbarer Breite
+    for word in words:
+        word_width = measure(word + " ")
+        if current_width + word_width <= available_width:
+            current_line.append(word)
+            current_width += word_width
+        else:
+            if current_line:
+                lines.append(" ".join(current_line))
+            current_line = [word]
+            current_width = word_width
+
+    # Letzte Zeile hinzufügen, falls vorhanden
+    if current_line:
+        lines.append(" ".join(current_line))
+    return lines
+
+
+@lru_cache(maxsize=WRAP_CACHE_SIZE)
+def wrap_cell(text, available_width, size=FONT_SIZE):
+    """
+    Umbruch eines Zelleninhalts für eine Spaltenbreite. Diagnosen und Kategorien
+    wiederholen sich über viele Zeilen, daher wird das Ergebnis je (Text, Breite) gecacht.
+    Es werden nur die Zeilen zurückgegeben, die in die Zeilenhöhe passen.
+    """
+    lines = wrap_words(text, available_width, lambda word: text_width(word, size))
+    return tuple(lines[:CELL_MAX_LINES])
+
+
+def layout_rows(entries, wrap=wrap_cell):
+    """
+    Messdurchlauf vor dem Zeichnen: Bestimmt für jeden Eintrag die Kategorie und die
+    umbrochenen Zeilen jeder Zelle.
+
+    Returns:
+        list: [(Kategorie, [Zeilen je Spalte]), ...]
+    """
+    rows = []
+    for entry in entries:
+        cat = entry.get("category", "").strip()
+
+        # Daten für die Zellen extrahieren
+        row_data = [
+            entry.get("button_number", ""),
+            entry.get("profile_number", ""),
+            cat,
+            entry.get("diagnosis", ""),
+            entry.get("visual", ""),
+            entry.get("pcz", ""),
+        ]
+        cells = [wrap(str(cell_text), COL_WIDTHS[i] - 10) for i, cell_text in enumerate(row_data)]
+        rows.append((cat, cells))
+    return rows
+
+
+# ---------------------------------------------------
+# 4) ZEICHNEN EINER SEITE
+# ---------------------------------------------------
+def render_overview_page(entries, scenario_name, formatted_date, page, page_count, wrap=wrap_cell):
+    """
+    Zeichnet eine Seite der Übersicht (höchstens ROWS_PER_PAGE Einträge) und gibt
+    das Pillow-Bild zurück. Die Zelleninhalte werden vorab mit layout_rows umbrochen.
+    """
+    font = get_font()
+    rows = layout_rows(entries, wrap)
 
-    # Berechnung der Gesamtbildgröße
-    img_width = sum(col_widths) + 80  # Zusätzlicher Platz für Ränder
-    img_height = header_height + row_height * (len(entries) + 1) + 50  # +1 für Überschriftenzeile, +50 für Fußzeile
+    # Berechnung der Bildgröße (Höhe richtet sich nach den Zeilen dieser Seite)
+    img_width = sum(COL_WIDTHS) + 80  # Zusätzlicher Platz für Ränder
+    img_height = HEADER_HEIGHT + ROW_HEIGHT * (len(entries) + 1) + FOOTER_HEIGHT  # +1 für Überschriftenzeile
 
     # Erzeugen eines neuen weißen Bildes mit den berechneten Dimensionen
     img = Image.new("RGB", (img_width, img_height), color=(255, 255, 255))
     draw = ImageDraw.Draw(img)
 
-    # ---------------------------------------------------
-    # 3) SORTIERUNG DER EINTRÄGE NACH KATEGORIE UND BUTTON-NUMMER
-    # ---------------------------------------------------
-    def sort_key(entry):
-        """
-        Hilfsfunktion zur Sortierung der Einträge nach Sichtungskategorie und Button-Nummer.
-        - Sortiert primär nach Kategorie (SK 1/SK 4 > SK 1 > SK 2 > SK 3)
-        - Sortiert sekundär nach Button-Nummer, mit Sonderbehandlung für Buttons mit 'K' am Ende
-        """
-        cat = entry.get("category", "").strip()
-        btn = entry.get("button_number", "")
-       
-        # Prioritäten-Mapping für die Sichtungskategorien
-        # "SK 1/SK 4" und "SK 4" haben höchste Priorität (0)
-        cat_priority = {
-            "SK 1/SK 4": 0,
-            "SK 4": 0,
-            "SK 1": 1,
-            "SK 1 (akute vitale Bedrohung)": 1,
-            "SK 2": 2,
-            "SK 2 (schwer verletzt)": 2,
-            "SK 3": 3,
-            "SK 3 (leicht verletzt)": 3
-        }
-       
-        # Extrahiere Nummer aus button_number, mit Sonderbehandlung für Buttons mit 'K' am Ende
-        try:
-            clean_btn = ''.join(c for c in btn if c.isdigit() or (c == 'K' and btn.endswith('K')))
-            if clean_btn.endswith('K'):
-                # Buttons mit 'K' am Ende bekommen 0.5 hinzuaddiert für Sortierzwecke
-                base_num = int(clean_btn[:-1])
-                btn_num = base_num + 0.5
-            else:
-                btn_num = int(clean_btn)
-        except:
-            # Fallback für ungültige Button-Nummern
-            btn_num = 999
-           
-        # Sortierkriterium: Tuple aus (Kategorie-Priorität, Button-Nummer)
-        return (cat_priority.get(cat, 5), btn_num)
-       
-    # Sortiere die Einträge nach dem definierten Schlüssel
-    entries = sorted(entries, key=sort_key)
-
-    # ---------------------------------------------------
-    # 4) ZEICHNEN DER KOPFZEILE UND SPALTENÜBERSCHRIFTEN
-    # ---------------------------------------------------
     # Titel und Datum in der Kopfzeile
-    draw.text((20, 10), scenario_name, fill=(0,0,0), font=font)
-    
-    # Formatierung des Datums, abhängig vom Eingabetyp
-    if isinstance(date_str, datetime.date):
-        formatted_date = date_str.strftime('%d.%m.%Y')
-    else:
-        formatted_date = date_str
-    
+    title = scenario_name if page_count == 1 else f"{scenario_name} (Seite {page} von {page_count})"
+    draw.text((20, 10), title, fill=(0, 0, 0), font=font)
+
     # Datum rechts ausrichten
     date_text = f"Datum der Übung: {formatted_date}"
     date_width = draw.textlength(date_text, font=font)
-    draw.text((img_width - date_width - 20, 10), date_text, fill=(0,0,0), font=font)
+    draw.text((img_width - date_width - 20, 10), date_text, fill=(0, 0, 0), font=font)
 
     # Spaltenüberschriften
     x_offset = 20
-    y_offset = header_height
-    for i, col_name in enumerate(columns):
-        draw.text((x_offset, y_offset), col_name, fill=(0,0,0), font=font)
-        x_offset += col_widths[i]
+    y_offset = HEADER_HEIGHT
+    for i, col_name in enumerate(COLUMNS):
+        draw.text((x_offset, y_offset), col_name, fill=(0, 0, 0), font=font)
+        x_offset += COL_WIDTHS[i]
 
     # Trennlinie unter den Spaltenüberschriften
-    line_y = y_offset + row_height - 5
-    draw.line((20, line_y, img_width-20, line_y), fill=(0,0,0), width=2)
-
-    # ---------------------------------------------------
-    # 5) ZEICHNEN DER DATENZEILEN MIT FARBKODIERUNG
-    # ---------------------------------------------------
-    y_offset += row_height
-    for entry in entries:
-        cat = entry.get("category", "").strip()
-       
-        # Hintergrundfarbe basierend auf Sichtungskategorie:
-        # - SK 1/SK 4 und SK 4: Dunkelrot
-        # - SK 1: Helleres Rot
-        # - SK 2: Gelb
-        # - SK 3: Grün
-        # - Andere: Grau
-        if cat in ["SK 1/SK 4", "SK 4"]:
-            bg_color = (180, 0, 0)  # Dunkelrot
-        elif cat.startswith("SK 1"):
-            bg_color = (255, 150, 150)  # Helleres Rot
-        elif "SK 2" in cat:
-            bg_color = (255, 255, 150)  # Kräftiges Gelb
-        elif "SK 3" in cat:
-            bg_color = (150, 255, 150)  # Kräftiges Grün
-        else:
-            bg_color = (230, 230, 230)  # Standard-Grau
+    line_y = y_offset + ROW_HEIGHT - 5
+    draw.line((20, line_y, img_width - 20, line_y), fill=(0, 0, 0), width=2)
 
+    # Datenzeilen mit Farbkodierung
+    y_offset += ROW_HEIGHT
+    for cat, cells in rows:
         # Zeichne Hintergrundrechteck für die Zeile
         draw.rectangle(
-            (20, y_offset, img_width-20, y_offset + row_height),
-            fill=bg_color,
+            (20, y_offset, img_width - 20, y_offset + ROW_HEIGHT),
+            fill=category_color(cat),
             outline=(0, 0, 0),
             width=1
         )
 
-        # Daten für die Zellen extrahieren
-        row_data = [
-            entry.get("button_number", ""),
-            entry.get("profile_number", ""),
-            cat,
-            entry.get("diagnosis", ""),
-            entry.get("visual", ""),
-            entry.get("pcz", ""),
-        ]
-
-        # Zeichnen der Zelleninhalte mit Textumbruch
+        # Zeichnen der (bereits umbrochenen) Zelleninhalte
         x_off = 20
-        for i, cell_text in enumerate(row_data):
-            text = str(cell_text)
-           
-            # Berechne verfügbare Breite für den Text
-            available_width = col_widths[i] - 10
-           
-            # Textumbruch implementieren
-            words = text.split()
-            lines = []
-            current_line = []
-            current_width = 0
-           
-            # Wörter auf Zeilen verteilen basierend auf verfügbarer Breite
-            for word in words:
-                word_width = draw.textlength(word + " ", font=font)
-                if current_width + word_width <= available_width:
-                    current_line.append(word)
-                    current_width += word_width
-                else:
-                    if current_line:
-                        lines.append(" ".join(current_line))
-                    current_line = [word]
-                    current_width = word_width
-           
-            # Letzte Zeile hinzufügen, falls vorhanden
-            if current_line:
-                lines.append(" ".join(current_line))
-
-            # Zeichnen jeder Textzeile innerhalb der Zelle
+        for i, lines in enumerate(cells):
             for idx, line in enumerate(lines):
-                y_pos = y_offset + 5 + (idx * 15)
-                # Sicherstellen, dass der Text in der Zeile bleibt
-                if y_pos + 15 <= y_offset + row_height:
-                    draw.text((x_off+5, y_pos), line, fill=(0,0,0), font=font)
+                y_pos = y_offset + 5 + (idx * LINE_HEIGHT)
+                draw.text((x_off + 5, y_pos), line, fill=(0, 0, 0), font=font)
 
             # Vertikale Trennlinien zwischen Spalten
-            if i < len(col_widths)-1:
-                x_line = x_off + col_widths[i]
+            if i < len(COL_WIDTHS) - 1:
+                x_line = x_off + COL_WIDTHS[i]
                 draw.line(
-                    (x_line, y_offset, x_line, y_offset + row_height),
-                    fill=(0,0,0),
+                    (x_line, y_offset, x_line, y_offset + ROW_HEIGHT),
+                    fill=(0, 0, 0),
                     width=1
                 )
-               
-            x_off += col_widths[i]
+
+            x_off += COL_WIDTHS[i]
 
         # Zur nächsten Zeile gehen
-        y_offset += row_height
-
-    # ---------------------------------------------------
-    # 6) ZEITSTEMPEL UND SPEICHERUNG
-    # ---------------------------------------------------
-    # Aktuellen Zeitstempel hinzufügen
-    draw.text(
-        (20, img_height - 30),
-        f"Erstellt am {timezone.now():%d.%m.%Y %H:%M}",
-        fill=(128,128,128),
-        font=font
+        y_offset += ROW_HEIGHT
+
+    # Kein Erstellungszeitpunkt: die Seite wird über den Hash ihrer Daten unbegrenzt
+    # wiederverwendet, ein Zeitstempel zeigte dann den Stand des ersten Zeichnens
+    return img
+
+
+# ---------------------------------------------------
+# 5) VEKTORAUSGABE (SVG)
+# ---------------------------------------------------
+def _svg_color(rgb):
+    """Wandelt ein RGB-Tupel in eine SVG-Farbangabe um"""
+    return "#%02x%02x%02x" % rgb
+
+
+def _svg_text(x, y, text, fill=(0, 0, 0)):
+    """
+    Text an derselben Position wie bei Pillow (obere linke Ecke). SVG positioniert Text an
+    der Grundlinie, daher wird die Oberlänge der Schrift addiert.
+    """
+    ascent = get_font().getmetrics()[0]
+    color = "" if fill == (0, 0, 0) else f' fill="{_svg_color(fill)}"'
+    return f'<text x="{x:g}" y="{y + ascent:g}"{color}>{escape(str(text))}</text>\n'
+
+
+def write_overview_svg(stream, entries, scenario_name, formatted_date, page, page_count):
+    """
+    Schreibt eine Seite der Übersicht als SVG in einen Textstream. Aufbau und Maße
+    entsprechen render_overview_page; die Zeilen werden einzeln geschrieben.
+    """
+    rows = layout_rows(entries)
+    img_width = sum(COL_WIDTHS) + 80
+    img_height = HEADER_HEIGHT + ROW_HEIGHT * (len(entries) + 1) + FOOTER_HEIGHT
+    table_width = img_width - 40
+
+    stream.write(
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{img_width}" height="{img_height}" '
+        f'viewBox="0 0 {img_width} {img_height}" font-family={quoteattr(SVG_FONT_FAMILY)} '
+        f'font-size="{FONT_SIZE}">\n'
     )
+    stream.write(f'<rect width="{img_width}" height="{img_height}" fill="#ffffff"/>\n')
+
+    # Titel und Datum in der Kopfzeile
+    title = scenario_name if page_count == 1 else f"{scenario_name} (Seite {page} von {page_count})"
+    stream.write(_svg_text(20, 10, title))
+    date_text = f"Datum der Übung: {formatted_date}"
+    stream.write(_svg_text(img_width - text_width(date_text) - 20, 10, date_text))
+
+    # Spaltenüberschriften und Trennlinie
+    x_offset = 20
+    for i, col_name in enumerate(COLUMNS):
+        stream.write(_svg_text(x_offset, HEADER_HEIGHT, col_name))
+        x_offset += COL_WIDTHS[i]
+    line_y = HEADER_HEIGHT + ROW_HEIGHT - 5
+    stream.write(f'<path d="M20 {line_y}H{img_width - 20}" stroke="#000000" stroke-width="2"/>\n')
+
+    # Positionen der vertikalen Trennlinien (für alle Zeilen gleich)
+    separators = []
+    x_line = 20
+    for width in COL_WIDTHS[:-1]:
+        x_line += width
+        separators.append(x_line)
+
+    # Datenzeilen mit Farbkodierung
+    y_offset = HEADER_HEIGHT + ROW_HEIGHT
+    for cat, cells in rows:
+        stream.write(
+            f'<rect x="20" y="{y_offset}" width="{table_width}" height="{ROW_HEIGHT}" '
+            f'fill="{_svg_color(category_color(cat))}" stroke="#000000"/>\n'
+        )
+        lines_path = "".join(f"M{x} {y_offset}v{ROW_HEIGHT}" for x in separators)
+        stream.write(f'<path d="{lines_path}" stroke="#000000"/>\n')
+
+        x_off = 20
+        for i, lines in enumerate(cells):
+            for idx, line in enumerate(lines):
+                stream.write(_svg_text(x_off + 5, y_offset + 5 + idx * LINE_HEIGHT, line))
+            x_off += COL_WIDTHS[i]
+        y_offset += ROW_HEIGHT
+
+    # Kein Erstellungszeitpunkt (Wiederverwendung über den Daten-Hash, siehe render_overview_page)
+    stream.write('</svg>\n')
+
+
+# ---------------------------------------------------
+# 6) ÜBERSICHT ERZEUGEN (MIT WIEDERVERWENDUNG)
+# ---------------------------------------------------
+def overview_page_paths(entries, scenario_name, date_str, output_format="png"):
+    """
+    Berechnet die relativen Pfade aller Seiten der Übersicht. Der Dateiname enthält
+    einen Hash über Einträge, Szenario, Datum und Layout, sodass unveränderte Daten
+    auf dieselben Dateien abgebildet werden.
+    """
+    formatted_date = format_overview_date(date_str)
+    key = report_key(
+        'overview',
+        output_format,
+        OVERVIEW_LAYOUT_VERSION,
+        ROWS_PER_PAGE,
+        scenario_name,
+        formatted_date,
+        sorted(json.dumps(entry, sort_keys=True, default=str) for entry in entries),
+    )[:16]
 
     # Formatierung des Datums für den Dateinamen
-    if isinstance(date_str, datetime.date):
-        date_filename = date_str.strftime('%d_%m_%Y')
-    else:
-        date_filename = date_str.replace('.', '_')
-
-    # Generiere eindeutigen Dateinamen mit Zufallsnummer
-    random_num = random.randint(1000, 9999)
-    filename = f"uebersicht_{scenario_name}_{date_filename}_{random_num}.png".replace(" ", "_")
-    save_path = os.path.join(settings.MEDIA_ROOT, "homescreen", filename)
-    
-    # Speichern des Bildes als PNG
-    img.save(save_path, format="PNG")
-
-    # Relativen Pfad zurückgeben für die Datenbankverknüpfung
-    relative_path = os.path.join("homescreen", filename)
-    return relative_path
\ No newline at end of file
+    date_filename = str(formatted_date).replace('.', '_')
+    page_count = max(1, -(-len(entries) // ROWS_PER_PAGE))
+    base = f"uebersicht_{scenario_name}_{date_filename}_{key}".replace(" ", "_").replace("/", "-")
+    if page_count == 1:
+        return [os.path.join(OVERVIEW_DIR, f"{base}.{output_format}")]
+    return [
+        os.path.join(OVERVIEW_DIR, f"{base}_seite{page:02d}.{output_format}")
+        for page in range(1, page_count + 1)
+    ]
+
+
+def generate_overview_image(
+    entries, scenario_name="Krankenhausübung", date_str="22.04.2024", media_root=None, output_format="png"
+):
+    """
+    Erzeugt eine Übersicht mit einer Tabelle aller Patientenprofile eines Szenarios.
+
+    Die Einträge werden auf Seiten mit höchstens ROWS_PER_PAGE Zeilen verteilt; pro Seite
+    entsteht eine eigene Datei (PNG oder SVG). Existieren alle Seiten für dieselben Daten
+    bereits, werden sie ohne erneutes Zeichnen zurückgegeben.
+
+    Parameters:
+        entries (list): Liste von Dictionaries mit Patientendaten
+        scenario_name (str): Name des Übungsszenarios
+        date_str (str/date): Datum der Übung als String oder Datetime-Objekt
+        media_root (str): Basisordner der Dateien (Standard: settings.MEDIA_ROOT)
+        output_format (str): "png" (Rastergrafik) oder "svg" (Vektorgrafik)
+
+    Returns:
+        list: Relative Pfade der erzeugten Bilddateien (eine pro Seite)
+    """
+    if output_format not in OVERVIEW_FORMATS:
+        raise ValueError(f"Unbekanntes Ausgabeformat: {output_format}")
+    media_root = media_root or settings.MEDIA_ROOT
+    relative_paths = overview_page_paths(entries, scenario_name, date_str, output_format)
+    absolute_paths = [os.path.join(media_root, path) for path in relative_paths]
+    if all(os.path.exists(path) for path in absolute_paths):
+        return relative_paths
+
+    os.makedirs(os.path.join(media_root, OVERVIEW_DIR), exist_ok=True)
+
+    # Sortiere die Einträge nach Kategorie und Button-Nummer
+    entries = sorted(entries, key=overview_sort_key)
+    formatted_date = format_overview_date(date_str)
+    page_count = len(relative_paths)
+
+    # Jede Seite wird einzeln gezeichnet, gespeichert und wieder freigegeben. Die Seite wird
+    # in eine eindeutige temporäre Datei im Zielordner geschrieben und dann atomar umbenannt:
+    # Mehrere Worker-Prozesse können dieselbe Seite gleichzeitig zeichnen (siehe overview.py).
+    for page, save_path in enumerate(absolute_paths, start=1):
+        chunk = entries[(page - 1) * ROWS_PER_PAGE:page * ROWS_PER_PAGE]
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(save_path), suffix=".tmp")
+        try:
+            if output_format == "svg":
+                with os.fdopen(fd, "w", encoding="utf-8") as stream:
+                    write_overview_svg(stream, chunk, scenario_name, formatted_date, page, page_count)
+            else:
+                img = render_overview_page(chunk, scenario_name, formatted_date, page, page_count)
+                with os.fdopen(fd, "wb") as stream:
+                    img.save(stream, format="PNG")
+                img.close()
+            # mkstemp legt die Datei nur für den Eigentümer lesbar an
+            os.chmod(tmp_path, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+            os.replace(tmp_path, save_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    # Relative Pfade zurückgeben für die Datenbankverknüpfung
+    return relative_paths
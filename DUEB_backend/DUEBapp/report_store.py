@@ -0,0 +1,303 @@
+# report_store.py - Inhaltsadressierter Speicher für erzeugte Berichte
+#
+# Diese Datei legt erzeugte Berichtsdateien (Formular-Auswertungen, Patientenbegleitbögen)
+# unter einem Schlüssel ab, der aus den Eingangsdaten des Berichts berechnet wird. Wird
+# derselbe Bericht mit unveränderten Daten erneut angefordert, wird die gespeicherte Datei
+# wiederverwendet statt neu erzeugt. Über /api/reports/<key>/ können die Dateien direkt
+# heruntergeladen werden (mit Unterstützung für HTTP-Range und Caching-Header), sodass
+# große Dateien nicht mehr ausschließlich als E-Mail-Anhang zugestellt werden müssen.
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from .metrics import EXCEL_RENDER
+
+# Länge der Berichtsschlüssel (hexadezimaler SHA-256-Präfix)
+REPORT_KEY_LENGTH = 40
+REPORT_KEY_PATTERN = re.compile(rf"^[0-9a-f]{{{REPORT_KEY_LENGTH}}}$")
+
+# Salt für die signierten Download-Links (z.B. in E-Mails)
+REPORT_LINK_SALT = "dueb.reports.download"
+
+# Blockgröße beim Ausliefern von Teilbereichen (HTTP-Range)
+RANGE_BLOCK_SIZE = 64 * 1024
+
+# Berichte sind über ihren Schlüssel unveränderlich und dürfen privat gecacht werden
+REPORT_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+StoredReport = namedtuple('StoredReport', ['key', 'path', 'file_name', 'content_type', 'size', 'created'])
+
+
+# --------------------------------------------------
+# 1) SCHLÜSSEL
+# --------------------------------------------------
+def report_key(kind, *parts):
+    """
+    Berechnet den Schlüssel eines Berichts aus seiner Art und allen Eingangsdaten.
+    Die Teile werden als JSON (mit sortierten Schlüsseln) serialisiert; Werte wie
+    Datumsangaben werden über str() abgebildet.
+    """
+    payload = json.dumps([kind, parts], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:REPORT_KEY_LENGTH]
+
+
+def model_fingerprint(instance):
+    """Liefert die Werte aller Datenbankfelder einer Modellinstanz als Liste"""
+    return [getattr(instance, field.attname) for field in instance._meta.concrete_fields]
+
+
+def is_valid_key(key):
+    """Prüft, ob key ein syntaktisch gültiger Berichtsschlüssel ist"""
+    return bool(key) and bool(REPORT_KEY_PATTERN.match(key))
+
+
+# --------------------------------------------------
+# 2) ABLAGE
+# --------------------------------------------------
+def _report_paths(key):
+    """Pfade der Berichtsdatei und ihrer Metadaten (Unterverzeichnis = erste zwei Zeichen)"""
+    directory = os.path.join(settings.REPORT_STORE_ROOT, key[:2])
+    return os.path.join(directory, key), os.path.join(directory, f"{key}.json")
+
+
+def _write_atomic(path, data):
+    """Schreibt data in eine temporäre Datei und benennt sie anschließend atomar um"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def get_report(key):
+    """
+    Gibt den gespeicherten Bericht zu key als StoredReport zurück,
+    oder None, falls der Schlüssel ungültig ist oder kein Bericht existiert.
+    """
+    if not is_valid_key(key):
+        return None
+    path, meta_path = _report_paths(key)
+    try:
+        with open(meta_path, encoding='utf-8') as fh:
+            meta = json.load(fh)
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    return StoredReport(key, path, meta['file_name'], meta['content_type'], stat.st_size, stat.st_mtime)
+
+
+def get_or_create_report(key, file_name, content_type, builder, kind='report'):
+    """
+    Liefert den Bericht zu key aus dem Speicher oder erzeugt ihn einmalig.
+
+    builder wird nur aufgerufen, wenn noch keine Datei unter key existiert, und muss
+    den Dateiinhalt als bytes zurückgeben. Die Dauer wird unter kind in der Kennzahl
+    dueb_excel_render_seconds erfasst. Parallele Aufrufe mit demselben Schlüssel
+    erzeugen denselben Inhalt; die atomare Umbenennung verhindert halbe Dateien.
+
+    Returns:
+        tuple: (StoredReport, Dateiinhalt als bytes)
+    """
+    stored = get_report(key)
+    if stored is not None:
+        with open(stored.path, 'rb') as fh:
+            return stored, fh.read()
+
+    with EXCEL_RENDER.time(kind):
+        content = builder()
+    path, meta_path = _report_paths(key)
+    meta = {'file_name': file_name, 'content_type': content_type}
+    _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+    _write_atomic(path, content)
+    return StoredReport(key, path, file_name, content_type, len(content), time.time()), content
+
+
+def prune_reports(max_age_seconds):
+    """
+    Löscht alle Berichte, die älter als max_age_seconds sind.
+    Gibt die Anzahl der gelöschten Berichte zurück.
+    """
+    root = settings.REPORT_STORE_ROOT
+    if not os.path.isdir(root):
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for directory, _dirs, files in os.walk(root):
+        for name in files:
+            if not is_valid_key(name):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                if os.stat(path).st_mtime >= cutoff:
+                    continue
+                os.remove(path)
+                removed += 1
+                os.remove(f"{path}.json")
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+# --------------------------------------------------
+# 3) DOWNLOAD-LINKS
+# --------------------------------------------------
+def report_download_path(key):
+    """Relativer Pfad des Download-Endpunkts (Zugriff mit Token-Authentifizierung)"""
+    return reverse('report-download', args=[key])
+
+
+def signed_download_url(key):
+    """
+    Absoluter, signierter Download-Link für E-Mails, oder None, wenn keine
+    REPORT_DOWNLOAD_BASE_URL konfiguriert ist. Der Link ist REPORT_LINK_MAX_AGE
+    Sekunden gültig und funktioniert ohne Anmeldung.
+    """
+    base_url = settings.REPORT_DOWNLOAD_BASE_URL
+    if not base_url:
+        return None
+    signature = signing.TimestampSigner(salt=REPORT_LINK_SALT).sign(key).split(':', 1)[1]
+    return f"{base_url.rstrip('/')}{report_download_path(key)}?sig={signature}"
+
+
+def email_delivery(stored):
+    """
+    Entscheidet, wie ein Bericht per E-Mail zugestellt wird.
+
+    Returns:
+        tuple: (Download-Link oder None, True wenn die Datei angehängt werden soll).
+        Ohne Link wird immer angehängt; mit Link nur bis REPORT_ATTACHMENT_MAX_BYTES.
+    """
+    url = signed_download_url(stored.key)
+    attach = url is None or stored.size <= settings.REPORT_ATTACHMENT_MAX_BYTES
+    return url, attach
+
+
+def check_signature(key, signature):
+    """Prüft die Signatur eines Download-Links für key (inkl. Ablaufzeit)"""
+    if not signature:
+        return False
+    try:
+        signing.TimestampSigner(salt=REPORT_LINK_SALT).unsign(
+            f"{key}:{signature}", max_age=settings.REPORT_LINK_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+# --------------------------------------------------
+# 4) AUSLIEFERUNG (HTTP-RANGE UND CACHING)
+# --------------------------------------------------
+def parse_range(header, size):
+    """
+    Wertet einen Range-Header der Form "bytes=start-end" aus.
+
+    Returns:
+        tuple | None | False: (start, end) inklusive, None wenn der Header fehlt oder
+        nicht unterstützt wird (mehrere Bereiche → vollständige Datei), False wenn
+        der Bereich nicht erfüllbar ist.
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix-Bereich: die letzten n Bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _iter_file_range(path, start, length):
+    """Liest length Bytes ab start blockweise aus der Datei"""
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = fh.read(min(RANGE_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def serve_report(request, stored):
+    """
+    Liefert einen gespeicherten Bericht aus.
+
+    - ETag ist der Berichtsschlüssel (Inhalt ändert sich nie) → If-None-Match ergibt 304
+    - Range-Anfragen mit einem Bereich werden mit 206 beantwortet, nicht erfüllbare mit 416
+    - If-Range mit abweichendem ETag/Datum liefert die vollständige Datei
+    """
+    etag = f'"{stored.key}"'
+    last_modified = http_date(stored.created)
+
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Cache-Control'] = REPORT_CACHE_CONTROL
+        return response
+
+    byte_range = parse_range(request.headers.get('Range'), stored.size)
+    if_range = request.headers.get('If-Range')
+    if byte_range is not None and if_range:
+        if_range_date = parse_http_date_safe(if_range)
+        if if_range != etag and (if_range_date is None or if_range_date < int(stored.created)):
+            byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{stored.size}"
+    elif byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _iter_file_range(stored.path, start, length),
+            status=206,
+            content_type=stored.content_type,
+        )
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f"bytes {start}-{end}/{stored.size}"
+        # Wie bei FileResponse: Umlaute im Beobachternamen über filename* (RFC 5987)
+        response['Content-Disposition'] = content_disposition_header(True, stored.file_name)
+    else:
+        response = FileResponse(
+            open(stored.path, 'rb'),
+            as_attachment=True,
+            filename=stored.file_name,
+            content_type=stored.content_type,
+        )
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Cache-Control'] = REPORT_CACHE_CONTROL
+    return response
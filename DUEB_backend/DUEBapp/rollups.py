@@ -0,0 +1,297 @@
+# rollups.py - Inkrementell gepflegte Kennzahlen der Formularantworten
+#
+# Die Antworten eines Formulars liegen als JSON-Felder (responses, picker_selections,
+# scale_values, timestamps) in FormResponse. Damit Statistiken nicht jedes Mal alle
+# Antworten laden und entpacken müssen, wird bei jedem Speichern bzw. Löschen einer
+# Antwort nur deren Beitrag (Differenz zum vorherigen Stand) in QuestionRollup verbucht.
+# Die Statistik eines Formulars ergibt sich dann aus O(Fragen) Zeilen.
+#
+# Der Beitrag hängt vom aktuellen Formular-Layout ab (Fragetypen, Optionen). Ändert sich
+# das Layout, würde eine danach gelöschte oder geänderte Antwort andere Schlüssel abziehen,
+# als sie beim Speichern verbucht hat. Die Kennzahlen des Formulars werden daher nach
+# jeder Layout-Änderung neu berechnet (siehe Abschnitt 4 und signals.py).
+
+import hashlib
+import json
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import FormResponse, QuestionRollup
+from .email_and_excel import get_form_layout
+
+# Cache-Schlüssel für den Layout-Stand, mit dem die Kennzahlen eines Formulars berechnet wurden
+ROLLUP_LAYOUT_CACHE_KEY = "dueb:rollup_layout:{form_id}"
+
+# Maximale Länge gespeicherter Werte (siehe QuestionRollup.value)
+ROLLUP_VALUE_MAX_LENGTH = 255
+
+# JSON-Felder einer FormResponse, die in die Kennzahlen eingehen
+ROLLUP_SOURCE_FIELDS = ('form_id', 'responses', 'picker_selections', 'scale_values', 'timestamps')
+
+
+# --------------------------------------------------
+# 1) BEITRAG EINER ANTWORT
+# --------------------------------------------------
+def _to_number(value):
+    """Wandelt einen Skalenwert in eine Zahl um (None, wenn nicht möglich)"""
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def response_contribution(form_id, responses, picker_selections, scale_values, timestamps):
+    """
+    Berechnet den Beitrag einer Antwort zu den Kennzahlen.
+
+    Gibt ein Dictionary {(form_id, question_id, kind, value): [Anzahl, Summe]} zurück.
+    Es werden nur Fragen berücksichtigt, die aktuell zum Formular gehören.
+    """
+    responses = responses or {}
+    picker_selections = picker_selections or {}
+    scale_values = scale_values or {}
+    timestamps = timestamps or {}
+
+    contribution = {(form_id, None, 'responses', ''): [1, 0.0]}
+
+    def add(question_id, kind, value='', count=1, total=0.0):
+        key = (form_id, question_id, kind, str(value)[:ROLLUP_VALUE_MAX_LENGTH])
+        entry = contribution.setdefault(key, [0, 0.0])
+        entry[0] += count
+        entry[1] += total
+
+    for question in get_form_layout(form_id):
+        question_id = question['id']
+        qid = str(question_id)
+        option_type = question['option_type']
+        answered = False
+
+        if option_type == 'checkbox':
+            for opt_id, _label in question['options']:
+                if responses.get(f"{qid}_{opt_id}"):
+                    add(question_id, 'option', opt_id)
+                    answered = True
+        elif option_type == 'dropdown':
+            choice = picker_selections.get(qid)
+            if choice:
+                add(question_id, 'choice', choice)
+                answered = True
+        elif option_type == 'scale':
+            number = _to_number(scale_values.get(qid))
+            if number is not None:
+                add(question_id, 'scale', f"{number:g}", total=number)
+                answered = True
+
+        if question['input_field_added'] and str(responses.get(qid) or "").strip():
+            add(question_id, 'text')
+            answered = True
+
+        entries = timestamps.get(qid) or []
+        if entries:
+            add(question_id, 'timestamps', count=len(entries))
+            answered = True
+
+        if answered:
+            add(question_id, 'answered')
+
+    return contribution
+
+
+def contribution_of(instance_or_values):
+    """Beitrag einer FormResponse-Instanz bzw. eines values()-Dictionaries"""
+    if isinstance(instance_or_values, dict):
+        get = instance_or_values.get
+    else:
+        get = lambda field: getattr(instance_or_values, field)  # noqa: E731
+    return response_contribution(*(get(field) for field in ROLLUP_SOURCE_FIELDS))
+
+
+# --------------------------------------------------
+# 2) VERBUCHEN DER DIFFERENZ
+# --------------------------------------------------
+def apply_rollup_delta(old, new):
+    """
+    Verbucht die Differenz zwischen altem und neuem Beitrag einer Antwort.
+
+    Bestehende Zeilen werden per UPDATE ... SET count = count + n angepasst, sodass
+    parallele Einsendungen sich nicht gegenseitig überschreiben. Fehlende Zeilen werden
+    nur bei positiver Differenz angelegt (beim Löschen eines Formulars werden keine
+    Zeilen für bereits entfernte Fragen erzeugt).
+    """
+    old = old or {}
+    new = new or {}
+    deltas = {}
+    for key in old.keys() | new.keys():
+        old_count, old_total = old.get(key, (0, 0.0))
+        new_count, new_total = new.get(key, (0, 0.0))
+        if new_count != old_count or new_total != old_total:
+            deltas[key] = (new_count - old_count, new_total - old_total)
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        for (form_id, question_id, kind, value), (count, total) in deltas.items():
+            lookup = {'form_id': form_id, 'question_id': question_id, 'kind': kind, 'value': value}
+            updated = QuestionRollup.objects.filter(**lookup).update(
+                count=F('count') + count,
+                total=F('total') + total,
+            )
+            if updated or count <= 0:
+                continue
+            try:
+                with transaction.atomic():
+                    QuestionRollup.objects.create(count=count, total=total, **lookup)
+            except IntegrityError:
+                # Zeile wurde zwischenzeitlich von einer parallelen Anfrage angelegt
+                QuestionRollup.objects.filter(**lookup).update(
+                    count=F('count') + count,
+                    total=F('total') + total,
+                )
+
+
+def rebuild_rollups(form_id=None):
+    """
+    Berechnet die Kennzahlen vollständig neu (z.B. nach der Einführung oder nach
+    Massenänderungen ohne Signale). Ohne form_id werden alle Formulare neu berechnet.
+
+    Returns:
+        int: Anzahl der verarbeiteten Antworten
+    """
+    queryset = FormResponse.objects.order_by().values(*ROLLUP_SOURCE_FIELDS)
+    rollups = QuestionRollup.objects.all()
+    if form_id is not None:
+        queryset = queryset.filter(form_id=form_id)
+        rollups = rollups.filter(form_id=form_id)
+
+    totals = defaultdict(lambda: [0, 0.0])
+    processed = 0
+    for values in queryset.iterator(chunk_size=500):
+        for key, (count, total) in contribution_of(values).items():
+            totals[key][0] += count
+            totals[key][1] += total
+        processed += 1
+
+    with transaction.atomic():
+        rollups.delete()
+        QuestionRollup.objects.bulk_create(
+            [
+                QuestionRollup(form_id=f_id, question_id=q_id, kind=kind, value=value, count=count, total=total)
+                for (f_id, q_id, kind, value), (count, total) in totals.items()
+            ],
+            batch_size=500,
+        )
+    return processed
+
+
+# --------------------------------------------------
+# 3) STATISTIK EINES FORMULARS
+# --------------------------------------------------
+def form_statistics(form_id):
+    """
+    Liefert die Statistik eines Formulars aus den vorberechneten Kennzahlen.
+    Benötigt eine Abfrage (plus ggf. das gecachte Formular-Layout), unabhängig
+    von der Anzahl der Antworten.
+    """
+    rows = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+    for question_id, kind, value, count, total in (
+        QuestionRollup.objects
+        .filter(form_id=form_id)
+        .values_list('question_id', 'kind', 'value', 'count', 'total')
+    ):
+        entry = rows[question_id][(kind, value)]
+        entry[0] += count
+        entry[1] += total
+
+    def count_of(question_id, kind, value=''):
+        return rows[question_id].get((kind, value), (0, 0.0))[0]
+
+    questions = []
+    for question in get_form_layout(form_id):
+        question_id = question['id']
+        option_type = question['option_type']
+        item = {
+            'id': question_id,
+            'text': question['text'],
+            'option_type': option_type,
+            'answered': count_of(question_id, 'answered'),
+            'text_answers': count_of(question_id, 'text'),
+            'timestamps': count_of(question_id, 'timestamps'),
+        }
+
+        if option_type == 'checkbox':
+            item['options'] = [
+                {'id': opt_id, 'label': label, 'count': count_of(question_id, 'option', str(opt_id))}
+                for opt_id, label in question['options']
+            ]
+        elif option_type == 'dropdown':
+            choices = {
+                value: count
+                for (kind, value), (count, _total) in rows[question_id].items()
+                if kind == 'choice' and count
+            }
+            # Bekannte Optionen in Formular-Reihenfolge, danach ggf. nicht mehr vorhandene Werte
+            ordered = [label for _opt_id, label in question['options']]
+            ordered += sorted(value for value in choices if value not in ordered)
+            item['choices'] = [{'label': label, 'count': choices.get(label, 0)} for label in ordered]
+        elif option_type == 'scale':
+            histogram = {
+                value: count
+                for (kind, value), (count, _total) in rows[question_id].items()
+                if kind == 'scale' and count
+            }
+            scale_count = sum(histogram.values())
+            scale_sum = sum(
+                total for (kind, _value), (_count, total) in rows[question_id].items() if kind == 'scale'
+            )
+            item['scale'] = {
+                'count': scale_count,
+                'sum': scale_sum,
+                'average': round(scale_sum / scale_count, 4) if scale_count else None,
+                'histogram': dict(sorted(histogram.items(), key=lambda kv: float(kv[0]))),
+            }
+        questions.append(item)
+
+    return {
+        'form': form_id,
+        'responses': count_of(None, 'responses'),
+        'questions': questions,
+    }
+
+
+# --------------------------------------------------
+# 4) ANPASSUNG AN LAYOUT-ÄNDERUNGEN
+# --------------------------------------------------
+def rollup_layout_fingerprint(form_id):
+    """Prüfsumme der Teile des Layouts, von denen der Beitrag einer Antwort abhängt"""
+    relevant = [
+        [question['id'], question['option_type'], [opt_id for opt_id, _label in question['options']],
+         question['input_field_added']]
+        for question in get_form_layout(form_id)
+    ]
+    return hashlib.sha256(json.dumps(relevant).encode('utf-8')).hexdigest()
+
+
+def rebuild_rollups_if_layout_changed(form_id):
+    """
+    Berechnet die Kennzahlen eines Formulars neu, wenn sich das Layout seit der letzten
+    Neuberechnung geändert hat. Gibt True zurück, wenn neu berechnet wurde.
+    """
+    fingerprint = rollup_layout_fingerprint(form_id)
+    key = ROLLUP_LAYOUT_CACHE_KEY.format(form_id=form_id)
+    if cache.get(key) == fingerprint:
+        return False
+    rebuild_rollups(form_id)
+    cache.set(key, fingerprint, None)
+    return True
+
+
+def schedule_rollup_rebuild(form_id):
+    """
+    Plant die Neuberechnung nach dem Abschluss der laufenden Transaktion. Mehrere
+    Änderungen in einer Transaktion (z.B. Frage mit Optionen im Admin) führen über
+    den Layout-Vergleich nur zu einer Neuberechnung.
+    """
+    transaction.on_commit(lambda: rebuild_rollups_if_layout_changed(form_id))
@@ -171,7 +171,7 @@ class HomeScreenImageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = HomeScreenImage
-        fields = ['id', 'image_url', 'description']
+        fields = ['id', 'image_url', 'description', 'organization']
 
     def get_image_url(self, obj):
         """
@@ -0,0 +1,227 @@
+# signals.py - Signal-Handler für die DÜB-Anwendung
+#
+# Diese Datei bündelt alle Reaktionen auf Modelländerungen (post_save/post_delete),
+# mit denen abgeleitete Daten wie Caches aktuell gehalten werden. Die Handler werden
+# in apps.py (KhuappConfig.ready) durch den Import dieses Moduls registriert.
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    Form, Question, Option, FormResponse,
+    VictimProfile, Organization, TestScenario, TestScenarioVictim, VictimProfileResponse,
+)
+from .email_and_excel import invalidate_form_layout
+from .analytics import invalidate_triage_analytics, invalidate_scenario_category_stats
+from .rollups import ROLLUP_SOURCE_FIELDS, contribution_of, apply_rollup_delta, schedule_rollup_rebuild
+from .timeline import sync_form_response_events, sync_victim_response_events
+from .overview import remove_overview_images, schedule_overview_refresh
+from .metrics import FORM_SUBMISSIONS, VICTIM_PROFILE_SUBMISSIONS
+
+# ------------------------------------------------
+# 1) FORMULAR-LAYOUT FÜR DIE EXCEL-AUSWERTUNG
+# ------------------------------------------------
+
+@receiver([post_save, post_delete], sender=Form)
+def form_changed(sender, instance, **kwargs):
+    """Verwirft das gecachte Layout, wenn ein Formular geändert oder gelöscht wird"""
+    invalidate_form_layout(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, raw=False, **kwargs):
+    """
+    Verwirft das gecachte Layout des Formulars, zu dem die Frage gehört, und plant die
+    Neuberechnung seiner Kennzahlen (siehe rollups.py)
+    """
+    invalidate_form_layout(instance.form_id)
+    if not raw:
+        schedule_rollup_rebuild(instance.form_id)
+
+
+@receiver([post_save, post_delete], sender=Option)
+def option_changed(sender, instance, raw=False, **kwargs):
+    """
+    Verwirft das gecachte Layout des Formulars, zu dem die Option gehört, und plant die
+    Neuberechnung seiner Kennzahlen. Beim kaskadierenden Löschen kann die Frage bereits
+    entfernt sein; dann hat deren eigener Handler beides schon erledigt.
+    """
+    if Option.question.is_cached(instance):
+        form_id = instance.question.form_id
+    else:
+        form_id = (
+            Question.objects
+            .filter(pk=instance.question_id)
+            .values_list('form_id', flat=True)
+            .first()
+        )
+    if form_id is None:
+        return
+    invalidate_form_layout(form_id)
+    if not raw:
+        schedule_rollup_rebuild(form_id)
+
+
+# ------------------------------------------------
+# 2) SICHTUNGSAUSWERTUNG UND SZENARIO-STATISTIK
+# ------------------------------------------------
+
+@receiver([post_save, post_delete], sender=VictimProfileResponse)
+@receiver([post_save, post_delete], sender=TestScenarioVictim)
+@receiver([post_save, post_delete], sender=VictimProfile)
+@receiver([post_save, post_delete], sender=Organization)
+def triage_data_changed(sender, instance, **kwargs):
+    """
+    Verwirft die gecachte Sichtungsauswertung, wenn eine Antwort eingeht oder sich
+    Zuweisungen, Profilkategorien oder Organisationen ändern.
+    """
+    invalidate_triage_analytics()
+
+
+@receiver([post_save, post_delete], sender=TestScenarioVictim)
+def assignment_stats_changed(sender, instance, **kwargs):
+    """Verwirft die Kategorienstatistik des Szenarios, zu dem die Zuweisung gehört"""
+    invalidate_scenario_category_stats(instance.scenario_id)
+
+
+@receiver(post_save, sender=VictimProfile)
+def victim_profile_stats_changed(sender, instance, created=False, **kwargs):
+    """
+    Verwirft die Kategorienstatistik aller Szenarien, denen das Profil zugewiesen ist
+    (die Kategorie könnte sich geändert haben). Beim Löschen eines Profils werden die
+    Zuweisungen kaskadierend gelöscht und lösen ihren eigenen Handler aus.
+    """
+    if created:
+        return
+    invalidate_scenario_category_stats(*instance.scenarios.values_list('id', flat=True))
+
+
+# ------------------------------------------------
+# 3) KENNZAHLEN DER FORMULARANTWORTEN
+# ------------------------------------------------
+
+@receiver(pre_save, sender=FormResponse)
+def form_response_before_save(sender, instance, raw=False, **kwargs):
+    """
+    Merkt sich vor einer Änderung den bisherigen Beitrag der Antwort zu den Kennzahlen,
+    damit nach dem Speichern nur die Differenz verbucht wird.
+    """
+    instance._rollup_previous = None
+    if raw or instance.pk is None:
+        return
+    previous = FormResponse.objects.filter(pk=instance.pk).values(*ROLLUP_SOURCE_FIELDS).first()
+    if previous is not None:
+        instance._rollup_previous = contribution_of(previous)
+
+
+@receiver(post_save, sender=FormResponse)
+def form_response_saved(sender, instance, raw=False, **kwargs):
+    """Verbucht den neuen bzw. geänderten Beitrag der Antwort in QuestionRollup"""
+    if raw:
+        return
+    apply_rollup_delta(getattr(instance, '_rollup_previous', None), contribution_of(instance))
+
+
+@receiver(post_delete, sender=FormResponse)
+def form_response_deleted(sender, instance, **kwargs):
+    """Zieht den Beitrag einer gelöschten Antwort von den Kennzahlen ab"""
+    apply_rollup_delta(contribution_of(instance), None)
+
+
+# ------------------------------------------------
+# 4) ZEITSTRAHL-EREIGNISSE
+# ------------------------------------------------
+# Beim Löschen einer Antwort werden die Ereignisse per CASCADE mitgelöscht.
+
+@receiver(post_save, sender=FormResponse)
+def form_response_timeline(sender, instance, raw=False, **kwargs):
+    """Überträgt die Zeitstempel einer gespeicherten Antwort in die Ereignistabelle"""
+    if raw:
+        return
+    sync_form_response_events(instance)
+
+
+@receiver(post_save, sender=VictimProfileResponse)
+def victim_response_timeline(sender, instance, raw=False, **kwargs):
+    """Überträgt die Verlaufseinträge eines Patientenbegleitbogens in die Ereignistabelle"""
+    if raw:
+        return
+    sync_victim_response_events(instance)
+
+
+# ------------------------------------------------
+# 5) SZENARIO-ÜBERSICHT
+# ------------------------------------------------
+# Die Neuerzeugung läuft entprellt im Hintergrund (siehe overview.py).
+
+@receiver([post_save, post_delete], sender=TestScenarioVictim)
+def assignment_changed(sender, instance, raw=False, **kwargs):
+    """Plant die Neuerzeugung der Übersicht, wenn eine Zuweisung geändert oder gelöscht wird"""
+    if raw or not settings.OVERVIEW_AUTO_REFRESH:
+        return
+    schedule_overview_refresh(instance.scenario_id)
+
+
+@receiver(post_save, sender=TestScenario)
+def scenario_changed(sender, instance, created=False, raw=False, **kwargs):
+    """Name und Datum erscheinen in der Übersicht; neue Szenarien haben noch keine Zuweisungen"""
+    if raw or created or not settings.OVERVIEW_AUTO_REFRESH:
+        return
+    schedule_overview_refresh(instance.pk)
+
+
+@receiver(pre_delete, sender=TestScenario)
+def scenario_deleted(sender, instance, **kwargs):
+    """
+    Löscht die Übersichtsbilder des Szenarios. Muss vor dem Löschen laufen: Danach wäre
+    HomeScreenImage.scenario bereits auf NULL gesetzt (SET_NULL).
+    """
+    remove_overview_images(instance.pk)
+
+
+@receiver(post_save, sender=VictimProfile)
+def victim_profile_changed(sender, instance, created=False, raw=False, **kwargs):
+    """Kategorie, Diagnose usw. eines zugewiesenen Profils erscheinen in der Übersicht"""
+    if raw or created or not settings.OVERVIEW_AUTO_REFRESH:
+        return
+    for scenario_id in instance.scenarios.values_list('id', flat=True):
+        schedule_overview_refresh(scenario_id)
+
+
+@receiver(post_save, sender=Organization)
+def organization_changed(sender, instance, created=False, raw=False, **kwargs):
+    """Kürzel und Name einer Organisation erscheinen in deren Übersicht"""
+    if raw or created or not settings.OVERVIEW_AUTO_REFRESH:
+        return
+    scenario_ids = (
+        TestScenarioVictim.objects
+        .filter(organization=instance)
+        .values_list('scenario_id', flat=True)
+        .distinct()
+    )
+    for scenario_id in scenario_ids:
+        schedule_overview_refresh(scenario_id)
+
+
+# ------------------------------------------------
+# 6) KENNZAHLEN FÜR /metrics
+# ------------------------------------------------
+# Gezählt wird erst nach dem Commit, damit zurückgerollte Einsendungen nicht mitzählen.
+
+@receiver(post_save, sender=FormResponse)
+def form_response_counted(sender, instance, created=False, raw=False, **kwargs):
+    """Zählt neue Formularantworten je Formular"""
+    if raw or not created:
+        return
+    form_id = instance.form_id
+    transaction.on_commit(lambda: FORM_SUBMISSIONS.inc(form_id))
+
+
+@receiver(post_save, sender=VictimProfileResponse)
+def victim_response_counted(sender, instance, created=False, raw=False, **kwargs):
+    """Zählt neue Patientenbegleitbögen"""
+    if raw or not created:
+        return
+    transaction.on_commit(VICTIM_PROFILE_SUBMISSIONS.inc)
@@ -0,0 +1,52 @@
+# sqlite_profile.py - Verbindungsprofil für den SQLite-Betrieb
+#
+# Setzt bei jeder neuen SQLite-Verbindung die PRAGMAs aus settings.SQLITE_PRAGMAS
+# (WAL-Journal, synchronous, busy_timeout, mmap_size, cache_size ...). Der Handler wird in
+# apps.py (KhuappConfig.ready) mit dem Signal connection_created verbunden. Zusammen mit
+# persistenten Verbindungen (CONN_MAX_AGE) werden die PRAGMAs nur einmal pro Verbindung
+# und nicht bei jedem Request gesetzt.
+
+import re
+from django.conf import settings
+
+# Zulässige PRAGMAs (die Werte stammen aus der .env, werden aber trotzdem geprüft)
+ALLOWED_PRAGMAS = (
+    'journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size',
+    'temp_store', 'wal_autocheckpoint', 'journal_size_limit', 'foreign_keys',
+)
+
+# Werte: ganze Zahlen oder einfache Schlüsselwörter (z.B. WAL, NORMAL, MEMORY)
+_PRAGMA_VALUE = re.compile(r'^(-?\d+|[A-Za-z_]+)$')
+
+
+def apply_pragmas(cursor, pragmas):
+    """
+    Setzt die angegebenen PRAGMAs über einen DB-API-Cursor. Leere Werte werden übersprungen.
+
+    Returns:
+        dict: Tatsächlich eingestellte Werte laut SQLite {Name: Wert}
+    """
+    applied = {}
+    for name, value in pragmas.items():
+        if value is None or value == '':
+            continue
+        if name not in ALLOWED_PRAGMAS:
+            raise ValueError(f"Unbekanntes SQLite-PRAGMA: {name}")
+        if not _PRAGMA_VALUE.match(str(value)):
+            raise ValueError(f"Ungültiger Wert für PRAGMA {name}: {value!r}")
+        cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.execute(f"PRAGMA {name}")
+        row = cursor.fetchone()
+        applied[name] = row[0] if row else None
+    return applied
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Handler für connection_created: setzt die PRAGMAs auf neuen SQLite-Verbindungen"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas)
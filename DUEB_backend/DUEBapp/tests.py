@@ -1,3 +1,982 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock, skipUnless
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models.signals import pre_save
+from django.forms import inlineformset_factory
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from .admin import PaginatedAssignmentFormSet
+from .admin_excelupload import import_victim_profiles
+from .email_and_excel import FORM_LAYOUT_CACHE_KEY, get_form_layout
+from .email_and_excel_victimprofiles import SheetResponse, latest_responses_by_button
+from .analytics import compute_triage_analytics, get_scenario_category_stats, triage_counts
+from .log_queue import DebugSamplingFilter, redact_secrets
+from .metrics import Histogram, REGISTRY
+from .export_victimprofiles import iter_report_rows, load_assignments_by_button
+from .middleware import normalize_sql
+from .overview import refresh_scenario_overview
+from .rollups import apply_rollup_delta, form_statistics, response_contribution
+from .timeline import backfill_timeline_events, parse_event_time
+from .report_store import get_or_create_report, report_download_path, report_key, signed_download_url
+from .write_queue import WriteQueuePending, WriteQueueTimeout, pending_writes, submit_write
+from .models import (
+    Form, FormResponse, HomeScreenImage, Option, Organization, Question, QuestionRollup, TestScenario, TestScenarioVictim,
+    TimelineEvent, VictimProfile, VictimProfileResponse,
+)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DUEBTestCase(TestCase):
+    """
+    Basis aller Tests: eigener, leerer Cache je Test. Der dateibasierte Cache der Anwendung
+    enthält Einträge zu den IDs der echten Datenbank (z.B. Formular-Layouts), die mit den
+    IDs der Testdatenbank kollidieren würden.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+# ------------------------------------------------
+# 1) ABFRAGEPLÄNE DER HÄUFIGEN ABFRAGEN
+# ------------------------------------------------
+# Prüft mit SQLite-EXPLAIN QUERY PLAN, dass die häufigen Abfragen die Indizes aus
+# Migrationen 0054/0055 verwenden. Ein vollständiger Tabellenscan ("SCAN <Tabelle>" ohne Index)
+# oder eine zusätzliche Sortierung gilt als Regression.
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN ist SQLite-spezifisch")
+class QueryPlanTests(DUEBTestCase):
+
+    def query_plan(self, queryset):
+        """Liefert die Zeilen des Abfrageplans (Spalte detail) eines QuerySets"""
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, queryset, index_name, allow_sort=False):
+        """Prüft, dass der Index verwendet wird und keine Tabelle vollständig gescannt wird"""
+        plan = self.query_plan(queryset)
+        text = "\n".join(plan)
+        self.assertIn(index_name, text, f"Index {index_name} wird nicht verwendet:\n{text}")
+        for detail in plan:
+            self.assertFalse(
+                detail.startswith("SCAN ") and " INDEX " not in detail,
+                f"Vollständiger Tabellenscan:\n{text}",
+            )
+        if not allow_sort:
+            self.assertNotIn("USE TEMP B-TREE", text, f"Zusätzliche Sortierung:\n{text}")
+
+    def test_latest_response_by_button_number(self):
+        queryset = VictimProfileResponse.objects.filter(button_number="A01").order_by('-erstellt_am')[:1]
+        self.assertUsesIndex(queryset, 'vpr_button_created_idx')
+
+    def test_response_changelist_ordering(self):
+        queryset = VictimProfileResponse.objects.order_by('-erstellt_am')[:100]
+        self.assertUsesIndex(queryset, 'vpr_created_idx')
+
+    def test_response_changelist_filters(self):
+        for field, index_name in (
+            ('ist_sichtung', 'vpr_ist_sichtung_idx'),
+            ('soll_sichtung', 'vpr_soll_sichtung_idx'),
+            ('observer_name', 'vpr_observer_name_idx'),
+        ):
+            with self.subTest(field=field):
+                self.assertUsesIndex(
+                    VictimProfileResponse.objects.filter(**{field: "SK 1"}), index_name, allow_sort=True
+                )
+                # Auswahlwerte des list_filter (SELECT DISTINCT ... ORDER BY)
+                self.assertUsesIndex(
+                    VictimProfileResponse.objects.order_by(field).values_list(field, flat=True).distinct(),
+                    index_name,
+                )
+
+    def test_form_responses_by_submission_time(self):
+        form = Form.objects.create(name="Beobachtungsbogen")
+        queryset = FormResponse.objects.filter(form=form).order_by('-submitted_at')
+        self.assertUsesIndex(queryset, 'formresponse_form_sub_idx')
+
+    def test_form_by_name(self):
+        self.assertUsesIndex(Form.objects.filter(name="Beobachtungsbogen"), 'form_name_idx')
+
+    def test_victim_profiles_by_category(self):
+        self.assertUsesIndex(VictimProfile.objects.filter(category="SK 1"), 'victimprofile_category_idx', allow_sort=True)
+
+    def test_triage_assignment_by_button_number(self):
+        # Korrelierte Unterabfragen der Sichtungsauswertung (analytics.triage_counts)
+        queryset = TestScenarioVictim.objects.filter(button_number="FW01").order_by('-scenario_id')[:1]
+        self.assertUsesIndex(queryset, 'tsv_button_scenario_idx')
+        self.assertUsesIndex(triage_counts(), 'tsv_button_scenario_idx', allow_sort=True)
+
+
+# ------------------------------------------------
+# 2) MESSUNG PRO REQUEST
+# ------------------------------------------------
+@override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_HEADER=True)
+class RequestProfilingTests(DUEBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("beobachter", password="x"))
+
+    def test_normalize_sql_ignores_parameters(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id = 12 AND name = 'A''B'"),
+            normalize_sql("SELECT *  FROM t WHERE id = 7 AND name = 'C'"),
+        )
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (%s, %s, %s)"),
+            normalize_sql("SELECT * FROM t WHERE id IN (%s)"),
+        )
+
+    def test_server_timing_reports_duplicate_queries(self):
+        for index in range(3):
+            form = Form.objects.create(name=f"Bogen {index}")
+            Question.objects.create(form=form, question_text="Frage")
+        with self.assertLogs("DUEBapp.middleware", level="INFO") as logs:
+            response = self.client.get("/api/forms/")
+        self.assertEqual(response.status_code, 200)
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertNotIn('desc="0 duplicate queries"', timing)
+        self.assertIn("view=form-list", logs.output[0])
+
+    @override_settings(REQUEST_PROFILING_MAX_QUERIES=1)
+    def test_threshold_logs_offending_queries(self):
+        Form.objects.create(name="Bogen")
+        with self.assertLogs("DUEBapp.middleware", level="WARNING") as logs:
+            self.client.get("/api/forms/")
+        self.assertIn("DUEBapp_form", "\n".join(logs.output))
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_disabled(self):
+        response = self.client.get("/api/forms/")
+        self.assertNotIn("Server-Timing", response)
+
+
+# ------------------------------------------------
+# 3) LOGGING
+# ------------------------------------------------
+class LogQueueTests(DUEBTestCase):
+
+    def make_record(self, level, msg):
+        return logging.LogRecord("DUEBapp.views", level, __file__, 1, msg, (), None)
+
+    def test_debug_sampling_per_call_site(self):
+        sampler = DebugSamplingFilter(rate=5)
+        passed = [sampler.filter(self.make_record(logging.DEBUG, "Verarbeite Profil: %s")) for _ in range(20)]
+        self.assertEqual(passed.count(True), 4)
+        # Andere Meldung wird unabhängig gezählt, INFO nie verworfen
+        self.assertTrue(sampler.filter(self.make_record(logging.DEBUG, "Andere Meldung")))
+        self.assertTrue(all(sampler.filter(self.make_record(logging.INFO, "Verarbeite Profil: %s")) for _ in range(5)))
+
+    def test_redact_secrets(self):
+        key = "9944b09199c62bcf9418ad846dd0e4bbdfc6ee4b"
+        text = redact_secrets(f"Auth Header: Token {key}, Antwort {{'token': '{key}'}}")
+        self.assertNotIn(key, text)
+        self.assertIn("Token ***", text)
+        self.assertEqual(redact_secrets("Token observer"), "Token observer")
+
+
+# ------------------------------------------------
+# 4) BETRIEBSKENNZAHLEN
+# ------------------------------------------------
+class MetricsTests(DUEBTestCase):
+
+    def test_histogram_is_cumulative(self):
+        histogram = Histogram('dueb_test_seconds', "Test", ('view',), buckets=(0.1, 1.0))
+        self.addCleanup(REGISTRY.remove, histogram)
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, "A")
+        lines = histogram.render()
+        self.assertIn('dueb_test_seconds_bucket{view="A",le="0.1"} 1', lines)
+        self.assertIn('dueb_test_seconds_bucket{view="A",le="1.0"} 3', lines)
+        self.assertIn('dueb_test_seconds_bucket{view="A",le="+Inf"} 4', lines)
+        self.assertIn('dueb_test_seconds_count{view="A"} 4', lines)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_endpoint_only_for_allowed_addresses(self):
+        client = APIClient()
+        Form.objects.create(name="Bogen")
+        client.force_authenticate(User.objects.create_user("beobachter", password="x"))
+        client.get("/api/forms/")
+
+        response = client.get("/metrics", REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn(
+            'dueb_request_duration_seconds_count{view="FormViewSet",action="list",status="2xx"}',
+            response.content.decode(),
+        )
+        self.assertEqual(client.get("/metrics", REMOTE_ADDR="192.0.2.1").status_code, 404)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_forwarded_requests_rejected_without_token(self):
+        # Hinter nginx kommt jede Anfrage von 127.0.0.1
+        client = APIClient(REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(client.get("/metrics", HTTP_X_FORWARDED_FOR="198.51.100.7").status_code, 404)
+        self.assertEqual(client.get("/metrics", HTTP_FORWARDED="for=198.51.100.7").status_code, 404)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN="geheim")
+    def test_token_required_when_configured(self):
+        client = APIClient(REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(client.get("/metrics").status_code, 404)
+        self.assertEqual(client.get("/metrics", HTTP_AUTHORIZATION="Bearer falsch").status_code, 404)
+        response = client.get(
+            "/metrics", HTTP_AUTHORIZATION="Bearer geheim", HTTP_X_FORWARDED_FOR="198.51.100.7"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_disabled_by_default(self):
+        self.assertEqual(APIClient().get("/metrics", REMOTE_ADDR="127.0.0.1").status_code, 404)
+
+
+# ------------------------------------------------
+# 5) ÜBUNGSDATEN (seed_exercise)
+# ------------------------------------------------
+class SeedExerciseTests(DUEBTestCase):
+    options = {
+        'profiles': 40, 'victims': 12, 'organizations': 3, 'forms': 2, 'questions': 15,
+        'form_responses': 30, 'victim_responses': 20, 'batch_size': 7, 'stdout': io.StringIO(),
+    }
+
+    def snapshot(self):
+        # Die Antwortschlüssel enthalten Fragen-IDs, die nach --reset neu vergeben werden
+        return (
+            [
+                (len(response.responses), response.note, response.note_timestamps, response.submitted_at)
+                for response in FormResponse.objects.order_by('id')
+            ],
+            list(VictimProfileResponse.objects.order_by('id').values_list('button_number', 'verlauf')),
+        )
+
+    def test_bulk_seed_builds_derived_data(self):
+        call_command('seed_exercise', **self.options)
+        self.assertEqual(VictimProfile.objects.count(), 40)
+        self.assertEqual(FormResponse.objects.count(), 30)
+        self.assertEqual(VictimProfileResponse.objects.count(), 20)
+        self.assertEqual(
+            TestScenarioVictim.objects.values('organization').distinct().count(), 3,
+        )
+        self.assertTrue(TestScenarioVictim.objects.filter(button_number="UFW01").exists())
+        # bulk_create löst keine Signale aus: Kennzahlen und Zeitstrahl werden direkt aufgebaut
+        self.assertTrue(QuestionRollup.objects.exists())
+        self.assertTrue(TimelineEvent.objects.filter(source='verlauf').exists())
+        self.assertTrue(all(
+            response.submitted_at.date().isoformat() == "2026-09-19" for response in FormResponse.objects.all()
+        ))
+
+    def test_deterministic_and_resettable(self):
+        call_command('seed_exercise', **self.options)
+        first = self.snapshot()
+        call_command('seed_exercise', reset=True, **self.options)
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(VictimProfile.objects.count(), 40)
+
+
+# ------------------------------------------------
+# 6) EXCEL-/CSV-IMPORT DER PATIENTENPROFILE
+# ------------------------------------------------
+class VictimProfileImportTests(DUEBTestCase):
+
+    def write_file(self, content, suffix=".csv", encoding="utf-8"):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w", encoding=encoding, newline="") as fh:
+            fh.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_refreshes_scenario_statistics(self):
+        profile = VictimProfile.objects.create(profile_number="P1", category="SK 1")
+        scenario = TestScenario.objects.create(name="Übung")
+        organization = Organization.objects.create(name="Feuerwehr", short_code="FW")
+        TestScenarioVictim.objects.create(scenario=scenario, victim_profile=profile, organization=organization)
+        self.assertEqual(get_scenario_category_stats(scenario.pk), {"SK 1": 1})
+
+        created, updated = import_victim_profiles(self.write_file("Profil-Nr;SK\nP1;SK 3\nP2;SK 2\n"))
+        self.assertEqual((created, updated), (1, 1))
+        self.assertEqual(get_scenario_category_stats(scenario.pk), {"SK 3": 1})
+
+    def test_import_windows_1252_csv(self):
+        path = self.write_file("Profil-Nr;Diagnose\nP1;Schädel-Hirn-Trauma, Verbrühung\n", encoding="cp1252")
+        self.assertEqual(import_victim_profiles(path), (1, 0))
+        self.assertEqual(VictimProfile.objects.get().diagnosis, "Schädel-Hirn-Trauma, Verbrühung")
+
+    def test_admin_reports_unreadable_file(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media_root.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.client.force_login(User.objects.create_superuser("admin", password="x"))
+
+        upload = ContentFile(b"kein Excel", name="profile.xlsx")
+        response = self.client.post("/admin/DUEBapp/excelupload/add/", {"file": upload}, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "Datei konnte nicht eingelesen werden", [str(m) for m in response.context["messages"]][0]
+        )
+        self.assertFalse(VictimProfile.objects.exists())
+
+
+# ------------------------------------------------
+# 7) SZENARIO-ÜBERSICHT
+# ------------------------------------------------
+class OverviewImageTests(DUEBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media_root.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+    def create_image(self, name, **fields):
+        image = HomeScreenImage(**fields)
+        image.image.save(name, ContentFile(b"PNG"), save=True)
+        return image
+
+    def test_deleting_scenario_removes_its_overview_images(self):
+        scenario = TestScenario.objects.create(name="Übung")
+        overview = self.create_image("uebersicht.png", scenario=scenario)
+        general = self.create_image("start.png")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            scenario.delete()
+
+        self.assertEqual(list(HomeScreenImage.objects.all()), [general])
+        self.assertFalse(overview.image.storage.exists(overview.image.name))
+        self.assertTrue(general.image.storage.exists(general.image.name))
+
+    @override_settings(OVERVIEW_AUTO_REFRESH=False, OVERVIEW_FORMAT="png")
+    def test_refresh_replaces_overview_per_organization(self):
+        scenario = TestScenario.objects.create(name="Übung", date="2026-10-19")
+        fire = Organization.objects.create(name="Feuerwehr", short_code="FW")
+        rescue = Organization.objects.create(name="Rettungsdienst", short_code="RD")
+        assignments = {}
+        for number, organization in enumerate((rescue, rescue, rescue, fire, None)):
+            profile = VictimProfile.objects.create(profile_number=f"P{number}", category="SK 1")
+            assignment = TestScenarioVictim(scenario=scenario, victim_profile=profile, organization=organization)
+            if organization is None:
+                assignment.sequential_number, assignment.button_number = 1, "X01"
+            assignment.save()
+            assignments[profile.profile_number] = assignment
+        general = self.create_image("start.png")
+
+        def overview():
+            return [
+                (image.organization, image.description)
+                for image in HomeScreenImage.objects.filter(scenario=scenario).order_by('pk')
+            ]
+
+        # Seriell zeichnen, zwei Zeilen pro Seite
+        with mock.patch('DUEBapp.overview.OVERVIEW_PARALLEL_MIN_ROWS', 10 ** 6), \
+                mock.patch('DUEBapp.pillow_utils.ROWS_PER_PAGE', 2):
+            first = refresh_scenario_overview(scenario.pk)
+            self.assertEqual(overview(), [
+                (fire, "Übersicht für Szenario Übung vom 19.10.2026 (Feuerwehr)"),
+                (rescue, "Übersicht für Szenario Übung vom 19.10.2026 (Rettungsdienst) (Seite 1 von 2)"),
+                (rescue, "Übersicht für Szenario Übung vom 19.10.2026 (Rettungsdienst) (Seite 2 von 2)"),
+                (None, "Übersicht für Szenario Übung vom 19.10.2026"),
+            ])
+            self.assertIn("ohne_Organisation", first[3].image.name)
+            self.assertTrue(all(image.image.storage.exists(image.image.name) for image in first))
+
+            assignments["P0"].delete()
+            assignments["P4"].delete()
+            second = refresh_scenario_overview(scenario.pk)
+
+        # Ersetzt statt angesammelt: eine Seite je Organisation, unveränderte Seite wiederverwendet
+        self.assertEqual(overview(), [
+            (fire, "Übersicht für Szenario Übung vom 19.10.2026 (Feuerwehr)"),
+            (rescue, "Übersicht für Szenario Übung vom 19.10.2026 (Rettungsdienst)"),
+        ])
+        self.assertEqual(second[0].pk, first[0].pk)
+        self.assertTrue(all(image.image.storage.exists(image.image.name) for image in second))
+        for image in first[1:]:
+            self.assertFalse(image.image.storage.exists(image.image.name), image.image.name)
+        self.assertTrue(HomeScreenImage.objects.filter(pk=general.pk, scenario=None).exists())
+        self.assertEqual(
+            sorted(os.listdir(os.path.dirname(second[0].image.path))),
+            sorted(os.path.basename(image.image.name) for image in [general, *second]),
+        )
+
+
+# ------------------------------------------------
+# 8) SCHREIBWARTESCHLANGE
+# ------------------------------------------------
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SUBMISSION_WRITE_QUEUE=True, SUBMISSION_BATCH_MAX=1, SUBMISSION_WRITE_TIMEOUT=0.2,
+)
+class WriteQueueTests(TransactionTestCase):
+    """Läuft ohne umschließende Transaktion, damit submit_write den Schreib-Thread verwendet"""
+
+    def test_send_victim_profiles_goes_through_queue(self):
+        profile = VictimProfile.objects.create(profile_number="P1", category="SK 2")
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("beobachter", password="x"))
+        response = client.post("/api/send-victimprofiles/", {
+            'profile_mapping': [{'victimProfileId': profile.pk, 'buttonNumber': "FW01"}],
+            'observer_account': {'first_name': "Anna", 'email': "unknown@observer"},
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['profiles_count'], 1)
+        self.assertEqual(
+            list(VictimProfileResponse.objects.values_list('button_number', 'soll_sichtung')), [("FW01", "SK 2")],
+        )
+
+    def test_failed_group_commit_retries_as_new_object(self):
+        from django.db.backends.base.base import BaseDatabaseWrapper
+        original_commit = BaseDatabaseWrapper._commit
+        failures = []
+
+        def failing_commit(wrapper):
+            # Erster Commit im Schreib-Thread schlägt fehl (wie ein verzögert geprüfter Fremdschlüssel)
+            if threading.current_thread().name == "dueb-write-queue" and not failures:
+                failures.append(True)
+                raise IntegrityError("FOREIGN KEY constraint failed")
+            return original_commit(wrapper)
+
+        attempts = []
+
+        def competing_submission(sender, instance, **kwargs):
+            # Vor der Wiederholung belegt eine andere Einsendung die frei gewordene ID
+            if instance.button_number != "FW01":
+                return
+            attempts.append(instance._state.adding)
+            if len(attempts) == 2:
+                VictimProfileResponse.objects.create(button_number="RD02")
+        pre_save.connect(competing_submission, sender=VictimProfileResponse)
+        self.addCleanup(pre_save.disconnect, competing_submission, sender=VictimProfileResponse)
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("beobachter", password="x"))
+        with mock.patch.object(BaseDatabaseWrapper, '_commit', failing_commit), \
+                self.assertLogs("DUEBapp.write_queue", level="WARNING"):
+            response = client.post("/api/victim-profile-responses/", {'button_number': "FW01"}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(failures, [True])
+        # Auch die Wiederholung legt neu an, statt die ID des zurückgerollten Versuchs zu aktualisieren
+        self.assertEqual(attempts, [True, True])
+        self.assertEqual(
+            sorted(VictimProfileResponse.objects.values_list('button_number', flat=True)), ["FW01", "RD02"]
+        )
+        self.assertEqual(VictimProfileResponse.objects.get(pk=response.data['id']).button_number, "FW01")
+
+    def test_timeout_distinguishes_running_and_queued_writes(self):
+        release = threading.Event()
+        finished = threading.Event()
+
+        def slow_write():
+            release.wait(5)
+            finished.set()
+            return "gespeichert"
+
+        def cleanup():
+            release.set()
+            finished.wait(5)
+            while pending_writes():
+                time.sleep(0.01)
+        self.addCleanup(cleanup)
+
+        # Bereits laufender Vorgang: kann noch gespeichert werden, daher kein erneutes Senden
+        with self.assertRaises(WriteQueuePending):
+            submit_write(slow_write)
+        # Wartender Vorgang hinter dem laufenden: wird verworfen, erneutes Senden ist sicher
+        with self.assertRaises(WriteQueueTimeout):
+            submit_write(lambda: "zweiter")
+
+
+# ------------------------------------------------
+# 9) ADMIN
+# ------------------------------------------------
+class AssignmentPaginationTests(DUEBTestCase):
+
+    def test_pages_cover_each_assignment_once(self):
+        scenario = TestScenario.objects.create(name="Übung")
+        for short_code in ("RD", "FW"):
+            organization = Organization.objects.create(name=short_code, short_code=short_code)
+            for number in range(3):
+                profile = VictimProfile.objects.create(profile_number=f"{short_code}{number}")
+                TestScenarioVictim.objects.create(scenario=scenario, victim_profile=profile, organization=organization)
+
+        formset_class = inlineformset_factory(
+            TestScenario, TestScenarioVictim, formset=PaginatedAssignmentFormSet, fields=('organization',), extra=0,
+        )
+        formset_class.per_page = 4
+        pages = []
+        for page_number in (1, 2):
+            formset_class.page_number = page_number
+            pages.append([assignment.pk for assignment in formset_class(instance=scenario).get_queryset()])
+
+        expected = list(
+            TestScenarioVictim.objects.order_by('organization', 'sequential_number', 'pk').values_list('pk', flat=True)
+        )
+        self.assertEqual(pages, [expected[:4], expected[4:]])
+
+
+# ------------------------------------------------
+# 10) BERICHTSSPEICHER UND DOWNLOAD
+# ------------------------------------------------
+@override_settings(REPORT_DOWNLOAD_BASE_URL="http://testserver")
+class ReportDownloadTests(DUEBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        report_root = tempfile.TemporaryDirectory()
+        self.addCleanup(report_root.cleanup)
+        report_override = override_settings(REPORT_STORE_ROOT=report_root.name)
+        report_override.enable()
+        self.addCleanup(report_override.disable)
+
+        self.key = report_key("test", "bericht")
+        self.stored, _content = get_or_create_report(
+            self.key, "Bericht.xlsx", "application/octet-stream", lambda: b"0123456789"
+        )
+        self.etag = f'"{self.key}"'
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("beobachter", password="x"))
+
+    def download(self, **headers):
+        response = self.client.get(report_download_path(self.key), headers=headers)
+        return response, b"".join(response.streaming_content) if response.streaming else response.content
+
+    def test_full_download(self):
+        response, content = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content, b"0123456789")
+        self.assertEqual(response["ETag"], self.etag)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn('filename="Bericht.xlsx"', response["Content-Disposition"])
+
+    def test_range(self):
+        for header, expected, content_range in (
+            ("bytes=2-5", b"2345", "bytes 2-5/10"),
+            ("bytes=7-", b"789", "bytes 7-9/10"),
+            ("bytes=-3", b"789", "bytes 7-9/10"),
+            ("bytes=8-100", b"89", "bytes 8-9/10"),
+        ):
+            with self.subTest(range=header):
+                response, content = self.download(Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(content, expected)
+                self.assertEqual(response["Content-Range"], content_range)
+                self.assertEqual(response["Content-Length"], str(len(expected)))
+                self.assertEqual(response["Content-Disposition"], 'attachment; filename="Bericht.xlsx"')
+
+    def test_unsatisfiable_range(self):
+        for header in ("bytes=10-", "bytes=5-2", "bytes=-0"):
+            with self.subTest(range=header):
+                response, _content = self.download(Range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_multiple_ranges_return_full_file(self):
+        response, content = self.download(Range="bytes=0-1,4-5")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content, b"0123456789")
+
+    def test_if_none_match(self):
+        response, content = self.download(**{"If-None-Match": f'"anderer", {self.etag}'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(content, b"")
+        self.assertEqual(response["ETag"], self.etag)
+
+        response, _content = self.download(**{"If-None-Match": '"anderer"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_range(self):
+        response, content = self.download(Range="bytes=0-1", **{"If-Range": self.etag})
+        self.assertEqual((response.status_code, content), (206, b"01"))
+
+        # Abweichender ETag oder älteres Datum: die Datei hat sich geändert → vollständige Datei
+        for if_range in ('"anderer"', "Mon, 01 Jan 2001 00:00:00 GMT"):
+            with self.subTest(if_range=if_range):
+                response, content = self.download(Range="bytes=0-1", **{"If-Range": if_range})
+                self.assertEqual((response.status_code, content), (200, b"0123456789"))
+
+    def test_unknown_report(self):
+        response = self.client.get(report_download_path(report_key("test", "fehlt")))
+        self.assertEqual(response.status_code, 404)
+
+    def test_signed_link(self):
+        anonymous = APIClient()
+        url = urlsplit(signed_download_url(self.key))
+        response = anonymous.get(f"{url.path}?{url.query}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+
+        self.assertEqual(anonymous.get(url.path).status_code, 401)
+        self.assertEqual(anonymous.get(f"{url.path}?sig=ungueltig").status_code, 401)
+        # Die Signatur gilt nur für den Schlüssel, für den sie ausgestellt wurde
+        other_path = report_download_path(report_key("test", "anderer"))
+        self.assertEqual(anonymous.get(f"{other_path}?{url.query}").status_code, 401)
+
+    @override_settings(REPORT_LINK_MAX_AGE=-1)
+    def test_expired_signed_link(self):
+        url = urlsplit(signed_download_url(self.key))
+        self.assertEqual(APIClient().get(f"{url.path}?{url.query}").status_code, 401)
+
+
+# ------------------------------------------------
+# 11) KENNZAHLEN DER FORMULARANTWORTEN (rollups)
+# ------------------------------------------------
+class QuestionRollupTests(DUEBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.form = Form.objects.create(name="Beobachtungsbogen")
+        self.checkbox = Question.objects.create(form=self.form, question_text="Maßnahmen", option_type='checkbox')
+        self.option_a = Option.objects.create(question=self.checkbox, label="Abbinden")
+        self.option_b = Option.objects.create(question=self.checkbox, label="Lagerung")
+        self.scale = Question.objects.create(form=self.form, question_text="Bewertung", option_type='scale')
+        self.dropdown = Question.objects.create(
+            form=self.form, question_text="Transportmittel", option_type='dropdown', input_field_added=True
+        )
+
+    def rollups(self):
+        """Alle Kennzahlen des Formulars ohne Nullzeilen als {(Frage, Art, Wert): (Anzahl, Summe)}"""
+        return {
+            (question_id, kind, value): (count, total)
+            for question_id, kind, value, count, total in QuestionRollup.objects
+            .filter(form=self.form)
+            .exclude(count=0, total=0)
+            .values_list('question_id', 'kind', 'value', 'count', 'total')
+        }
+
+    def create_response(self, options=(), scale=None, choice=None, text=None):
+        responses = {f"{self.checkbox.pk}_{option.pk}": True for option in options}
+        if text:
+            responses[str(self.dropdown.pk)] = text
+        return FormResponse.objects.create(
+            form=self.form,
+            responses=responses,
+            scale_values={str(self.scale.pk): scale} if scale is not None else {},
+            picker_selections={str(self.dropdown.pk): choice} if choice else {},
+        )
+
+    def test_contribution(self):
+        contribution = response_contribution(
+            self.form.pk,
+            {f"{self.checkbox.pk}_{self.option_a.pk}": True, str(self.dropdown.pk): "  "},
+            {str(self.dropdown.pk): "RTW"},
+            {str(self.scale.pk): "4.5"},
+            {str(self.scale.pk): ["10:00", "10:05"]},
+        )
+        self.assertEqual(contribution, {
+            (self.form.pk, None, 'responses', ''): [1, 0.0],
+            (self.form.pk, self.checkbox.pk, 'option', str(self.option_a.pk)): [1, 0.0],
+            (self.form.pk, self.checkbox.pk, 'answered', ''): [1, 0.0],
+            (self.form.pk, self.scale.pk, 'scale', '4.5'): [1, 4.5],
+            (self.form.pk, self.scale.pk, 'timestamps', ''): [2, 0.0],
+            (self.form.pk, self.scale.pk, 'answered', ''): [1, 0.0],
+            # Leerer Freitext zählt nicht
+            (self.form.pk, self.dropdown.pk, 'choice', 'RTW'): [1, 0.0],
+            (self.form.pk, self.dropdown.pk, 'answered', ''): [1, 0.0],
+        })
+
+    def test_create_update_delete(self):
+        first = self.create_response(options=[self.option_a], scale="4", choice="RTW", text="Notarzt nachgefordert")
+        second = self.create_response(options=[self.option_a, self.option_b], scale=2)
+        self.assertEqual(self.rollups(), {
+            (None, 'responses', ''): (2, 0.0),
+            (self.checkbox.pk, 'option', str(self.option_a.pk)): (2, 0.0),
+            (self.checkbox.pk, 'option', str(self.option_b.pk)): (1, 0.0),
+            (self.checkbox.pk, 'answered', ''): (2, 0.0),
+            (self.scale.pk, 'scale', '4'): (1, 4.0),
+            (self.scale.pk, 'scale', '2'): (1, 2.0),
+            (self.scale.pk, 'answered', ''): (2, 0.0),
+            (self.dropdown.pk, 'choice', 'RTW'): (1, 0.0),
+            (self.dropdown.pk, 'text', ''): (1, 0.0),
+            (self.dropdown.pk, 'answered', ''): (1, 0.0),
+        })
+
+        # Änderung: nur die Differenz zum vorherigen Stand wird verbucht
+        first.responses = {}
+        first.scale_values = {str(self.scale.pk): "2"}
+        first.picker_selections = {str(self.dropdown.pk): "NEF"}
+        first.save()
+        self.assertEqual(self.rollups(), {
+            (None, 'responses', ''): (2, 0.0),
+            (self.checkbox.pk, 'option', str(self.option_a.pk)): (1, 0.0),
+            (self.checkbox.pk, 'option', str(self.option_b.pk)): (1, 0.0),
+            (self.checkbox.pk, 'answered', ''): (1, 0.0),
+            (self.scale.pk, 'scale', '2'): (2, 4.0),
+            (self.scale.pk, 'answered', ''): (2, 0.0),
+            (self.dropdown.pk, 'choice', 'NEF'): (1, 0.0),
+            (self.dropdown.pk, 'answered', ''): (1, 0.0),
+        })
+
+        second.delete()
+        self.assertEqual(self.rollups(), {
+            (None, 'responses', ''): (1, 0.0),
+            (self.scale.pk, 'scale', '2'): (1, 2.0),
+            (self.scale.pk, 'answered', ''): (1, 0.0),
+            (self.dropdown.pk, 'choice', 'NEF'): (1, 0.0),
+            (self.dropdown.pk, 'answered', ''): (1, 0.0),
+        })
+        statistics = form_statistics(self.form.pk)
+        self.assertEqual(statistics['responses'], 1)
+        self.assertEqual(statistics['questions'][1]['scale']['average'], 2.0)
+
+    def test_layout_change_between_save_and_delete(self):
+        response = self.create_response(options=[self.option_a, self.option_b], choice="RTW", text="NEF nachgefordert")
+
+        # Option entfernt, Auswahlmenü mit Freitext wird zur Skala ohne Freitext
+        with self.captureOnCommitCallbacks(execute=True):
+            self.option_b.delete()
+            self.dropdown.option_type = 'scale'
+            self.dropdown.input_field_added = False
+            self.dropdown.save()
+        self.assertEqual(self.rollups(), {
+            (None, 'responses', ''): (1, 0.0),
+            (self.checkbox.pk, 'option', str(self.option_a.pk)): (1, 0.0),
+            (self.checkbox.pk, 'answered', ''): (1, 0.0),
+        })
+
+        response.delete()
+        self.assertEqual(self.rollups(), {})
+
+    def test_layout_rebuild_runs_once_per_change(self):
+        self.create_response(options=[self.option_a])
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.option_a.label = "Tourniquet"
+            self.option_a.save()
+            self.option_b.save()
+        # Zwei geplante Neuberechnungen, aber nur die erste rechnet tatsächlich neu
+        self.assertEqual([callback() for callback in callbacks], [True, False])
+        self.assertEqual(self.rollups()[(self.checkbox.pk, 'option', str(self.option_a.pk))], (1, 0.0))
+
+    def test_negative_delta_creates_no_rows(self):
+        apply_rollup_delta({(self.form.pk, self.scale.pk, 'scale', '3'): [1, 3.0]}, None)
+        self.assertFalse(QuestionRollup.objects.exists())
+
+
+# ------------------------------------------------
+# 12) EXPORT DER FORMULARANTWORTEN
+# ------------------------------------------------
+class FormExportTests(DUEBTestCase):
+
+    def test_file_name_header_with_special_characters(self):
+        form = Form.objects.create(name='Übung "Nord"; Teil\r\n2')
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("beobachter", password="x"))
+        for file_type in ("csv", "xlsx"):
+            with self.subTest(file_type=file_type):
+                response = client.get(f"/api/forms/{form.pk}/export-responses/", {"file_type": file_type})
+                self.assertEqual(response.status_code, 200)
+                disposition = response["Content-Disposition"]
+                self.assertTrue(disposition.startswith("attachment; filename*=utf-8''"), disposition)
+                self.assertIn("%C3%9Cbung_%22Nord%22%3B_Teil_2", disposition)
+                response.close()
+
+
+# ------------------------------------------------
+# 13) ZEITSTRAHL
+# ------------------------------------------------
+class TimelineTests(DUEBTestCase):
+    berlin = ZoneInfo("Europe/Berlin")
+
+    def setUp(self):
+        super().setUp()
+        self.form = Form.objects.create(name="Beobachtungsbogen")
+        self.question = Question.objects.create(form=self.form, question_text="Eintreffen NEF", option_type='none')
+        self.form_response = FormResponse.objects.create(
+            form=self.form,
+            observer_name="Anna",
+            responses={},
+            timestamps={str(self.question.pk): [
+                {"timestamp": "19.10.2026, 14:05", "note": "NEF da"},
+                {"timestamp": "kaputt"},
+            ]},
+            note_timestamps=[{"timestamp": "19.10.2026 14:20:30", "note": "Lage unklar"}],
+        )
+        self.victim_response = VictimProfileResponse.objects.create(
+            button_number="FW01", observer_name="Ben",
+            verlauf=[{"uhrzeit": "14:10", "khBereich": "Schockraum", "beobachtungen": "Übergabe"}],
+        )
+        # Reine Uhrzeiten gelten für den (lokalen) Tag der Erstellung: 19.10.2026, 00:30 in Berlin
+        VictimProfileResponse.objects.filter(pk=self.victim_response.pk).update(
+            erstellt_am=datetime(2026, 10, 18, 22, 30, tzinfo=dt_timezone.utc)
+        )
+        self.victim_response.refresh_from_db()
+        self.victim_response.save()
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("beobachter", password="x"))
+
+    def timeline(self, **params):
+        response = self.client.get("/api/timeline/", params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_parse_event_time(self):
+        expected = datetime(2026, 10, 19, 14, 5, tzinfo=self.berlin)
+        for value in ("19.10.2026, 14:05", "19.10.2026 14:05", "19.10.2026, 14:05:00", "19.10.2026 14:05:00",
+                      "2026-10-19T14:05:00", "2026-10-19T12:05:00+00:00"):
+            with self.subTest(value=value):
+                self.assertEqual(parse_event_time(value), expected)
+
+        reference = datetime(2026, 10, 18, 22, 30, tzinfo=dt_timezone.utc)
+        for value in ("14:05", "14:05:00", "14.05"):
+            with self.subTest(value=value):
+                self.assertEqual(parse_event_time(value, reference), expected)
+
+        for value in ("", None, "14:05", "gestern", "2026-13-40T25:00"):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_event_time(value))
+
+    def test_mixed_timeline(self):
+        events = self.timeline()
+        self.assertEqual(
+            [(e['source'], e['raw_time'], e['observer'], e['note']) for e in events],
+            [
+                ('question', "19.10.2026, 14:05", "Anna", "NEF da"),
+                ('verlauf', "14:10", "Ben", "Übergabe"),
+                ('note', "19.10.2026 14:20:30", "Anna", "Lage unklar"),
+            ],
+        )
+        self.assertEqual(events[0]['question_text'], "Eintreffen NEF")
+        self.assertEqual(events[0]['form_name'], "Beobachtungsbogen")
+        self.assertEqual((events[1]['button_number'], events[1]['area']), ("FW01", "Schockraum"))
+
+        self.assertEqual([e['source'] for e in self.timeline(source="verlauf,note")], ['verlauf', 'note'])
+        self.assertEqual([e['source'] for e in self.timeline(button="FW01")], ['verlauf'])
+        self.assertEqual([e['source'] for e in self.timeline(form=self.form.pk)], ['question', 'note'])
+
+    def test_range_is_half_open(self):
+        events = self.timeline(start="19.10.2026, 14:05", end="19.10.2026, 14:10")
+        self.assertEqual([e['raw_time'] for e in events], ["19.10.2026, 14:05"])
+        events = self.timeline(start="2026-10-19T14:06:00+02:00")
+        self.assertEqual([e['source'] for e in events], ['verlauf', 'note'])
+
+    def test_invalid_parameters(self):
+        for params in ({"start": "gestern"}, {"end": "25:99"}, {"source": "question,foto"}, {"form": "eins"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get("/api/timeline/", params).status_code, 400)
+
+    def test_sync_on_change_and_delete(self):
+        self.form_response.timestamps = {}
+        self.form_response.save()
+        self.assertEqual(
+            list(TimelineEvent.objects.filter(form_response=self.form_response).values_list('source', flat=True)),
+            ['note'],
+        )
+        self.victim_response.delete()
+        self.assertEqual(TimelineEvent.objects.filter(source='verlauf').count(), 0)
+
+    def test_backfill(self):
+        expected = sorted(TimelineEvent.objects.values_list('source', 'occurred_at', 'position'))
+        TimelineEvent.objects.all().delete()
+        self.assertEqual(backfill_timeline_events(), 3)
+        self.assertEqual(sorted(TimelineEvent.objects.values_list('source', 'occurred_at', 'position')), expected)
+
+
+# ------------------------------------------------
+# 14) SOLL-SICHTUNG ÜBER DIE BUTTON-NUMMER
+# ------------------------------------------------
+class AssignmentByButtonTests(DUEBTestCase):
+
+    def test_same_button_in_two_scenarios_uses_newest_scenario(self):
+        fire = Organization.objects.create(name="Feuerwehr", short_code="FW")
+        rescue = Organization.objects.create(name="Rettungsdienst", short_code="RD")
+        old_scenario = TestScenario.objects.create(name="Übung 2025")
+        new_scenario = TestScenario.objects.create(name="Übung 2026")
+        # Die Zuweisung im neueren Szenario wird zuerst angelegt (niedrigere ID)
+        for scenario, organization, category in ((new_scenario, rescue, "SK 2"), (old_scenario, fire, "SK 3")):
+            TestScenarioVictim.objects.create(
+                scenario=scenario, organization=organization, sequential_number=1, button_number="B01",
+                victim_profile=VictimProfile.objects.create(profile_number=category, category=category),
+            )
+        VictimProfileResponse.objects.create(button_number="B01", ist_sichtung="SK 1")
+
+        assignments = load_assignments_by_button()
+        self.assertEqual(assignments["B01"].scenario_id, new_scenario.pk)
+        (row, soll, ist), = iter_report_rows(assignments)
+        self.assertEqual((row[1], soll, ist), ("Rettungsdienst", "SK 2", "SK 1"))
+
+        analytics = compute_triage_analytics()
+        self.assertEqual([item['short_code'] for item in analytics['organizations']], ["RD"])
+
+
+# ------------------------------------------------
+# 15) FORMULAR-LAYOUT (CACHE)
+# ------------------------------------------------
+class FormLayoutCacheTests(DUEBTestCase):
+
+    def test_saving_question_or_option_invalidates_layout(self):
+        form = Form.objects.create(name="Beobachtungsbogen")
+        question = Question.objects.create(form=form, question_text="Maßnahmen", option_type='checkbox')
+        key = FORM_LAYOUT_CACHE_KEY.format(form_id=form.pk)
+
+        self.assertEqual([q['text'] for q in get_form_layout(form.pk)], ["Maßnahmen"])
+        self.assertIsNotNone(cache.get(key))
+        with self.assertNumQueries(0):
+            get_form_layout(form.pk)
+
+        question.question_text = "Durchgeführte Maßnahmen"
+        question.save()
+        self.assertIsNone(cache.get(key))
+        self.assertEqual([q['text'] for q in get_form_layout(form.pk)], ["Durchgeführte Maßnahmen"])
+
+        option = Option.objects.create(question=question, label="Abbinden")
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(get_form_layout(form.pk)[0]['options'], [(option.pk, "Abbinden")])
+
+
+# ------------------------------------------------
+# 16) PATIENTENBEGLEITBÖGEN (E-MAIL-BERICHT)
+# ------------------------------------------------
+class VictimProfileSheetTests(DUEBTestCase):
+
+    def create_response(self, button_number, created, **fields):
+        response = VictimProfileResponse.objects.create(button_number=button_number, **fields)
+        VictimProfileResponse.objects.filter(pk=response.pk).update(erstellt_am=created)
+        return response
+
+    def test_latest_responses_by_button(self):
+        morning = datetime(2026, 10, 19, 8, 0, tzinfo=dt_timezone.utc)
+        noon = datetime(2026, 10, 19, 12, 0, tzinfo=dt_timezone.utc)
+        self.create_response("FW01", noon, ist_sichtung="SK 2")
+        self.create_response("FW01", morning, ist_sichtung="SK 3")
+        self.create_response("RD01", morning, ist_sichtung="SK 1")
+        # Gleicher Zeitpunkt: die später angelegte Antwort (höhere ID) gilt
+        newest_rd = self.create_response("RD01", morning, ist_sichtung="SK 4")
+        self.create_response("XX01", noon, ist_sichtung="SK 1")
+
+        with self.assertNumQueries(1):
+            latest = latest_responses_by_button(["FW01", "RD01", "FW02", "", None])
+        self.assertEqual(
+            {button: response.ist_sichtung for button, response in latest.items()},
+            {"FW01": "SK 2", "RD01": "SK 4"},
+        )
+        self.assertEqual(latest["RD01"].pk, newest_rd.pk)
+        self.assertEqual(latest_responses_by_button([""]), {})
+
+    def test_sheet_response_from_frontend_data(self):
+        response = SheetResponse.from_dict({
+            'ist_sichtung': "SK 1", 'verlaufseintraege': [{'uhrzeit': "14:05"}], 'unbekannt': 1,
+        })
+        self.assertEqual(response.ist_sichtung, "SK 1")
+        self.assertEqual(response.verlauf, [{'uhrzeit': "14:05"}])
+        self.assertIsNone(response.op_team)
 
-# Create your tests here.
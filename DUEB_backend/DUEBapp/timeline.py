@@ -0,0 +1,257 @@
+# timeline.py - Normalisierte Zeitstempel (Ereignisse) für die Zeitverlaufsanalyse
+#
+# Zeitstempel liegen in den Antworten als verschachtelte JSON-Listen vor:
+#   - FormResponse.timestamps       {Frage-ID: [{"timestamp": "19.10.2026, 14:05", "note": ...}]}
+#   - FormResponse.note_timestamps  [{"timestamp": ..., "note": ...}]
+#   - VictimProfileResponse.verlauf [{"uhrzeit": "14:05", "khBereich": ..., "beobachtungen": ...}]
+# Beim Speichern einer Antwort werden diese Einträge als TimelineEvent-Zeilen abgelegt
+# (siehe signals.py). Zeitraumabfragen laufen dann über den Index auf occurred_at, und der
+# zusammengeführte Zeitstrahl wird als JSON gestreamt.
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import FormResponse, VictimProfileResponse, TimelineEvent
+from .email_and_excel import get_form_layout
+
+# Anzahl der Zeilen, die pro Datenbankabfrage geladen bzw. geschrieben werden
+TIMELINE_CHUNK_SIZE = 1000
+
+# Formate der Zeitstempel aus der App (toLocaleString 'de-DE')
+DATETIME_FORMATS = ('%d.%m.%Y, %H:%M', '%d.%m.%Y %H:%M', '%d.%m.%Y, %H:%M:%S', '%d.%m.%Y %H:%M:%S')
+# Formate der Uhrzeiten in den Verlaufseinträgen (Datum = Erstellungsdatum der Antwort)
+TIME_FORMATS = ('%H:%M', '%H:%M:%S', '%H.%M')
+
+# Felder je Ereignis im gestreamten Zeitstrahl
+TIMELINE_FIELDS = (
+    'id', 'source', 'occurred_at', 'raw_time',
+    'form_response_id', 'form_id', 'form_name', 'question_id', 'question_text',
+    'victim_response_id', 'button_number', 'observer', 'area', 'note',
+)
+
+
+# --------------------------------------------------
+# 1) ZEITANGABEN AUSWERTEN
+# --------------------------------------------------
+def _local_zone():
+    """Zeitzone, in der die Geräte ihre Zeitstempel erfassen"""
+    return ZoneInfo(settings.TIMELINE_TIME_ZONE)
+
+
+def parse_event_time(value, reference=None):
+    """
+    Wandelt eine Zeitangabe aus der App in einen zeitzonenbewussten Zeitpunkt um.
+
+    Vollständige Angaben ("19.10.2026, 14:05" oder ISO 8601) werden direkt ausgewertet.
+    Reine Uhrzeiten ("14:05") werden mit dem lokalen Datum von reference kombiniert.
+    Gibt None zurück, wenn die Angabe nicht auswertbar ist.
+    """
+    text = str(value or "").strip()
+    if not text:
+        return None
+    zone = _local_zone()
+
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).replace(tzinfo=zone)
+        except ValueError:
+            pass
+
+    if reference is not None:
+        day = timezone.localtime(reference, zone).date()
+        for fmt in TIME_FORMATS:
+            try:
+                return datetime.combine(day, datetime.strptime(text, fmt).time(), tzinfo=zone)
+            except ValueError:
+                pass
+
+    try:
+        parsed = parse_datetime(text)
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=zone)
+    return parsed
+
+
+# --------------------------------------------------
+# 2) EREIGNISSE AUS DEN ANTWORTEN
+# --------------------------------------------------
+def form_response_events(form_response, question_ids=None):
+    """
+    Erzeugt (ungespeicherte) TimelineEvent-Objekte aus einer FormResponse. Bei vielen
+    Antworten desselben Formulars können die Fragen-IDs einmalig übergeben werden.
+    """
+    if question_ids is None:
+        question_ids = {question['id'] for question in get_form_layout(form_response.form_id)}
+    events = []
+
+    for qid, entries in (form_response.timestamps or {}).items():
+        try:
+            question_id = int(qid)
+        except (TypeError, ValueError):
+            question_id = None
+        if question_id not in question_ids:
+            question_id = None
+        for position, entry in enumerate(entries or []):
+            if not isinstance(entry, dict):
+                continue
+            occurred_at = parse_event_time(entry.get('timestamp'))
+            if occurred_at is None:
+                continue
+            events.append(TimelineEvent(
+                source='question',
+                form_response_id=form_response.pk,
+                question_id=question_id,
+                occurred_at=occurred_at,
+                raw_time=str(entry.get('timestamp'))[:50],
+                note=entry.get('note') or '',
+                position=position,
+            ))
+
+    for position, entry in enumerate(form_response.note_timestamps or []):
+        if not isinstance(entry, dict):
+            continue
+        occurred_at = parse_event_time(entry.get('timestamp'))
+        if occurred_at is None:
+            continue
+        events.append(TimelineEvent(
+            source='note',
+            form_response_id=form_response.pk,
+            occurred_at=occurred_at,
+            raw_time=str(entry.get('timestamp'))[:50],
+            note=entry.get('note') or '',
+            position=position,
+        ))
+    return events
+
+
+def victim_response_events(victim_response):
+    """Erzeugt (ungespeicherte) TimelineEvent-Objekte aus den Verlaufseinträgen"""
+    reference = victim_response.erstellt_am or timezone.now()
+    events = []
+    for position, entry in enumerate(victim_response.verlauf or []):
+        if not isinstance(entry, dict):
+            continue
+        occurred_at = parse_event_time(entry.get('uhrzeit'), reference)
+        if occurred_at is None:
+            continue
+        events.append(TimelineEvent(
+            source='verlauf',
+            victim_response_id=victim_response.pk,
+            button_number=victim_response.button_number or '',
+            occurred_at=occurred_at,
+            raw_time=str(entry.get('uhrzeit'))[:50],
+            area=str(entry.get('khBereich') or '')[:255],
+            note=entry.get('beobachtungen') or '',
+            position=position,
+        ))
+    return events
+
+
+def sync_form_response_events(form_response):
+    """Ersetzt die gespeicherten Ereignisse einer FormResponse durch den aktuellen Stand"""
+    with transaction.atomic():
+        TimelineEvent.objects.filter(form_response_id=form_response.pk).delete()
+        TimelineEvent.objects.bulk_create(form_response_events(form_response))
+
+
+def sync_victim_response_events(victim_response):
+    """Ersetzt die gespeicherten Ereignisse einer VictimProfileResponse durch den aktuellen Stand"""
+    with transaction.atomic():
+        TimelineEvent.objects.filter(victim_response_id=victim_response.pk).delete()
+        TimelineEvent.objects.bulk_create(victim_response_events(victim_response))
+
+
+def backfill_timeline_events():
+    """
+    Baut die Ereignistabelle aus allen vorhandenen Antworten neu auf.
+
+    Returns:
+        int: Anzahl der angelegten Ereignisse
+    """
+    created = 0
+    with transaction.atomic():
+        TimelineEvent.objects.all().delete()
+
+        sources = [
+            (
+                FormResponse.objects.order_by('id')
+                .only('id', 'form_id', 'timestamps', 'note_timestamps'),
+                form_response_events,
+            ),
+            (
+                VictimProfileResponse.objects.order_by('id')
+                .only('id', 'button_number', 'verlauf', 'erstellt_am'),
+                victim_response_events,
+            ),
+        ]
+        for queryset, extract in sources:
+            batch = []
+            for obj in queryset.iterator(chunk_size=TIMELINE_CHUNK_SIZE):
+                batch.extend(extract(obj))
+                if len(batch) >= TIMELINE_CHUNK_SIZE:
+                    TimelineEvent.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            TimelineEvent.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+# --------------------------------------------------
+# 3) ZEITSTRAHL ABFRAGEN
+# --------------------------------------------------
+def timeline_queryset(start=None, end=None, sources=None, button_number=None, form_id=None):
+    """
+    Liefert die Ereignisse im Zeitraum [start, end) chronologisch sortiert als
+    values()-QuerySet mit den Feldern aus TIMELINE_FIELDS.
+    """
+    queryset = TimelineEvent.objects.all()
+    if start is not None:
+        queryset = queryset.filter(occurred_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(occurred_at__lt=end)
+    if sources:
+        queryset = queryset.filter(source__in=sources)
+    if button_number:
+        queryset = queryset.filter(button_number=button_number)
+    if form_id is not None:
+        queryset = queryset.filter(form_response__form_id=form_id)
+
+    return (
+        queryset
+        .order_by('occurred_at', 'id')
+        .annotate(
+            form_id=F('form_response__form_id'),
+            form_name=F('form_response__form__name'),
+            question_text=F('question__question_text'),
+            observer=Coalesce('form_response__observer_name', 'victim_response__observer_name'),
+        )
+        .values(*TIMELINE_FIELDS)
+    )
+
+
+def stream_timeline_response(queryset):
+    """
+    Gibt den Zeitstrahl als gestreamtes JSON-Array aus, ohne alle Ereignisse
+    gleichzeitig im Speicher zu halten.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+    def content():
+        yield '['
+        for idx, event in enumerate(queryset.iterator(chunk_size=TIMELINE_CHUNK_SIZE)):
+            yield (',' if idx else '') + encoder.encode(event)
+        yield ']'
+
+    return StreamingHttpResponse(content(), content_type='application/json; charset=utf-8')
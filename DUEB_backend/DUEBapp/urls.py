@@ -20,7 +20,10 @@ from .views import (
     CustomAuthToken,
     ObserverAccountViewSet,
     SendVictimProfilesView,  # bereits vorhanden
-    VictimProfileResponseViewSet  # NEUER View zum Speichern aller VictimProfileDetailScreen-Daten
+    VictimProfileResponseViewSet,  # NEUER View zum Speichern aller VictimProfileDetailScreen-Daten
+    ReportDownloadView,
+    TriageAnalyticsView,
+    TimelineView,
 )
 
 # -------------------------------
@@ -53,6 +56,15 @@ urlpatterns = [
     
     # Neuer Endpunkt zum Senden der VictimProfileResponse-Daten per E-Mail (wie bisher)
     path('send-victimprofiles/', SendVictimProfilesView.as_view(), name='send-victimprofiles'),
+
+    # Direkter Download gespeicherter Berichte (Token oder signierter Link)
+    path('reports/<str:key>/', ReportDownloadView.as_view(), name='report-download'),
+
+    # Auswertung der Sichtungsgenauigkeit (SOLL- gegenüber IST-Sichtung)
+    path('analytics/triage/', TriageAnalyticsView.as_view(), name='analytics-triage'),
+
+    # Chronologischer Zeitstrahl aller Zeitstempel (Zeitraumabfrage, gestreamt)
+    path('timeline/', TimelineView.as_view(), name='timeline'),
     
     # Einbindung aller durch den Router generierten URLs
     path('', include(router.urls)),
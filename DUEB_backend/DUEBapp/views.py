@@ -3,6 +3,8 @@
 # der DÜB-Anwendung (Digitale Übungsbeobachtung) bereitstellen. Die Views verarbeiten 
 # HTTP-Anfragen, führen Geschäftslogik aus und geben Antworten an Clients zurück.
 
+import hmac
+import logging
 from rest_framework import viewsets, status, filters
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
@@ -10,20 +12,20 @@ from rest_framework.response import Response
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from rest_framework.views import APIView
-from django.db.models import Max
+from django.db.models import Max, Q
 from django.core.exceptions import ValidationError
 from datetime import datetime  # Fehlender Import
 from django.conf import settings  # Fehlender Import für settings.DEBUG
 from django.db import transaction
-
-import copy  # <-- WICHTIG für das Klonen von Profilobjekten
+from django.http import HttpResponse
 
 from .models import (
     Form, Question, Option, FormResponse,
     Contact, HomeScreenImage,
     VictimProfile, ExcelUpload,
     Organization, TestScenario, TestScenarioVictim,
-    ObserverAccount, VictimProfileResponse  # NEU: Import des neuen Modells
+    ObserverAccount, VictimProfileResponse,  # NEU: Import des neuen Modells
+    TimelineEvent,
 )
 from .serializers import (
     FormSerializer, QuestionSerializer, OptionSerializer, FormResponseSerializer,
@@ -34,7 +36,16 @@ from .serializers import (
     VictimProfileResponseSerializer  # NEU: Import des neuen Serializers
 )
 from .email_and_excel import send_confirmation_email
-from .email_and_excel_victimprofiles import send_victimprofiles_email
+from .email_and_excel_victimprofiles import send_victimprofiles_email, PatientSheet
+from .export_formresponses import stream_csv_response, xlsx_file_response
+from .report_store import get_report, serve_report, check_signature, report_download_path
+from .analytics import get_triage_analytics
+from .rollups import form_statistics
+from .timeline import parse_event_time, timeline_queryset, stream_timeline_response
+from .write_queue import WriteQueuePending, WriteQueueTimeout, submit_create, submit_write
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
+
+logger = logging.getLogger(__name__)
 
 
 # -------------------------------
@@ -60,6 +71,31 @@ class FormViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(name=name)
         return queryset
 
+    @action(detail=True, methods=['get'], url_path='export-responses')
+    def export_responses(self, request, pk=None):
+        """
+        Exportiert alle Antworten des Formulars als eine Tabelle
+        (eine Zeile pro Antwort, eine Spalte pro Frage/Option).
+        Über ?file_type=xlsx wird eine Excel-Datei statt CSV geliefert.
+        """
+        form = self.get_object()
+        file_type = request.query_params.get('file_type', 'csv').lower()
+        if file_type == 'csv':
+            return stream_csv_response(form)
+        if file_type == 'xlsx':
+            return xlsx_file_response(form)
+        return Response({"error": "file_type muss 'csv' oder 'xlsx' sein."}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['get'])
+    def statistics(self, request, pk=None):
+        """
+        Gibt die Statistik des Formulars je Frage zurück (Anzahl Antworten,
+        Häufigkeiten der Optionen, Skalen-Durchschnitt und -Verteilung).
+        Die Werte stammen aus den vorberechneten Kennzahlen (QuestionRollup).
+        """
+        form = self.get_object()
+        return Response(form_statistics(form.id))
+
 
 class QuestionViewSet(viewsets.ModelViewSet):
     """
@@ -122,13 +158,15 @@ class FormResponseViewSet(viewsets.ModelViewSet):
             # Neuer Code: Name/Email aus Request nehmen, fallback "Beobachter"/"unknown@observer"
             name = self.request.data.get("observer_name") or "Beobachter"
             email = self.request.data.get("observer_email") or "unknown@observer"
-            form_response = serializer.save(
+            form_response = submit_create(
+                serializer,
                 observer_name=name,
                 observer_email=email
             )
         else:
             user = self.request.user
-            form_response = serializer.save(
+            form_response = submit_create(
+                serializer,
                 observer_name=user.get_full_name() or user.username,
                 observer_email=user.email
             )
@@ -158,18 +196,19 @@ class FormResponseViewSet(viewsets.ModelViewSet):
 class CustomAuthToken(ObtainAuthToken):
     """
     Angepasste Authentifizierungsklasse für die Token-Authentifizierung.
-    Erweitert die Standardimplementierung mit zusätzlichen Debugging-Informationen.
+    Erweitert die Standardimplementierung um Benutzer-ID und E-Mail in der Antwort.
     """
     def post(self, request, *args, **kwargs):
         """
         Verarbeitet POST-Anfragen zur Token-Authentifizierung und gibt den Token zurück.
         """
-        print("[DEBUG] CustomAuthToken: Login attempt for user:", request.data.get("username"))
+        logger.debug("Anmeldeversuch für Benutzer %s", request.data.get("username"))
         serializer = self.serializer_class(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data["user"]
         token, created = Token.objects.get_or_create(user=user)
-        print("[DEBUG] CustomAuthToken: Token generated:", token.key)
+        # Das Token selbst wird nicht geloggt
+        logger.info("Token %s für Benutzer %s", "erzeugt" if created else "ausgegeben", user.pk)
         return Response({"token": token.key, "user_id": user.pk, "email": user.email})
 
 
@@ -187,11 +226,23 @@ class HomeScreenImageViewSet(viewsets.ModelViewSet):
     """
     ViewSet für die Verwaltung von Startbildschirm-Bildern.
     Ermöglicht CRUD-Operationen auf HomeScreenImage-Objekte mit Authentifizierung.
+
+    Mit ?organization=<Kürzel> werden nur die Übersichten dieser Organisation sowie
+    allgemeine Bilder (keine Szenario-Übersicht) geliefert.
     """
     queryset = HomeScreenImage.objects.all()
     serializer_class = HomeScreenImageSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        short_code = self.request.query_params.get('organization')
+        if short_code:
+            queryset = queryset.filter(
+                Q(organization__short_code__iexact=short_code) | Q(organization__isnull=True, scenario__isnull=True)
+            )
+        return queryset
+
 
 # -------------------------------
 # 3) PATIENTENPROFILE + EXCEL
@@ -223,9 +274,8 @@ class VictimProfileViewSet(viewsets.ModelViewSet):
         spezielle Leserechte zu gewähren.
         """
         auth = self.request.META.get('HTTP_AUTHORIZATION', '')
-        print("[DEBUG] VictimProfileViewSet: method =", self.request.method, "Auth Header:", auth)
         if self.request.method == 'GET' and auth == 'Token observer':
-            print("[DEBUG] VictimProfileViewSet: GET request with observer token detected, allowing access.")
+            logger.debug("VictimProfileViewSet: Lesezugriff mit Observer-Token")
             return []
         return super().get_permissions()
 
@@ -373,9 +423,8 @@ class TestScenarioVictimViewSet(viewsets.ModelViewSet):
         spezielle Leserechte zu gewähren.
         """
         auth = self.request.META.get('HTTP_AUTHORIZATION', '')
-        print("[DEBUG] TestScenarioVictimViewSet: method =", self.request.method, "Auth Header:", auth)
         if self.request.method == 'GET' and auth.strip() == 'Token observer':
-            print("[DEBUG] TestScenarioVictimViewSet: GET request with observer token detected, allowing access.")
+            logger.debug("TestScenarioVictimViewSet: Lesezugriff mit Observer-Token")
             return []
         return super().get_permissions()
 
@@ -493,8 +542,7 @@ class SendVictimProfilesView(APIView):
             except:
                 return ""
 
-        profiles_for_email = []
-        created_responses = []
+        stored_report = None
 
         try:
             victim_profile_ids = [entry.get('victimProfileId') for entry in profile_mapping]
@@ -507,117 +555,125 @@ class SendVictimProfilesView(APIView):
                     'requested_ids': victim_profile_ids
                 }, status=status.HTTP_404_NOT_FOUND)
 
-            print(f"[INFO] Speichere {len(profile_mapping)} Profile für {observer_account.first_name} {observer_account.last_name}")
-
-            with transaction.atomic():
-                for idx, entry in enumerate(profile_mapping):
-                    victim_profile_id = entry.get('victimProfileId')
-                    button_number = entry.get('buttonNumber', '')
-                    vp = profile_dict.get(str(victim_profile_id))
-
-                    if not vp:
-                        print(f"[WARNING] Profil mit ID {victim_profile_id} nicht gefunden, überspringe.")
-                        continue
-
-                    print(f"[DEBUG] Verarbeite Profil: {victim_profile_id}, Button: {button_number}")
-
-                    # ob wir passendes profile_data haben
-                    complete_profile = None
-                    if profile_data and idx < len(profile_data):
-                        complete_profile = profile_data[idx]
-
-                    if complete_profile:
-                        diagnostic_loaded = complete_profile.get('diagnostic_loaded', {})
-                        if not diagnostic_loaded:
-                            diagnostic_loaded = {
-                                "diagnosis": dval(vp.diagnosis),
-                                "visual": dval(vp.visual_diagnosis),
-                                "findings": dval(vp.findings),
-                                "symptoms": dval(vp.symptoms),
-                            }
+            logger.info(
+                "Speichere %s Profile für %s %s",
+                len(profile_mapping), observer_account.first_name, observer_account.last_name,
+            )
+
+            def save_responses():
+                """Speichert alle Patientenbegleitbögen in einer Transaktion (über die Schreibwarteschlange)"""
+                created = []
+                sheets = []
+                with transaction.atomic():
+                    for idx, entry in enumerate(profile_mapping):
+                        victim_profile_id = entry.get('victimProfileId')
+                        button_number = entry.get('buttonNumber', '')
+                        vp = profile_dict.get(str(victim_profile_id))
+
+                        if not vp:
+                            logger.warning("Profil mit ID %s nicht gefunden, überspringe.", victim_profile_id)
+                            continue
+
+                        logger.debug("Verarbeite Profil: %s, Button: %s", victim_profile_id, button_number)
+
+                        # ob wir passendes profile_data haben
+                        complete_profile = None
+                        if profile_data and idx < len(profile_data):
+                            complete_profile = profile_data[idx]
+
+                        if complete_profile:
+                            diagnostic_loaded = complete_profile.get('diagnostic_loaded', {})
+                            if not diagnostic_loaded:
+                                diagnostic_loaded = {
+                                    "diagnosis": dval(vp.diagnosis),
+                                    "visual": dval(vp.visual_diagnosis),
+                                    "findings": dval(vp.findings),
+                                    "symptoms": dval(vp.symptoms),
+                                }
                             
-                        vitalwerte = complete_profile.get('vitalwerte', {})
-                        if not vitalwerte:
-                            vitalwerte = {
-                                "gcs": dval(vp.gcs),
-                                "spo2": dval(vp.spo2),
-                                "rekap": dval(vp.rekap),
-                                "resp_rate": dval(vp.resp_rate),
-                                "sys_rr": dval(vp.sys_rr),
-                                "ekg": dval(vp.ekg_monitor),
-                                "hb": dval(vp.hb_value),
-                            }
+                            vitalwerte = complete_profile.get('vitalwerte', {})
+                            if not vitalwerte:
+                                vitalwerte = {
+                                    "gcs": dval(vp.gcs),
+                                    "spo2": dval(vp.spo2),
+                                    "rekap": dval(vp.rekap),
+                                    "resp_rate": dval(vp.resp_rate),
+                                    "sys_rr": dval(vp.sys_rr),
+                                    "ekg": dval(vp.ekg_monitor),
+                                    "hb": dval(vp.hb_value),
+                                }
                         
-                        resp_obj = VictimProfileResponse.objects.create(
-                            button_number=button_number,
-                            kh_intern=complete_profile.get('kh_intern', ''),
-                            soll_sichtung=dval(vp.category),
-                            diagnostic_loaded=diagnostic_loaded,
-                            vitalwerte=vitalwerte,
-                            ist_sichtung=complete_profile.get('ist_sichtung', ''),
-                            sichtung_data=complete_profile.get('sichtung_data', []),
-                            diagnostik_data=complete_profile.get('diagnostik_data', []),
-                            therapie_data=complete_profile.get('therapie_data', []),
-                            op_team=complete_profile.get('op_team', []),
-                            verlauf=complete_profile.get('verlaufseintraege', []),
-                            observer_name=complete_profile.get('observer_name', dval(f"{observer_account.first_name} {observer_account.last_name}".strip())),
-                            observer_email=complete_profile.get('observer_email', dval(observer_account.email)),
-                        )
-                        created_responses.append(resp_obj)
-                    else:
-                        # fallback
-                        resp_obj = VictimProfileResponse.objects.create(
-                            button_number=button_number,
-                            kh_intern="",
-                            soll_sichtung=dval(vp.category),
-                            diagnostic_loaded={
-                                "diagnosis": dval(vp.diagnosis),
-                                "visual": dval(vp.visual_diagnosis),
-                                "findings": dval(vp.findings),
-                                "symptoms": dval(vp.symptoms),
-                            },
-                            vitalwerte={
-                                "gcs": dval(vp.gcs),
-                                "spo2": dval(vp.spo2),
-                                "rekap": dval(vp.rekap),
-                                "resp_rate": dval(vp.resp_rate),
-                                "sys_rr": dval(vp.sys_rr),
-                                "ekg": dval(vp.ekg_monitor),
-                                "hb": dval(vp.hb_value),
-                            },
-                            ist_sichtung="",
-                            sichtung_data={
-                                "pcz_ivena": dval(vp.pcz_ivena),
-                                "expected_med_action": dval(vp.expected_med_action),
-                            },
-                            diagnostik_data={
-                                "ro_thorax": dval(vp.ro_thorax),
-                                "fast_sono": dval(vp.fast_sono),
-                                "e_fast": dval(vp.e_fast),
-                                "radiology_finds": dval(vp.radiology_finds),
-                            },
-                            therapie_data={
-                                "emergency_op": dval(vp.emergency_op),
-                                "op_sieve_special": dval(vp.op_sieve_special),
-                                "op_sieve_basic": dval(vp.op_sieve_basic),
-                                "personal_resources": dval(vp.personal_resources),
-                                "anesthesia_team": dval(vp.anesthesia_team),
-                                "radiology_resources": dval(vp.radiology_resources),
-                                "op_achi_res": dval(vp.op_achi_res),
-                                "op_uchi_res": dval(vp.op_uchi_res),
-                                "op_nchi_res": dval(vp.op_nchi_res),
-                            },
-                            op_team=[],
-                            verlauf=[],
-                            observer_name=dval(f"{observer_account.first_name} {observer_account.last_name}".strip()),
-                            observer_email=dval(observer_account.email),
-                        )
-                        created_responses.append(resp_obj)
-
-                    # E-Mail-Versand: Klon anlegen
-                    cloned_vp = copy.copy(vp)
-                    setattr(cloned_vp, '_button_number', button_number)
-                    profiles_for_email.append(cloned_vp)
+                            resp_obj = VictimProfileResponse.objects.create(
+                                button_number=button_number,
+                                kh_intern=complete_profile.get('kh_intern', ''),
+                                soll_sichtung=dval(vp.category),
+                                diagnostic_loaded=diagnostic_loaded,
+                                vitalwerte=vitalwerte,
+                                ist_sichtung=complete_profile.get('ist_sichtung', ''),
+                                sichtung_data=complete_profile.get('sichtung_data', []),
+                                diagnostik_data=complete_profile.get('diagnostik_data', []),
+                                therapie_data=complete_profile.get('therapie_data', []),
+                                op_team=complete_profile.get('op_team', []),
+                                verlauf=complete_profile.get('verlaufseintraege', []),
+                                observer_name=complete_profile.get('observer_name', dval(f"{observer_account.first_name} {observer_account.last_name}".strip())),
+                                observer_email=complete_profile.get('observer_email', dval(observer_account.email)),
+                            )
+                            created.append(resp_obj)
+                        else:
+                            # fallback
+                            resp_obj = VictimProfileResponse.objects.create(
+                                button_number=button_number,
+                                kh_intern="",
+                                soll_sichtung=dval(vp.category),
+                                diagnostic_loaded={
+                                    "diagnosis": dval(vp.diagnosis),
+                                    "visual": dval(vp.visual_diagnosis),
+                                    "findings": dval(vp.findings),
+                                    "symptoms": dval(vp.symptoms),
+                                },
+                                vitalwerte={
+                                    "gcs": dval(vp.gcs),
+                                    "spo2": dval(vp.spo2),
+                                    "rekap": dval(vp.rekap),
+                                    "resp_rate": dval(vp.resp_rate),
+                                    "sys_rr": dval(vp.sys_rr),
+                                    "ekg": dval(vp.ekg_monitor),
+                                    "hb": dval(vp.hb_value),
+                                },
+                                ist_sichtung="",
+                                sichtung_data={
+                                    "pcz_ivena": dval(vp.pcz_ivena),
+                                    "expected_med_action": dval(vp.expected_med_action),
+                                },
+                                diagnostik_data={
+                                    "ro_thorax": dval(vp.ro_thorax),
+                                    "fast_sono": dval(vp.fast_sono),
+                                    "e_fast": dval(vp.e_fast),
+                                    "radiology_finds": dval(vp.radiology_finds),
+                                },
+                                therapie_data={
+                                    "emergency_op": dval(vp.emergency_op),
+                                    "op_sieve_special": dval(vp.op_sieve_special),
+                                    "op_sieve_basic": dval(vp.op_sieve_basic),
+                                    "personal_resources": dval(vp.personal_resources),
+                                    "anesthesia_team": dval(vp.anesthesia_team),
+                                    "radiology_resources": dval(vp.radiology_resources),
+                                    "op_achi_res": dval(vp.op_achi_res),
+                                    "op_uchi_res": dval(vp.op_uchi_res),
+                                    "op_nchi_res": dval(vp.op_nchi_res),
+                                },
+                                op_team=[],
+                                verlauf=[],
+                                observer_name=dval(f"{observer_account.first_name} {observer_account.last_name}".strip()),
+                                observer_email=dval(observer_account.email),
+                            )
+                            created.append(resp_obj)
+
+                        # E-Mail-Versand: Profil mit Button-Nummer vormerken
+                        sheets.append(PatientSheet(vp, button_number))
+                return created, sheets
+
+            created_responses, profiles_for_email = submit_write(save_responses)
 
             # E-Mail
             email_success = False
@@ -626,22 +682,22 @@ class SendVictimProfilesView(APIView):
             if profiles_for_email:
                 try:
                     if observer_account.email and observer_account.email != "unknown@observer":
-                        print(f"[DEBUG] Starte E-Mail-Versand an {observer_account.email} für {len(profiles_for_email)} Profile")
-                        print(f"[DEBUG] SMTP-Konfiguration: HOST={settings.EMAIL_HOST}, PORT={settings.EMAIL_PORT}, TLS={settings.EMAIL_USE_TLS}")
+                        logger.debug(
+                            "Starte E-Mail-Versand an %s für %s Profile (SMTP %s:%s, TLS=%s)",
+                            observer_account.email, len(profiles_for_email),
+                            settings.EMAIL_HOST, settings.EMAIL_PORT, settings.EMAIL_USE_TLS,
+                        )
 
-                        send_victimprofiles_email(observer_account, profiles_for_email, profile_data)
+                        stored_report = send_victimprofiles_email(observer_account, profiles_for_email, profile_data)
 
-                        print(f"[INFO] E-Mail für {len(profiles_for_email)} Profile an {observer_account.email} gesendet")
+                        logger.info("E-Mail für %s Profile an %s gesendet", len(profiles_for_email), observer_account.email)
                         email_success = True
                     else:
-                        print(f"[INFO] Keine E-Mail gesendet, da ungültige E-Mail-Adresse: {observer_account.email}")
+                        logger.info("Keine E-Mail gesendet, da ungültige E-Mail-Adresse: %s", observer_account.email)
                         email_error = "Ungültige E-Mail-Adresse"
                 except Exception as e:
-                    import traceback
                     email_error = str(e)
-                    error_details = traceback.format_exc()
-                    print(f"[ERROR] E-Mail konnte nicht gesendet werden: {email_error}")
-                    print(f"[ERROR] Details: {error_details}")
+                    logger.exception("E-Mail konnte nicht gesendet werden: %s", email_error)
 
             return Response({
                 'message': 'VictimProfiles wurden erfolgreich gespeichert.',
@@ -649,18 +705,21 @@ class SendVictimProfilesView(APIView):
                 'email_to': observer_account.email,
                 'email_success': email_success,
                 'email_error': email_error,
+                # Direkter Download der Excel-Datei (z.B. falls der Anhang nicht ankommt)
+                'report_url': request.build_absolute_uri(report_download_path(stored_report.key)) if stored_report else None,
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }, status=status.HTTP_200_OK)
 
+        except (WriteQueueTimeout, WriteQueuePending):
+            # Eigene Antwort der Schreibwarteschlange (503 mit Hinweis, ob erneut gesendet werden darf)
+            raise
         except Exception as e:
-            import traceback
             error_details = str(e)
             if hasattr(e, 'response') and hasattr(e.response, 'text'):
                 error_details += f" - Server-Antwort: {e.response.text}"
-            
-            print(f"[ERROR] Fehler beim Senden der VictimProfileResponse: {error_details}")
-            print(traceback.format_exc())
-            
+
+            logger.exception("Fehler beim Senden der VictimProfileResponse: %s", error_details)
+
             return Response({
                 'error': f'Fehler beim Senden der VictimProfile Response: {str(e)}',
                 'detail': error_details if settings.DEBUG else 'Weitere Details im Server-Log'
@@ -688,6 +747,122 @@ class VictimProfileResponseViewSet(viewsets.ModelViewSet):
         # Validierung und Speicherung der Daten
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        victim_response = serializer.save()
+        submit_create(serializer)
         headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
\ No newline at end of file
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+
+# -------------------------------
+# 10) BERICHTS-DOWNLOAD
+# -------------------------------
+
+class ReportDownloadView(APIView):
+    """
+    Liefert einen gespeicherten Bericht (Excel-Datei) über seinen Schlüssel aus.
+    Zugriff mit gültigem Token oder über einen signierten Link (?sig=...) aus der E-Mail.
+    Unterstützt HTTP-Range (Teil-Downloads) sowie ETag/If-None-Match.
+    """
+    permission_classes = []
+
+    def get(self, request, key, format=None):
+        """Gibt die Datei zum Schlüssel zurück (200, 206, 304, 404 oder 416)"""
+        if not request.user.is_authenticated and not check_signature(key, request.query_params.get('sig')):
+            self.permission_denied(request, message="Anmeldung oder gültiger Download-Link erforderlich.")
+        stored = get_report(key)
+        if stored is None:
+            return Response({'error': 'Bericht nicht gefunden.'}, status=status.HTTP_404_NOT_FOUND)
+        return serve_report(request, stored)
+
+
+# -------------------------------
+# 11) AUSWERTUNGEN
+# -------------------------------
+
+class TriageAnalyticsView(APIView):
+    """
+    Sichtungsgenauigkeit über alle Patientenbegleitbögen: SOLL×IST-Matrix,
+    Über-/Untertriagequoten und Aufschlüsselung nach Organisation.
+    Das Ergebnis wird gecacht, bis eine neue Antwort eingeht.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        """Gibt die (ggf. gecachte) Sichtungsauswertung zurück"""
+        return Response(get_triage_analytics())
+
+
+class TimelineView(APIView):
+    """
+    Zusammengeführter, chronologischer Zeitstrahl aller Zeitstempel (Fragen, Notizen,
+    Verlaufseinträge) als gestreamtes JSON-Array.
+
+    Query-Parameter (alle optional):
+    - start, end: Zeitraum [start, end) als ISO 8601 oder "TT.MM.JJJJ, HH:MM"
+    - source: Kommagetrennte Quellen (question, note, verlauf)
+    - button: Button-Nummer eines Patienten
+    - form: ID eines Formulars
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        """Streamt die Ereignisse im gewünschten Zeitraum"""
+        bounds = {}
+        for name in ('start', 'end'):
+            value = request.query_params.get(name)
+            if value:
+                bounds[name] = parse_event_time(value)
+                if bounds[name] is None:
+                    return Response({'error': f"Ungültige Zeitangabe für '{name}'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        sources = [s.strip() for s in request.query_params.get('source', '').split(',') if s.strip()]
+        valid_sources = {choice for choice, _label in TimelineEvent.SOURCE_CHOICES}
+        if any(source not in valid_sources for source in sources):
+            return Response({'error': f"source muss aus {sorted(valid_sources)} sein."}, status=status.HTTP_400_BAD_REQUEST)
+
+        form_id = request.query_params.get('form')
+        if form_id is not None and not form_id.isdigit():
+            return Response({'error': "form muss eine Formular-ID sein."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = timeline_queryset(
+            start=bounds.get('start'),
+            end=bounds.get('end'),
+            sources=sources,
+            button_number=request.query_params.get('button'),
+            form_id=int(form_id) if form_id is not None else None,
+        )
+        return stream_timeline_response(queryset)
+
+
+# -------------------------------
+# 12) BETRIEBSKENNZAHLEN
+# -------------------------------
+
+class MetricsView(APIView):
+    """
+    Kennzahlen im Prometheus-Textformat (Latenzen, Einsendungen, Excel- und E-Mail-Dauern,
+    Importfortschritt, Sperr-Wartezeiten, Warteschlangen). Standardmäßig abgeschaltet
+    (METRICS_ENABLED). Ist METRICS_TOKEN gesetzt, wird der Header
+    "Authorization: Bearer <Token>" verlangt; sonst sind nur direkte Anfragen von den
+    Adressen in METRICS_ALLOWED_IPS erlaubt. Über einen Reverse-Proxy weitergeleitete
+    Anfragen (X-Forwarded-For, Forwarded) kommen ebenfalls von 127.0.0.1 und werden ohne
+    Token daher immer abgewiesen.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    @staticmethod
+    def is_allowed(request):
+        """Prüft Token bzw. Absenderadresse der Anfrage"""
+        token = settings.METRICS_TOKEN
+        if token:
+            scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+            return scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip().encode(), token.encode())
+        if 'X-Forwarded-For' in request.headers or 'Forwarded' in request.headers:
+            return False
+        return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+    def get(self, request, format=None):
+        """Gibt alle Kennzahlen dieses Prozesses aus"""
+        if not settings.METRICS_ENABLED or not self.is_allowed(request):
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,185 @@
+# write_queue.py - Optionale Schreibwarteschlange mit Gruppen-Commits für Einsendungen
+#
+# SQLite erlaubt auch im WAL-Modus nur einen Schreiber gleichzeitig. Gehen am Ende einer
+# Übung viele Einsendungen (FormResponse, VictimProfileResponse) parallel ein, warten die
+# Worker nacheinander auf die Schreibsperre. Ist SUBMISSION_WRITE_QUEUE aktiviert, werden
+# die Schreibvorgänge stattdessen an einen einzelnen Schreib-Thread übergeben. Dieser fasst
+# alle wartenden Vorgänge (bis SUBMISSION_BATCH_MAX) in einer Transaktion zusammen und
+# schreibt sie mit einem Commit. Die Anfrage wartet, bis der Commit erfolgt ist, und
+# erhält erst dann ihre Antwort (bzw. den Fehler ihres eigenen Vorgangs).
+#
+# Jeder Vorgang läuft in einem eigenen Savepoint: Schlägt einer fehl, werden die übrigen
+# Vorgänge der Gruppe trotzdem gespeichert. Scheitert erst der Commit selbst, werden die
+# Vorgänge einzeln wiederholt.
+#
+# Der Schreib-Thread existiert einmal pro Prozess. Bei mehreren Worker-Prozessen gibt es
+# entsprechend viele Schreiber; die Konflikte sinken dennoch um die Gruppengröße.
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class WriteQueueTimeout(APIException):
+    """Die Einsendung wurde nicht rechtzeitig begonnen und verworfen (erneutes Senden ist sicher)"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Die Einsendung konnte nicht rechtzeitig gespeichert werden. Bitte erneut senden."
+    default_code = 'write_queue_timeout'
+
+
+class WriteQueuePending(APIException):
+    """Die Einsendung wird noch geschrieben; ob sie gespeichert wird, steht noch nicht fest"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = (
+        "Die Einsendung wird noch gespeichert. Bitte nicht erneut senden, sondern später prüfen, "
+        "ob sie angekommen ist."
+    )
+    default_code = 'write_queue_pending'
+
+
+# --------------------------------------------------
+# 1) SCHREIB-THREAD
+# --------------------------------------------------
+def _collect_batch():
+    """Wartet auf den ersten Vorgang und sammelt weitere, die kurz danach eingehen"""
+    batch = [_queue.get()]
+    deadline = time.monotonic() + settings.SUBMISSION_BATCH_WAIT_MS / 1000
+    while len(batch) < settings.SUBMISSION_BATCH_MAX:
+        remaining = deadline - time.monotonic()
+        try:
+            batch.append(_queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _write_batch(batch):
+    """Schreibt eine Gruppe von Vorgängen mit einem Commit und meldet die Ergebnisse"""
+    results = []
+    try:
+        with transaction.atomic():
+            for func, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    results.append(None)
+                    continue
+                try:
+                    with transaction.atomic():
+                        results.append((True, func(*args, **kwargs)))
+                except Exception as exc:
+                    results.append((False, exc))
+    except Exception:
+        # Commit fehlgeschlagen (z.B. verzögert geprüfte Fremdschlüssel in SQLite): kein
+        # Vorgang der Gruppe wurde gespeichert. Die Vorgänge werden einzeln wiederholt, damit
+        # nur der fehlerhafte Vorgang seinen Fehler erhält.
+        logger.warning("Gruppen-Commit mit %s Einsendungen fehlgeschlagen, schreibe einzeln", len(batch))
+        for func, args, kwargs, future in batch:
+            if not future.running():
+                continue
+            try:
+                with transaction.atomic():
+                    value = func(*args, **kwargs)
+            except Exception as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(value)
+        return
+
+    # Erst nach dem Commit bestätigen
+    for (_func, _args, _kwargs, future), result in zip(batch, results):
+        if result is None:
+            continue
+        ok, value = result
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+
+def _writer_loop():
+    """Hauptschleife des Schreib-Threads"""
+    while True:
+        batch = _collect_batch()
+        close_old_connections()
+        _write_batch(batch)
+
+
+def _ensure_writer():
+    """Startet den Schreib-Thread beim ersten Vorgang"""
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name="dueb-write-queue", daemon=True)
+            _writer.start()
+
+
+# --------------------------------------------------
+# 2) ÖFFENTLICHE SCHNITTSTELLE
+# --------------------------------------------------
+def submit_write(func, *args, **kwargs):
+    """
+    Führt einen Schreibvorgang für eine Einsendung aus und liefert dessen Rückgabewert.
+
+    Ist die Warteschlange deaktiviert, wird func direkt ausgeführt. Andernfalls übernimmt
+    der Schreib-Thread den Vorgang im nächsten Gruppen-Commit; Ausnahmen von func werden
+    in der aufrufenden Anfrage erneut ausgelöst. Innerhalb einer bereits offenen
+    Transaktion (oder im Schreib-Thread selbst) wird ebenfalls direkt ausgeführt, damit
+    die Atomarität des Aufrufers erhalten bleibt.
+
+    Nach SUBMISSION_WRITE_TIMEOUT wird ein noch nicht begonnener Vorgang verworfen
+    (WriteQueueTimeout, erneutes Senden ist sicher). Ein bereits laufender Vorgang erhält
+    eine weitere Wartezeit und danach WriteQueuePending (nicht erneut senden).
+    """
+    if (
+        not settings.SUBMISSION_WRITE_QUEUE
+        or connection.in_atomic_block
+        or threading.current_thread() is _writer
+    ):
+        return func(*args, **kwargs)
+
+    _ensure_writer()
+    future = Future()
+    _queue.put((func, args, kwargs, future))
+    try:
+        return future.result(timeout=settings.SUBMISSION_WRITE_TIMEOUT)
+    except FutureTimeoutError:
+        # Noch nicht begonnene Vorgänge werden verworfen und können erneut gesendet werden
+        if future.cancel():
+            raise WriteQueueTimeout()
+    # Der Vorgang läuft bereits und wird ggf. noch gespeichert: auf den Commit warten, statt
+    # zum erneuten Senden aufzufordern (das ergäbe doppelte Einsendungen)
+    try:
+        return future.result(timeout=settings.SUBMISSION_WRITE_TIMEOUT)
+    except FutureTimeoutError:
+        raise WriteQueuePending()
+
+
+def submit_create(serializer, **kwargs):
+    """
+    Legt das Objekt eines validierten Serializers über submit_write an (serializer.save).
+
+    Scheitert der Gruppen-Commit, wird der Vorgang wiederholt. serializer.instance zeigt
+    dann auf das Objekt des zurückgerollten Versuchs (mit dessen pk); save() würde es per
+    update() erneut speichern und post_save mit created=False auslösen. Daher wird vor
+    jedem Versuch mit leerer Instanz begonnen.
+    """
+    def create():
+        serializer.instance = None
+        return serializer.save(**kwargs)
+    return submit_write(create)
+
+
+def pending_writes():
+    """Anzahl der Vorgänge, die auf den nächsten Gruppen-Commit warten"""
+    return _queue.qsize()